@@ -0,0 +1,16 @@
+"""Shared setup for the standalone benchmark scripts: Django settings on sys.path."""
+
+import os
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def setup_django() -> None:
+    # Same layout as the container: project package at the root, apps under pathfinder/.
+    sys.path[:0] = [str(REPO_ROOT), str(REPO_ROOT / "pathfinder")]
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "pathfinder.settings")
+    import django
+
+    django.setup()
@@ -0,0 +1,101 @@
+"""
+Measure corridor pruning: nodes removed and cost delta versus the unpruned graph.
+
+    python benchmarks/corridor_pruning.py --exits 60 150 300 --per-exit 8 --bin-miles 5 --top-k 2
+
+Stations are generated in clusters at synthetic interstate exits along a
+New York -> Los Angeles line, which is the shape that makes pruning pay off.
+"""
+
+import argparse
+import json
+import random
+import time
+from decimal import Decimal
+
+from _bootstrap import setup_django
+
+setup_django()
+
+from routing.services import (  # noqa: E402
+    StationNode,
+    build_graph,
+    dijkstra,
+    haversine_miles,
+    prune_dominated_stations,
+)
+
+START = (-74.0, 40.7)
+END = (-118.2, 34.0)
+
+
+def clustered_stations(exits: int, per_exit: int, seed: int):
+    rng = random.Random(seed)
+    length = haversine_miles(START, END)
+    stations = []
+    next_id = 1
+    for _ in range(exits):
+        t = rng.random()
+        lon = START[0] + (END[0] - START[0]) * t
+        lat = START[1] + (END[1] - START[1]) * t
+        base = rng.uniform(2.9, 4.2)
+        for _ in range(per_exit):
+            stations.append(
+                StationNode(
+                    id=next_id,
+                    lon=lon + rng.uniform(-0.01, 0.01),
+                    lat=lat + rng.uniform(-0.01, 0.01),
+                    price=Decimal(str(round(base + rng.uniform(-0.2, 0.2), 3))),
+                    name=f"S{next_id}",
+                    route_miles=t * length,
+                )
+            )
+            next_id += 1
+    return stations
+
+
+def solve(stations):
+    start = StationNode(id=-1, lon=START[0], lat=START[1], price=Decimal("3.500"), name="start")
+    end = StationNode(id=-2, lon=END[0], lat=END[1], price=Decimal("3.500"), name="end")
+    t0 = time.perf_counter()
+    graph = build_graph([start, end] + stations)
+    path = dijkstra(graph, start.id, end.id)
+    elapsed = time.perf_counter() - t0
+    cost = sum(graph[path[i]][path[i + 1]] for i in range(len(path) - 1))
+    return cost, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--exits", type=int, nargs="+", default=[60, 150, 300])
+    parser.add_argument("--per-exit", type=int, default=8)
+    parser.add_argument("--bin-miles", type=float, default=5.0)
+    parser.add_argument("--top-k", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    for exits in args.exits:
+        stations = clustered_stations(exits, args.per_exit, args.seed)
+        pruned = prune_dominated_stations(stations, args.bin_miles, args.top_k)
+        full_cost, full_s = solve(stations)
+        pruned_cost, pruned_s = solve(pruned)
+        print(
+            json.dumps(
+                {
+                    "stations": len(stations),
+                    "kept": len(pruned),
+                    "pruned": len(stations) - len(pruned),
+                    "bin_miles": args.bin_miles,
+                    "top_k": args.top_k,
+                    "cost_unpruned": round(full_cost, 4),
+                    "cost_pruned": round(pruned_cost, 4),
+                    "cost_delta": round(pruned_cost - full_cost, 4),
+                    "ms_unpruned": round(full_s * 1000, 2),
+                    "ms_pruned": round(pruned_s * 1000, 2),
+                }
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Closed-loop HTTP load against a running web tier, for comparing server profiles.
+
+    GUNICORN_WORKER_CLASS=sync GUNICORN_THREADS=1 docker compose up -d web
+    python benchmarks/http_load.py --label sync --output sync.json
+    docker compose up -d web      # default gthread profile, DB_POOL=true etc.
+    python benchmarks/http_load.py --label gthread --compare sync.json
+
+Each of --concurrency client threads keeps one keep-alive session and sends
+route requests back to back, cycling over a fixed set of trips. Lanes are not
+registered, so the hot-lane cache stays out of the picture; the numbers are
+end-to-end latency, throughput and errors of the server profile under test.
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+import requests
+
+TRIPS = [
+    {"start": "-96.7970,32.7767", "end": "-95.3698,29.7604"},  # Dallas -> Houston
+    {"start": "-97.7431,30.2672", "end": "-98.4936,29.4241"},  # Austin -> San Antonio
+    {"start": "-87.6298,41.8781", "end": "-86.1581,39.7684"},  # Chicago -> Indianapolis
+    {"start": "-84.3880,33.7490", "end": "-86.7816,36.1627"},  # Atlanta -> Nashville
+]
+
+_local = threading.local()
+
+
+def session() -> requests.Session:
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def one_request(url: str, i: int, timeout: float) -> Tuple[float, bool]:
+    t0 = time.perf_counter()
+    try:
+        ok = session().post(url, json=TRIPS[i % len(TRIPS)], timeout=timeout).status_code == 200
+    except requests.RequestException:
+        ok = False
+    return time.perf_counter() - t0, ok
+
+
+def percentiles(samples: List[float]) -> dict:
+    ordered = sorted(samples)
+    result = {}
+    for label, q in (("p50_ms", 0.5), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+        result[label] = round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+    result["mean_ms"] = round(statistics.fmean(ordered) * 1000, 2)
+    return result
+
+
+def run(url: str, concurrency: int, total: int, timeout: float) -> dict:
+    # Warm connections and server-side pools before measuring.
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(lambda i: one_request(url, i, timeout), range(concurrency)))
+        t0 = time.perf_counter()
+        outcomes = list(pool.map(lambda i: one_request(url, i, timeout), range(total)))
+        wall = time.perf_counter() - t0
+    latencies = [elapsed for elapsed, ok in outcomes if ok]
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": sum(1 for _, ok in outcomes if not ok),
+        "throughput_rps": round(len(latencies) / wall, 2),
+        **(percentiles(latencies) if latencies else {}),
+    }
+
+
+def compare(current: dict, baseline_path: str) -> None:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    old_runs = {row["concurrency"]: row for row in baseline["runs"]}
+    for row in current["runs"]:
+        old = old_runs.get(row["concurrency"])
+        if not old or "p95_ms" not in old or "p95_ms" not in row:
+            continue
+        print(
+            f"c={row['concurrency']:>3} {baseline['label']} -> {current['label']}: "
+            f"{old['throughput_rps']:>8.1f} -> {row['throughput_rps']:>8.1f} rps, "
+            f"p95 {old['p95_ms']:>8.1f} -> {row['p95_ms']:>8.1f} ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000/api/route/")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--label", default="run", help="name of the server profile under test")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="results JSON of another profile to diff against")
+    args = parser.parse_args()
+
+    results = {"label": args.label, "url": args.url, "runs": []}
+    for concurrency in args.concurrency:
+        outcome = run(args.url, concurrency, args.requests, args.timeout)
+        print(json.dumps({"label": args.label, **outcome}))
+        results["runs"].append(outcome)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
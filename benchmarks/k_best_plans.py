@@ -0,0 +1,98 @@
+"""
+Cost of alternative fuel plans: k cheapest plans (Yen) and a stop limit on one graph.
+
+    python benchmarks/k_best_plans.py --stations 100 400 --k 1 5 --repeat 3
+
+Uses the synthetic New York -> Los Angeles corridors of search_algorithms.py.
+For each corridor size and graph mode (eager / lazy) it prints the graph
+build time, then the search time for each k and for the cheapest plan within
+--max-stops. It also prints the shortest-path searches Yen's algorithm ran
+and, for the lazy graph, the edges it had generated. k=1 is the plain
+cheapest plan that every route request computes.
+"""
+
+import argparse
+import json
+import time
+
+from _bootstrap import setup_django
+
+setup_django()
+
+from search_algorithms import corridor_nodes  # noqa: E402
+
+from routing.services import (  # noqa: E402
+    LazyGraph,
+    build_graph,
+    cheapest_path_with_max_stops,
+    graph_edge_count,
+    k_cheapest_paths,
+    path_cost,
+)
+
+GRAPHS = {"eager": build_graph, "lazy": LazyGraph}
+
+
+def best_of(fn, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return result, round(best * 1000, 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stations", type=int, nargs="+", default=[100, 400])
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 5])
+    parser.add_argument("--max-stops", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    for count in args.stations:
+        start, end, nodes = corridor_nodes(count, args.seed)
+        for mode, make_graph in GRAPHS.items():
+            graph, build_ms = best_of(lambda: make_graph(nodes), args.repeat)
+            for k in args.k:
+                stats: dict = {}
+                # A fresh lazy graph per run, so its edge count covers this search alone.
+                fresh = make_graph(nodes) if mode == "lazy" else graph
+                paths, ms = best_of(lambda: k_cheapest_paths(fresh, start.id, end.id, k, stats=stats), args.repeat)
+                print(
+                    json.dumps(
+                        {
+                            "stations": count,
+                            "graph": mode,
+                            "search": f"k={k}",
+                            "build_ms": build_ms,
+                            "search_ms": ms,
+                            "searches": stats.get("searches", 1),
+                            "edges": graph_edge_count(fresh),
+                            "costs": [path_cost(fresh, p) for p in paths],
+                        }
+                    )
+                )
+            fresh = make_graph(nodes) if mode == "lazy" else graph
+            path, ms = best_of(
+                lambda: cheapest_path_with_max_stops(fresh, start.id, end.id, args.max_stops), args.repeat
+            )
+            print(
+                json.dumps(
+                    {
+                        "stations": count,
+                        "graph": mode,
+                        "search": f"max_stops={args.max_stops}",
+                        "build_ms": build_ms,
+                        "search_ms": ms,
+                        "edges": graph_edge_count(fresh),
+                        "stops": max(len(path) - 2, 0),
+                        "costs": [path_cost(fresh, path)] if path else [],
+                    }
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Edges generated by the lazy station graph versus the eager one, per trip length.
+
+    python benchmarks/lazy_graph.py --stations 400 --repeat 5
+
+Stations are scattered along a New York -> Los Angeles corridor; the short and
+medium trips end part-way along it, so most of the corridor lies beyond their
+destination. For each trip and search algorithm the script prints the edges the
+eager graph builds, the edges the lazy graph generated before the search
+stopped, wall time for build + search, and both path costs (which must agree).
+"""
+
+import argparse
+import json
+import time
+
+from _bootstrap import setup_django
+
+setup_django()
+
+from search_algorithms import corridor_nodes  # noqa: E402
+
+from routing.services import (  # noqa: E402
+    LazyGraph,
+    a_star,
+    bidirectional_dijkstra,
+    build_graph,
+    dijkstra,
+    fuel_cost_heuristic,
+    graph_edge_count,
+)
+
+# Fraction of the corridor each trip covers.
+TRIPS = {"short": 0.05, "medium": 0.3, "cross_country": 1.0}
+SEARCHES = {
+    "dijkstra": lambda graph, start, end, nodes: dijkstra(graph, start.id, end.id),
+    "astar": lambda graph, start, end, nodes: a_star(graph, start.id, end.id, fuel_cost_heuristic(nodes, end)),
+    "bidirectional": lambda graph, start, end, nodes: bidirectional_dijkstra(graph, start.id, end.id),
+}
+
+
+def timed(make_graph, search, start, end, nodes, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        graph = make_graph(nodes)
+        path = search(graph, start, end, nodes)
+        best = min(best, time.perf_counter() - t0)
+    cost = sum(graph[path[i]][path[i + 1]] for i in range(len(path) - 1))
+    return graph, cost, round(best * 1000, 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stations", type=int, default=400, help="stations along the full corridor")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    start, end, corridor = corridor_nodes(args.stations, args.seed)
+    far_lon, far_lat = end.lon, end.lat
+    for trip, fraction in TRIPS.items():
+        # Move the virtual end node along the corridor; stations stay put.
+        end.lon = start.lon + (far_lon - start.lon) * fraction
+        end.lat = start.lat + (far_lat - start.lat) * fraction
+        for name, search in SEARCHES.items():
+            eager, eager_cost, eager_ms = timed(build_graph, search, start, end, corridor, args.repeat)
+            lazy, lazy_cost, lazy_ms = timed(LazyGraph, search, start, end, corridor, args.repeat)
+            eager_edges, lazy_edges = graph_edge_count(eager), graph_edge_count(lazy)
+            print(
+                json.dumps(
+                    {
+                        "trip": trip,
+                        "search": name,
+                        "eager_edges": eager_edges,
+                        "lazy_edges": lazy_edges,
+                        "edges_saved_pct": round((1 - lazy_edges / eager_edges) * 100, 1) if eager_edges else 0.0,
+                        "eager_ms": eager_ms,
+                        "lazy_ms": lazy_ms,
+                        "same_cost": eager_cost == lazy_cost,
+                    }
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+End-to-end load scenarios against a running stack, with providers stubbed locally.
+
+    docker compose -f docker-compose.yml -f docker-compose.loadtest.yml up -d
+    python benchmarks/load_scenarios.py --scenarios routes batch ingest --output load.json
+
+Scenarios (each prints one JSON line per run or phase):
+
+- routes: closed-loop route requests at each --concurrency over many distinct
+  city pairs, some via a waypoint. Lanes are never registered, so the hot-lane
+  cache stays out of the picture.
+- batch: a fleet dispatch burst. --batch-size distinct multi-drop trips are
+  submitted at once through --concurrency connections; reports the time to
+  finish the whole batch as well as per-request latency.
+- ingest: route traffic at the highest --concurrency runs before, during and
+  after a CSV upload to /api/ingest/upload/. The upload phase lasts until the
+  ingestion reports success or failure.
+
+With --stub-url, the provider stub's counters are reset before each scenario
+and its per-endpoint status counts are added to the results. Nothing here
+needs network access beyond the stack under test.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import requests
+
+from http_load import percentiles, session
+
+CITIES = {
+    "Dallas": (-96.7970, 32.7767),
+    "Houston": (-95.3698, 29.7604),
+    "Austin": (-97.7431, 30.2672),
+    "San Antonio": (-98.4936, 29.4241),
+    "Oklahoma City": (-97.5164, 35.4676),
+    "Chicago": (-87.6298, 41.8781),
+    "Indianapolis": (-86.1581, 39.7684),
+    "St. Louis": (-90.1994, 38.6270),
+    "Atlanta": (-84.3880, 33.7490),
+    "Nashville": (-86.7816, 36.1627),
+    "Memphis": (-90.0490, 35.1495),
+    "Denver": (-104.9903, 39.7392),
+    "Kansas City": (-94.5786, 39.0997),
+    "Phoenix": (-112.0740, 33.4484),
+    "Albuquerque": (-106.6504, 35.0844),
+    "Charlotte": (-80.8431, 35.2271),
+}
+
+DEFAULT_CSV = Path(__file__).resolve().parent.parent / "fuel-prices-for-be-assessment.csv"
+
+
+def fmt(point: Tuple[float, float]) -> str:
+    return f"{point[0]:.4f},{point[1]:.4f}"
+
+
+def make_trips(count: int, seed: int, max_waypoints: int = 1) -> List[dict]:
+    """Distinct trips between the cities above, with up to max_waypoints drops each."""
+    rng = random.Random(seed)
+    names = list(CITIES)
+    trips = []
+    for i in range(count):
+        stops = rng.sample(names, 2 + rng.randint(0, max_waypoints))
+        # A small offset keeps every trip distinct, so coalescing can't merge them.
+        jitter = (rng.uniform(-0.01, 0.01), rng.uniform(-0.01, 0.01))
+        start = (CITIES[stops[0]][0] + jitter[0], CITIES[stops[0]][1] + jitter[1])
+        trip = {"start": fmt(start), "end": fmt(CITIES[stops[-1]])}
+        if len(stops) > 2:
+            trip["waypoints"] = [fmt(CITIES[name]) for name in stops[1:-1]]
+        trips.append(trip)
+    return trips
+
+
+def post_route(url: str, trip: dict, timeout: float) -> Tuple[float, float, bool]:
+    t0 = time.perf_counter()
+    try:
+        ok = session().post(url, json=trip, timeout=timeout).status_code == 200
+    except requests.RequestException:
+        ok = False
+    t1 = time.perf_counter()
+    return t1, t1 - t0, ok
+
+
+def summarize(outcomes: List[Tuple[float, float, bool]], wall: float) -> dict:
+    latencies = [elapsed for _, elapsed, ok in outcomes if ok]
+    return {
+        "requests": len(outcomes),
+        "errors": len(outcomes) - len(latencies),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        **(percentiles(latencies) if latencies else {}),
+    }
+
+
+class StubStats:
+    def __init__(self, url: Optional[str]) -> None:
+        self.url = url.rstrip("/") if url else None
+
+    def reset(self) -> None:
+        if self.url:
+            requests.post(f"{self.url}/_stub/reset", timeout=5)
+
+    def counts(self) -> dict:
+        if not self.url:
+            return {}
+        return {"provider": requests.get(f"{self.url}/_stub/stats", timeout=5).json()["counts"]}
+
+
+def scenario_routes(args, stub: StubStats) -> List[dict]:
+    route_url = f"{args.url}/api/route/"
+    results = []
+    for concurrency in args.concurrency:
+        warmup, *trips = make_trips(args.requests + 1, args.seed + concurrency)
+        with ThreadPoolExecutor(concurrency) as pool:
+            # Warm connections and server-side pools before measuring.
+            list(pool.map(lambda _: post_route(route_url, warmup, args.timeout), range(concurrency)))
+            stub.reset()
+            t0 = time.perf_counter()
+            outcomes = list(pool.map(lambda trip: post_route(route_url, trip, args.timeout), trips))
+            wall = time.perf_counter() - t0
+        results.append({"scenario": "routes", "concurrency": concurrency, **summarize(outcomes, wall), **stub.counts()})
+    return results
+
+
+def scenario_batch(args, stub: StubStats) -> List[dict]:
+    route_url = f"{args.url}/api/route/"
+    concurrency = max(args.concurrency)
+    trips = make_trips(args.batch_size, args.seed, max_waypoints=3)
+    stub.reset()
+    with ThreadPoolExecutor(concurrency) as pool:
+        t0 = time.perf_counter()
+        outcomes = list(pool.map(lambda trip: post_route(route_url, trip, args.timeout), trips))
+        wall = time.perf_counter() - t0
+    return [
+        {
+            "scenario": "batch",
+            "concurrency": concurrency,
+            "batch_size": args.batch_size,
+            "makespan_s": round(wall, 2),
+            **summarize(outcomes, wall),
+            **stub.counts(),
+        }
+    ]
+
+
+def upload_csv(base_url: str, path: Path, timeout: float) -> Tuple[str, float]:
+    """Upload the CSV and wait for its ingestion to finish; returns (status, seconds)."""
+    t0 = time.perf_counter()
+    with open(path, "rb") as f:
+        resp = requests.post(f"{base_url}/api/ingest/upload/", files={"file": (path.name, f, "text/csv")}, timeout=60)
+    resp.raise_for_status()
+    ingestion_id = resp.json()["ingestion_id"]
+    state = "pending"
+    while time.perf_counter() - t0 < timeout:
+        state = requests.get(f"{base_url}/api/ingest/status/{ingestion_id}/", timeout=10).json()["status"]
+        if state in ("success", "failed"):
+            break
+        time.sleep(1.0)
+    return state, time.perf_counter() - t0
+
+
+def scenario_ingest(args, stub: StubStats) -> List[dict]:
+    route_url = f"{args.url}/api/route/"
+    concurrency = max(args.concurrency)
+    trips = make_trips(1000, args.seed)
+    outcomes: List[Tuple[float, float, bool]] = []
+    lock, stop = threading.Lock(), threading.Event()
+
+    def traffic(worker: int) -> None:
+        i = worker
+        while not stop.is_set():
+            outcome = post_route(route_url, trips[i % len(trips)], args.timeout)
+            with lock:
+                outcomes.append(outcome)
+            i += concurrency
+
+    stub.reset()
+    threads = [threading.Thread(target=traffic, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    marks = [time.perf_counter()]
+    try:
+        time.sleep(args.phase_seconds)
+        marks.append(time.perf_counter())
+        state, ingest_seconds = upload_csv(args.url, Path(args.csv), args.ingest_timeout)
+        marks.append(time.perf_counter())
+        time.sleep(args.phase_seconds)
+        marks.append(time.perf_counter())
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    results = []
+    for phase, begin, end in zip(("before", "during", "after"), marks, marks[1:]):
+        window = [o for o in outcomes if begin <= o[0] < end]
+        row = {"scenario": "ingest", "phase": phase, "concurrency": concurrency, **summarize(window, end - begin)}
+        if phase == "during":
+            row.update({"ingest_status": state, "ingest_seconds": round(ingest_seconds, 1)})
+        results.append(row)
+    results[-1].update(stub.counts())
+    return results
+
+
+SCENARIOS = {"routes": scenario_routes, "batch": scenario_batch, "ingest": scenario_ingest}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000", help="base URL of the web tier")
+    parser.add_argument("--stub-url", help="provider stub base URL, e.g. http://localhost:9000")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="route requests per concurrency level")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--phase-seconds", type=float, default=20, help="ingest scenario: traffic before/after")
+    parser.add_argument("--csv", default=str(DEFAULT_CSV), help="ingest scenario: file to upload")
+    parser.add_argument("--ingest-timeout", type=float, default=600)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write all results as JSON here")
+    args = parser.parse_args()
+    args.url = args.url.rstrip("/")
+
+    stub = StubStats(args.stub_url)
+    results = []
+    for name in args.scenarios:
+        for row in SCENARIOS[name](args, stub):
+            print(json.dumps(row))
+            results.append(row)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Latency of GET /api/stations/nearby/ at different station counts (needs PostGIS).
+
+    python benchmarks/nearby_stations.py --stations 8000 500000 --queries 200
+
+Inserts synthetic stations (opis_id prefixed BENCH-) into the configured
+database, runs random nearby queries through the view for both orderings and
+every page depth, prints latency percentiles as JSON, then removes the rows.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from _bootstrap import setup_django
+
+setup_django()
+
+from django.contrib.gis.geos import Point  # noqa: E402
+from django.db import connection  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from ingest.models import FuelStation  # noqa: E402
+
+US_BOUNDS = (-124.0, 25.0, -67.0, 49.0)
+
+
+def seed_stations(count: int, seed: int) -> None:
+    rng = random.Random(seed)
+    FuelStation.objects.filter(opis_id__startswith="BENCH-").delete()
+    batch = []
+    for i in range(count):
+        batch.append(
+            FuelStation(
+                opis_id=f"BENCH-{i}",
+                name=f"Bench {i}",
+                address="",
+                city="",
+                state="ZZ",
+                price=Decimal(str(round(rng.uniform(2.8, 4.5), 3))),
+                geom=Point(rng.uniform(US_BOUNDS[0], US_BOUNDS[2]), rng.uniform(US_BOUNDS[1], US_BOUNDS[3])),
+            )
+        )
+        if len(batch) == 5000:
+            FuelStation.objects.bulk_create(batch)
+            batch = []
+    FuelStation.objects.bulk_create(batch)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE ingest_fuelstation")
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    result = {}
+    for label, q in (("p50_ms", 0.5), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+        result[label] = round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+    result["mean_ms"] = round(statistics.fmean(ordered) * 1000, 2)
+    return result
+
+
+def run(count: int, queries: int, radius: float, seed: int) -> dict:
+    rng = random.Random(seed + 1)
+    client = APIClient()
+    result = {"stations": count, "radius_miles": radius}
+    for order in ("price", "distance"):
+        first_page, next_pages = [], []
+        for _ in range(queries):
+            params = {
+                "lon": rng.uniform(-110, -75),
+                "lat": rng.uniform(30, 45),
+                "radius_miles": radius,
+                "order": order,
+                "limit": 20,
+            }
+            t0 = time.perf_counter()
+            body = client.get("/api/stations/nearby/", params).json()
+            first_page.append(time.perf_counter() - t0)
+            if body.get("next_cursor"):
+                params["cursor"] = body["next_cursor"]
+                t0 = time.perf_counter()
+                client.get("/api/stations/nearby/", params)
+                next_pages.append(time.perf_counter() - t0)
+        result[order] = {"first_page": percentiles(first_page)}
+        if next_pages:
+            result[order]["next_page"] = percentiles(next_pages)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stations", type=int, nargs="+", default=[8000, 500000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--radius", type=float, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep", action="store_true", help="leave BENCH- rows in place afterwards")
+    args = parser.parse_args()
+
+    try:
+        for count in args.stations:
+            seed_stations(count, args.seed)
+            print(json.dumps(run(count, args.queries, args.radius, args.seed)))
+    finally:
+        if not args.keep:
+            FuelStation.objects.filter(opis_id__startswith="BENCH-").delete()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Graph build time from stored station pairs vs the eager graph (needs PostGIS).
+
+    python benchmarks/reachability.py --stations 8000 --corridor 400 --repeat 5
+
+Scatters --stations synthetic stations across the lower 48 plus --corridor
+stations along a New York -> Los Angeles corridor, and stores every pair within
+VEHICLE_MAX_RANGE_MILES in routing_stationpair under ids from BENCH_ID up.
+For short / medium / cross-country trips along the corridor it prints the
+eager build_graph time, the load_reachability + build_graph_from_reachability
+time, the pairs read, and whether both graphs agree. Pairs that lead out of the
+corridor are in the table but should never be read. The rows are removed
+afterwards.
+"""
+
+import argparse
+import json
+import random
+import time
+from decimal import Decimal
+from itertools import islice
+
+from _bootstrap import setup_django
+
+setup_django()
+
+from django.db import connection  # noqa: E402
+
+from routing.models import StationPair  # noqa: E402
+from routing.services import (  # noqa: E402
+    MAX_RANGE_MILES,
+    StationNode,
+    build_graph,
+    build_graph_from_reachability,
+    load_reachability,
+    station_pairs_within_range,
+)
+from search_algorithms import corridor_nodes  # noqa: E402
+
+BENCH_ID = 9_000_000_000
+US_BOUNDS = (-124.0, 25.0, -67.0, 49.0)
+# Fraction of the corridor each trip covers.
+TRIPS = {"short": 0.05, "medium": 0.3, "cross_country": 1.0}
+
+
+def seed_pairs(stations: int, corridor: int, seed: int):
+    rng = random.Random(seed)
+    start, end, nodes = corridor_nodes(corridor, seed)
+    along = [
+        StationNode(id=BENCH_ID + node.id, lon=node.lon, lat=node.lat, price=node.price, name=node.name)
+        for node in nodes[2:]
+    ]
+    national = [
+        StationNode(
+            id=BENCH_ID + corridor + i,
+            lon=rng.uniform(US_BOUNDS[0], US_BOUNDS[2]),
+            lat=rng.uniform(US_BOUNDS[1], US_BOUNDS[3]),
+            price=Decimal(str(round(rng.uniform(2.8, 4.5), 3))),
+            name=f"N{i}",
+        )
+        for i in range(1, stations + 1)
+    ]
+    rows = (
+        StationPair.between(a_id, b_id, dist, MAX_RANGE_MILES)
+        for a_id, b_id, dist in station_pairs_within_range(along + national, MAX_RANGE_MILES)
+    )
+    pairs = 0
+    while batch := list(islice(rows, 5000)):
+        StationPair.objects.bulk_create(batch)
+        pairs += len(batch)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE routing_stationpair")
+    return start, end, along, pairs
+
+
+def best_of(repeat: int, fn):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return result, round(best * 1000, 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stations", type=int, default=8000, help="stations scattered across the country")
+    parser.add_argument("--corridor", type=int, default=400, help="stations along the full corridor")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    StationPair.objects.filter(station_id__gte=BENCH_ID).delete()
+    try:
+        start, end, along, stored = seed_pairs(args.stations, args.corridor, args.seed)
+        for trip, fraction in TRIPS.items():
+            trip_end = StationNode(
+                id=end.id,
+                lon=start.lon + (end.lon - start.lon) * fraction,
+                lat=start.lat + (end.lat - start.lat) * fraction,
+                price=end.price,
+                name=end.name,
+            )
+            nodes = [start, trip_end] + [node for node in along if node.lon >= trip_end.lon]
+            eager, eager_ms = best_of(args.repeat, lambda: build_graph(nodes))
+
+            def precomputed():
+                reach = load_reachability(node.id for node in nodes if node.id >= 0)
+                return reach, build_graph_from_reachability(nodes, reach)
+
+            (reach, graph), precomputed_ms = best_of(args.repeat, precomputed)
+            print(
+                json.dumps(
+                    {
+                        "trip": trip,
+                        "corridor_stations": len(nodes) - 2,
+                        "stored_pairs": stored,
+                        "pairs_read": sum(len(edges) for edges in reach.values()) // 2,
+                        "eager_ms": eager_ms,
+                        "precomputed_ms": precomputed_ms,
+                        "same_graph": graph == eager,
+                    }
+                )
+            )
+    finally:
+        StationPair.objects.filter(station_id__gte=BENCH_ID).delete()
+
+
+if __name__ == "__main__":
+    main()
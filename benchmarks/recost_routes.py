@@ -0,0 +1,132 @@
+"""
+Re-costing throughput: stored routes re-planned over their stored corridors.
+
+    python benchmarks/recost_routes.py --routes 300 --changed 0.0 0.1 1.0
+
+Stations lie along a New York -> Los Angeles corridor at --per-mile stations
+per route mile (8k US stations within 25 miles of an interstate give about
+0.13). Stored routes are short (300 mi), medium (800 mi) or cross-country
+stretches of it, and each corridor is packed the way compute_route stores
+it. Then a share (--changed) of station prices moves, and recost_batch runs
+over every route. For each trip class the script prints routes re-planned
+and routes per minute for one worker process. No provider, corridor query or
+database is involved; add --db to time bulk_update into routing_route inside
+a rolled-back transaction.
+"""
+
+import argparse
+import copy
+import json
+import random
+import time
+from decimal import Decimal
+
+from _bootstrap import setup_django
+
+setup_django()
+
+from django.contrib.gis.geos import LineString, Point  # noqa: E402
+
+from routing.models import Route  # noqa: E402
+from routing.recost import RECOST_FIELDS, recost_batch  # noqa: E402
+from routing.services import StationNode, haversine_miles, plan_fuel_stops  # noqa: E402
+from routing.storage import pack_corridor  # noqa: E402
+
+START, END = (-74.0, 40.7), (-118.2, 34.0)
+TRIPS = {"short": 300, "medium": 800, "cross_country": None}
+
+
+def along(t: float):
+    return START[0] + (END[0] - START[0]) * t, START[1] + (END[1] - START[1]) * t
+
+
+def station_pool(per_mile: float, rng: random.Random) -> list:
+    count = int(haversine_miles(START, END) * per_mile)
+    pool = []
+    for i in range(1, count + 1):
+        t = rng.random()
+        lon, lat = along(t)
+        price = Decimal(rng.randint(2800, 4500)).scaleb(-3)
+        pool.append((t, i, lon + rng.uniform(-0.2, 0.2), lat + rng.uniform(-0.2, 0.2), price))
+    return pool
+
+
+def stored_routes(trip_miles, count: int, pool: list, rng: random.Random) -> list:
+    total = haversine_miles(START, END)
+    span = 1.0 if trip_miles is None else trip_miles / total
+    routes = []
+    for route_id in range(1, count + 1):
+        a = rng.uniform(0.0, 1.0 - span)
+        b = a + span
+        start, end = along(a), along(b)
+        nodes = [
+            StationNode(id=i, lon=lon, lat=lat, price=price, name=f"S{i}", route_miles=(t - a) * total)
+            for t, i, lon, lat, price in pool
+            if a <= t <= b
+        ]
+        plan = plan_fuel_stops(Point(*start), Point(*end), nodes)
+        routes.append(
+            Route(
+                id=route_id,
+                start_point=Point(*start),
+                end_point=Point(*end),
+                geometry=LineString([start, end]),
+                fuel_stops=plan["fuel_stops"],
+                total_cost=plan["total_cost"],
+                corridor_stations=pack_corridor(nodes),
+            )
+        )
+    return routes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--routes", type=int, default=300, help="stored routes per trip class")
+    parser.add_argument("--per-mile", type=float, default=0.13, help="corridor stations per route mile")
+    parser.add_argument("--changed", type=float, nargs="+", default=[0.0, 0.1, 1.0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--db", action="store_true", help="also time bulk_update (needs PostGIS)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pool = station_pool(args.per_mile, rng)
+    for trip, miles in TRIPS.items():
+        stored = stored_routes(miles, args.routes, pool, random.Random(args.seed))
+        corridor = sum(len(r.corridor_stations) for r in stored) // 16 // len(stored)
+        for changed in args.changed:
+            routes = [copy.copy(route) for route in stored]
+            moved = {i for _, i, _, _, _ in pool if rng.random() < changed}
+            stations = {
+                i: (lon, lat, price - Decimal("0.250") if i in moved else price, f"S{i}")
+                for _, i, lon, lat, price in pool
+            }
+            t0 = time.perf_counter()
+            updated = []
+            for start in range(0, len(routes), args.batch_size):
+                updated += recost_batch(routes[start : start + args.batch_size], stations)
+            seconds = time.perf_counter() - t0
+            result = {
+                "trip": trip,
+                "corridor_stations": corridor,
+                "changed_share": changed,
+                "routes": len(routes),
+                "recosted": len(updated),
+                "routes_per_minute": round(len(routes) / seconds * 60),
+            }
+            if args.db and updated:
+                from django.db import transaction
+
+                with transaction.atomic():
+                    for route in routes:
+                        route.pk = None
+                    Route.objects.bulk_create(routes, batch_size=args.batch_size)
+                    t0 = time.perf_counter()
+                    Route.objects.bulk_update(updated, RECOST_FIELDS, batch_size=args.batch_size)
+                    result["bulk_update_seconds"] = round(time.perf_counter() - t0, 3)
+                    transaction.set_rollback(True)
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
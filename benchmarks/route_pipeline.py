@@ -0,0 +1,312 @@
+"""
+Per-stage timings of routing.services.compute_route without live providers.
+
+    python benchmarks/route_pipeline.py --repeat 5 --output bench.json
+    python benchmarks/route_pipeline.py --compare bench.json
+
+Stations come from the bundled fuel-prices CSV, placed at seeded synthetic
+coordinates around their state's centroid. RoutingClient.directions is stubbed
+with polylines (synthetic by default, or recorded ones via --polylines), and
+the PostGIS corridor query is replaced by an in-memory equivalent unless --db
+is given, in which case stations are loaded into the configured database and
+the real query and Route insert are timed.
+"""
+
+import argparse
+import csv
+import json
+import math
+import random
+import statistics
+import subprocess
+import time
+from collections import defaultdict
+from decimal import Decimal
+from typing import Callable, Dict, List, Tuple
+
+from _bootstrap import REPO_ROOT, setup_django
+
+setup_django()
+
+from django.contrib.gis.geos import Point  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from routing import services  # noqa: E402
+from routing.serializers import RouteResponseSerializer  # noqa: E402
+
+CSV_PATH = REPO_ROOT / "fuel-prices-for-be-assessment.csv"
+
+# Rough population-weighted centroids; only used to scatter synthetic stations.
+STATE_CENTROIDS: Dict[str, Tuple[float, float]] = {
+    "AL": (-86.8, 32.8), "AR": (-92.4, 34.9), "AZ": (-111.7, 33.7), "CA": (-119.3, 36.2),
+    "CO": (-105.3, 39.3), "CT": (-72.7, 41.6), "DE": (-75.5, 39.2), "FL": (-81.7, 28.1),
+    "GA": (-83.6, 33.0), "IA": (-93.2, 41.9), "ID": (-115.0, 44.2), "IL": (-89.2, 40.3),
+    "IN": (-86.3, 39.8), "KS": (-97.5, 38.5), "KY": (-84.7, 37.7), "LA": (-91.9, 31.2),
+    "MA": (-71.5, 42.2), "MD": (-76.8, 39.0), "ME": (-69.4, 44.7), "MI": (-84.5, 43.3),
+    "MN": (-93.9, 45.7), "MO": (-92.3, 38.5), "MS": (-89.7, 32.7), "MT": (-110.5, 46.9),
+    "NC": (-79.8, 35.6), "ND": (-99.8, 47.5), "NE": (-98.3, 41.1), "NH": (-71.6, 43.5),
+    "NJ": (-74.5, 40.3), "NM": (-106.2, 34.8), "NV": (-117.1, 38.3), "NY": (-74.9, 42.2),
+    "OH": (-82.8, 40.4), "OK": (-96.9, 35.6), "OR": (-122.1, 44.6), "PA": (-77.2, 40.6),
+    "RI": (-71.5, 41.7), "SC": (-80.9, 33.9), "SD": (-99.4, 44.3), "TN": (-86.7, 35.7),
+    "TX": (-97.6, 31.1), "UT": (-111.9, 40.2), "VA": (-78.2, 37.8), "VT": (-72.7, 44.0),
+    "WA": (-121.5, 47.4), "WI": (-89.6, 44.3), "WV": (-80.9, 38.5), "WY": (-107.3, 42.8),
+}
+
+TRIPS: Dict[str, Tuple[Tuple[float, float], Tuple[float, float]]] = {
+    "short": ((-74.0060, 40.7128), (-75.1652, 39.9526)),  # New York -> Philadelphia
+    "medium": ((-74.0060, 40.7128), (-87.6298, 41.8781)),  # New York -> Chicago
+    "long": ((-74.0060, 40.7128), (-118.2437, 34.0522)),  # New York -> Los Angeles
+}
+
+STAGES = ("directions", "corridor", "graph_build", "optimization", "persistence", "serialization")
+
+
+def load_stations(seed: int) -> List[services.StationNode]:
+    rng = random.Random(seed)
+    nodes = []
+    with open(CSV_PATH) as f:
+        for i, row in enumerate(csv.DictReader(f), start=1):
+            centroid = STATE_CENTROIDS.get(row["State"])
+            if centroid is None:  # Canadian provinces: outside the synthetic US map
+                continue
+            nodes.append(
+                services.StationNode(
+                    id=i,
+                    lon=centroid[0] + rng.uniform(-2.0, 2.0),
+                    lat=centroid[1] + rng.uniform(-1.5, 1.5),
+                    price=Decimal(row["Retail Price"]).quantize(Decimal("0.001")),
+                    name=row["Truckstop Name"],
+                )
+            )
+    return nodes
+
+
+def synthetic_polyline(start, end, seed: int, spacing_miles: float = 2.0) -> List[List[float]]:
+    # Interpolated line with a gentle meander, vertex density similar to provider output.
+    rng = random.Random(seed)
+    steps = max(2, int(services.haversine_miles(start, end) / spacing_miles))
+    coords = []
+    for i in range(steps + 1):
+        t = i / steps
+        bend = math.sin(t * math.pi) * 0.05 * math.hypot(end[0] - start[0], end[1] - start[1])
+        coords.append(
+            [
+                start[0] + (end[0] - start[0]) * t + rng.uniform(-0.005, 0.005),
+                start[1] + (end[1] - start[1]) * t + bend + rng.uniform(-0.005, 0.005),
+            ]
+        )
+    coords[0], coords[-1] = list(start), list(end)
+    return coords
+
+
+class InMemoryCorridor:
+    """Stand-in for the PostGIS corridor query: grid-indexed vertex distance."""
+
+    CELL = 0.5
+
+    def __init__(self, stations: List[services.StationNode]) -> None:
+        self.stations = stations
+
+    def __call__(self, polyline, corridor_miles: float = 25) -> List[services.StationNode]:
+        coords = polyline.coords
+        cumulative = [0.0]
+        for i in range(1, len(coords)):
+            cumulative.append(cumulative[-1] + services.haversine_miles(coords[i - 1], coords[i]))
+        grid: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for idx, (lon, lat) in enumerate(coords):
+            grid[(int(lon // self.CELL), int(lat // self.CELL))].append(idx)
+
+        found = []
+        for station in self.stations:
+            cx, cy = int(station.lon // self.CELL), int(station.lat // self.CELL)
+            best, best_idx = float("inf"), -1
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for idx in grid.get((cx + dx, cy + dy), ()):
+                        dist = services.haversine_miles((station.lon, station.lat), coords[idx])
+                        if dist < best:
+                            best, best_idx = dist, idx
+            if best <= corridor_miles:
+                found.append(
+                    services.StationNode(
+                        id=station.id,
+                        lon=station.lon,
+                        lat=station.lat,
+                        price=station.price,
+                        name=station.name,
+                        route_miles=cumulative[best_idx],
+                    )
+                )
+        return found
+
+
+def timed(timings: Dict[str, float], stage: str, fn: Callable) -> Callable:
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - t0
+
+    return wrapper
+
+
+def persist(payload: dict, start: Point, end: Point) -> None:
+    from routing.models import Route
+    from routing.storage import route_storage_fields
+
+    route = Route.objects.create(
+        start_point=start,
+        end_point=end,
+        fuel_stops=payload.get("fuel_stops", []),
+        total_cost=payload.get("total_cost"),
+        **route_storage_fields(payload.get("polyline"), payload.get("route", {})),
+    )
+    route.delete()
+
+
+def load_stations_into_db(stations: List[services.StationNode]) -> None:
+    from ingest.models import FuelStation
+
+    FuelStation.objects.filter(opis_id__startswith="BENCH-").delete()
+    FuelStation.objects.bulk_create(
+        [
+            FuelStation(
+                opis_id=f"BENCH-{node.id}",
+                name=node.name,
+                address="",
+                city="",
+                state="ZZ",
+                price=node.price,
+                geom=Point(node.lon, node.lat),
+            )
+            for node in stations
+        ],
+        batch_size=1000,
+    )
+
+
+def run_trip(name: str, coords: List[List[float]], corridor: Callable, repeat: int, use_db: bool) -> dict:
+    directions = {"features": [{"geometry": {"coordinates": coords}}]}
+    runs: Dict[str, List[float]] = {stage: [] for stage in STAGES + ("total",)}
+    corridor_sizes: List[int] = []
+    stops = 0
+
+    def counting_corridor(polyline, *args, **kwargs):
+        found = corridor(polyline, *args, **kwargs)
+        corridor_sizes.append(len(found))
+        return found
+
+    for _ in range(repeat):
+        timings: Dict[str, float] = {}
+        services.RoutingClient.directions = timed(timings, "directions", lambda self, s, e, waypoints=(): directions)
+        services.filter_stations_along_route = timed(timings, "corridor", counting_corridor)
+        services.build_route_graph = timed(timings, "graph_build", ORIGINAL["build_route_graph"])
+        services.shortest_path = timed(timings, "optimization", ORIGINAL["shortest_path"])
+
+        start, end = Point(*coords[0]), Point(*coords[-1])
+        t0 = time.perf_counter()
+        payload = services.compute_route(start, end)
+        if use_db:
+            timed(timings, "persistence", persist)(payload, start, end)
+        payload.pop("polyline", None)
+        payload["static_map_url"] = ""
+        timed(timings, "serialization", lambda p: JSONRenderer().render(RouteResponseSerializer(p).data))(
+            payload
+        )
+        runs["total"].append(time.perf_counter() - t0)
+        for stage in STAGES:
+            if stage in timings:
+                runs[stage].append(timings[stage])
+        stops = len(payload["fuel_stops"])
+
+    def summary(values: List[float]):
+        if not values:
+            return None
+        return {
+            "min_ms": round(min(values) * 1000, 3),
+            "median_ms": round(statistics.median(values) * 1000, 3),
+            "mean_ms": round(statistics.fmean(values) * 1000, 3),
+        }
+
+    return {
+        "trip": name,
+        "miles": round(services.polyline_miles([tuple(c) for c in coords]), 1),
+        "vertices": len(coords),
+        "corridor_stations": corridor_sizes[-1],
+        "fuel_stops": stops,
+        "stages": {stage: summary(values) for stage, values in runs.items()},
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: dict, baseline_path: str) -> None:
+    with open(baseline_path) as f:
+        baseline = {trip["trip"]: trip for trip in json.load(f)["trips"]}
+    for trip in current["trips"]:
+        old = baseline.get(trip["trip"])
+        if not old:
+            continue
+        for stage, values in trip["stages"].items():
+            before = (old["stages"].get(stage) or {}).get("median_ms")
+            if values is None or not before:
+                continue
+            change = (values["median_ms"] - before) / before * 100
+            print(f"{trip['trip']:>7} {stage:<14} {before:>10.3f} -> {values['median_ms']:>10.3f} ms ({change:+.1f}%)")
+
+
+ORIGINAL = {
+    name: getattr(services, name)
+    for name in ("filter_stations_along_route", "build_route_graph", "shortest_path")
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trips", nargs="+", choices=sorted(TRIPS), default=list(TRIPS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--polylines", help="JSON file mapping trip name -> recorded [[lon, lat], ...]")
+    parser.add_argument("--db", action="store_true", help="use the configured PostGIS for corridor + persistence")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to diff medians against")
+    args = parser.parse_args()
+
+    stations = load_stations(args.seed)
+    if args.db:
+        load_stations_into_db(stations)
+        corridor = ORIGINAL["filter_stations_along_route"]
+    else:
+        corridor = InMemoryCorridor(stations)
+
+    recorded = {}
+    if args.polylines:
+        with open(args.polylines) as f:
+            recorded = json.load(f)
+
+    results = {"commit": git_commit(), "stations": len(stations), "trips": []}
+    for i, name in enumerate(args.trips):
+        coords = recorded.get(name) or synthetic_polyline(*TRIPS[name], seed=args.seed + i)
+        results["trips"].append(run_trip(name, coords, corridor, args.repeat, args.db))
+
+    if args.db:
+        from ingest.models import FuelStation
+
+        FuelStation.objects.filter(opis_id__startswith="BENCH-").delete()
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
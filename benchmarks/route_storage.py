@@ -0,0 +1,190 @@
+"""
+Size of Route history under each ROUTE_STORAGE_MODE on a generated dataset (needs PostGIS).
+
+    python benchmarks/route_storage.py --routes 100000
+    python benchmarks/route_storage.py --routes 20000 --modes full compact --keep
+    python benchmarks/route_storage.py --routes 2000 --offline
+
+For every mode the same synthetic routes (dense, road-like polylines plus the
+provider JSON the view stores) are written to a scratch copy of routing_route
+(bench_route_<mode>, same columns, storage settings and GiST index), then the
+script prints the table, TOAST and index sizes, the time of a typical daily
+analytics aggregate, and the change against "full". Scratch tables are dropped
+afterwards unless --keep is given.
+
+--offline skips the database and reports the bytes each mode hands to
+Postgres per column (geometry WKB, route_json text, route_json_gz), before
+TOAST compression and without page, tuple or index overhead.
+"""
+
+import argparse
+import json
+import math
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import List
+
+from _bootstrap import setup_django
+
+setup_django()
+
+from django.contrib.gis.geos import LineString  # noqa: E402
+from django.core.serializers.json import DjangoJSONEncoder  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from routing.storage import STORAGE_MODES, route_storage_fields  # noqa: E402
+
+COLUMNS = (
+    "id, start_point, end_point, waypoints, geometry, fuel_stops, total_cost, "
+    "route_json, route_json_gz, compacted_at, created_at"
+)
+PLACEHOLDERS = "%s, %s::geography, %s::geography, %s::jsonb, %s::geography, %s::jsonb, %s, %s::jsonb, %s, %s, %s"
+
+
+def road_polyline(rng: random.Random, spacing_meters: float) -> List[List[float]]:
+    # Smooth meander with metre-level jitter: what a provider polyline looks like
+    # to Douglas-Peucker, unlike the noisy lines of route_pipeline.py.
+    lon0, lat0 = rng.uniform(-110, -80), rng.uniform(30, 45)
+    miles = rng.uniform(5, 120)
+    heading = rng.uniform(0, 2 * math.pi)
+    steps = max(2, int(miles * 1609.34 / spacing_meters))
+    step_deg = spacing_meters / 111_320
+    coords, lon, lat = [], lon0, lat0
+    for i in range(steps + 1):
+        heading += 0.02 * math.sin(i / 40) + rng.gauss(0, 0.01)
+        lon += step_deg * math.cos(heading) / math.cos(math.radians(lat))
+        lat += step_deg * math.sin(heading)
+        coords.append([round(lon + rng.gauss(0, 2e-6), 6), round(lat + rng.gauss(0, 2e-6), 6)])
+    return coords
+
+
+def generate_rows(count: int, spacing_meters: float, mode: str, seed: int):
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    for i in range(1, count + 1):
+        coords = road_polyline(rng, spacing_meters)
+        line = LineString(coords, srid=4326)
+        fields = route_storage_fields(line, {"features": [{"geometry": {"coordinates": coords}}]}, mode)
+        geometry = fields["geometry"]
+        yield (
+            i,
+            f"SRID=4326;POINT({coords[0][0]} {coords[0][1]})",
+            f"SRID=4326;POINT({coords[-1][0]} {coords[-1][1]})",
+            "[]",
+            geometry.hexewkb.decode(),
+            json.dumps([{"name": "stop", "price": 3.459, "gallons": 12.5}]),
+            Decimal(rng.randint(500, 50000)) / 100,
+            json.dumps(fields["route_json"], cls=DjangoJSONEncoder),
+            fields["route_json_gz"],
+            fields["compacted_at"],
+            now - timedelta(minutes=rng.randint(0, 60 * 24 * 90)),
+        )
+
+
+def payload_sizes(mode: str, count: int, spacing_meters: float, seed: int) -> dict:
+    vertices = geometry = route_json = route_json_gz = 0
+    for row in generate_rows(count, spacing_meters, mode, seed):
+        hexewkb, payload, gz = row[4], row[7], row[8]
+        geometry += len(hexewkb) // 2
+        # Little-endian EWKB LineString: byte order, type, SRID, then the point count.
+        vertices += int.from_bytes(bytes.fromhex(hexewkb[18:26]), "little")
+        route_json += len(payload.encode()) if payload != "null" else 0
+        route_json_gz += len(gz) if gz else 0
+    return {
+        "mode": mode,
+        "routes": count,
+        "vertices": vertices,
+        "geometry_bytes": geometry,
+        "route_json_bytes": route_json,
+        "route_json_gz_bytes": route_json_gz,
+        "payload_bytes": geometry + route_json + route_json_gz,
+    }
+
+
+def run(mode: str, count: int, spacing_meters: float, seed: int) -> dict:
+    table = f"bench_route_{mode}"
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(f"CREATE TABLE {table} (LIKE routing_route INCLUDING DEFAULTS INCLUDING STORAGE)")
+        t0 = time.perf_counter()
+        batch = []
+        for row in generate_rows(count, spacing_meters, mode, seed):
+            batch.append(row)
+            if len(batch) == 1000:
+                cursor.executemany(f"INSERT INTO {table} ({COLUMNS}) VALUES ({PLACEHOLDERS})", batch)
+                batch = []
+        if batch:
+            cursor.executemany(f"INSERT INTO {table} ({COLUMNS}) VALUES ({PLACEHOLDERS})", batch)
+        load_seconds = time.perf_counter() - t0
+        cursor.execute(f"CREATE INDEX ON {table} USING GIST (geometry)")
+        cursor.execute(f"VACUUM ANALYZE {table}")
+        cursor.execute(
+            "SELECT pg_total_relation_size(%s), pg_relation_size(%s), pg_indexes_size(%s),"
+            " COALESCE(pg_total_relation_size(reltoastrelid), 0) FROM pg_class WHERE oid = %s::regclass",
+            [table, table, table, table],
+        )
+        total, heap, indexes, toast = cursor.fetchone()
+        cursor.execute(f"SELECT SUM(ST_NPoints(geometry::geometry)) FROM {table}")
+        vertices = cursor.fetchone()[0]
+        t0 = time.perf_counter()
+        cursor.execute(
+            f"SELECT date_trunc('day', created_at), COUNT(*), SUM(total_cost) FROM {table} GROUP BY 1"
+        )
+        cursor.fetchall()
+        analytics_ms = (time.perf_counter() - t0) * 1000
+    return {
+        "mode": mode,
+        "routes": count,
+        "vertices": vertices,
+        "total_bytes": total,
+        "heap_bytes": heap,
+        "toast_bytes": toast,
+        "index_bytes": indexes,
+        "load_seconds": round(load_seconds, 1),
+        "analytics_ms": round(analytics_ms, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--routes", type=int, default=100_000)
+    parser.add_argument("--modes", nargs="+", choices=STORAGE_MODES, default=list(STORAGE_MODES))
+    parser.add_argument("--spacing-meters", type=float, default=150, help="vertex spacing of generated polylines")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep", action="store_true", help="leave bench_route_<mode> tables in place")
+    parser.add_argument("--offline", action="store_true", help="column payload sizes only, no database")
+    args = parser.parse_args()
+
+    if args.offline:
+        results = {}
+        for mode in args.modes:
+            results[mode] = payload_sizes(mode, args.routes, args.spacing_meters, args.seed)
+            baseline = results.get("full")
+            if baseline and mode != "full":
+                results[mode]["payload_change_pct"] = round(
+                    (results[mode]["payload_bytes"] - baseline["payload_bytes"]) / baseline["payload_bytes"] * 100, 1
+                )
+            print(json.dumps(results[mode]))
+        return
+
+    results = {}
+    try:
+        for mode in args.modes:
+            results[mode] = run(mode, args.routes, args.spacing_meters, args.seed)
+            baseline = results.get("full")
+            if baseline and mode != "full":
+                results[mode]["total_change_pct"] = round(
+                    (results[mode]["total_bytes"] - baseline["total_bytes"]) / baseline["total_bytes"] * 100, 1
+                )
+            print(json.dumps(results[mode]))
+    finally:
+        if not args.keep:
+            with connection.cursor() as cursor:
+                for mode in args.modes:
+                    cursor.execute(f"DROP TABLE IF EXISTS bench_route_{mode}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Compare dijkstra, A* and bidirectional search on synthetic corridor graphs.
+
+    python benchmarks/search_algorithms.py --stations 100 400 1000 --repeat 5
+
+Prints one JSON object per corridor size with nodes expanded and wall time
+per algorithm, plus the path cost so regressions in optimality stand out.
+"""
+
+import argparse
+import json
+import random
+import time
+from decimal import Decimal
+
+from _bootstrap import setup_django
+
+setup_django()
+
+from routing.services import (  # noqa: E402
+    StationNode,
+    a_star,
+    bidirectional_dijkstra,
+    build_graph,
+    dijkstra,
+    fuel_cost_heuristic,
+)
+
+
+def corridor_nodes(count: int, seed: int):
+    # New York -> Los Angeles, stations scattered within ~0.3 deg of the line.
+    rng = random.Random(seed)
+    start = StationNode(id=-1, lon=-74.0, lat=40.7, price=Decimal("3.500"), name="start")
+    end = StationNode(id=-2, lon=-118.2, lat=34.0, price=Decimal("3.500"), name="end")
+    stations = []
+    for i in range(1, count + 1):
+        t = rng.random()
+        stations.append(
+            StationNode(
+                id=i,
+                lon=start.lon + (end.lon - start.lon) * t + rng.uniform(-0.3, 0.3),
+                lat=start.lat + (end.lat - start.lat) * t + rng.uniform(-0.3, 0.3),
+                price=Decimal(str(round(rng.uniform(2.8, 4.5), 3))),
+                name=f"S{i}",
+            )
+        )
+    return start, end, [start, end] + stations
+
+
+def run(graph, search, repeat: int) -> dict:
+    stats: dict = {}
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        path = search(stats)
+        best = min(best, time.perf_counter() - t0)
+    cost = sum(graph[path[i]][path[i + 1]] for i in range(len(path) - 1))
+    return {"expanded": stats["expanded"], "ms": round(best * 1000, 3), "cost": round(cost, 4)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stations", type=int, nargs="+", default=[100, 400, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    for count in args.stations:
+        start, end, nodes = corridor_nodes(count, args.seed)
+        graph = build_graph(nodes)
+        heuristic = fuel_cost_heuristic(nodes, end)
+        result = {
+            "stations": count,
+            "edges": sum(len(edges) for edges in graph.values()),
+            "dijkstra": run(graph, lambda s: dijkstra(graph, start.id, end.id, stats=s), args.repeat),
+            "astar": run(
+                graph, lambda s: a_star(graph, start.id, end.id, heuristic, stats=s), args.repeat
+            ),
+            "bidirectional": run(
+                graph, lambda s: bidirectional_dijkstra(graph, start.id, end.id, stats=s), args.repeat
+            ),
+        }
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+Station and price history queries, flat tables against the partitioned layout (needs PostGIS).
+
+    python benchmarks/station_partitions.py --stations 1000000 --history-rows 3000000
+    python benchmarks/station_partitions.py --stations 200000 --history-rows 500000 --keep
+
+Generates synthetic stations spread over the census-division regions of ingest
+migration 0002 and a year of price history, then loads both into two scratch
+layouts: flat tables with the indexes from before that migration
+(bench_station_flat, bench_history_flat) and copies of the partitioned tables
+(bench_station_part, bench_history_part). For each layout it times corridor
+tile fetches, nearby KNN lookups, a one-state export, a station's latest price,
+a one-month price aggregate and dropping the oldest month. Each query prints
+its median time and, from EXPLAIN (ANALYZE, BUFFERS) of one run, the buffers
+touched and heap fetches of index-only scans. Scratch tables are dropped
+afterwards unless --keep is given.
+"""
+
+import argparse
+import importlib
+import json
+import math
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from _bootstrap import setup_django
+
+setup_django()
+
+from django.contrib.gis.geos import MultiPolygon, Polygon  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from routing.tiles import QUERY_PAD_DEGREES, corridor_segment_index, tile_ranges  # noqa: E402
+
+REGIONS = importlib.import_module("ingest.migrations.0002_partition_stations_and_price_history").REGIONS
+
+# Rough (min_lon, min_lat, max_lon, max_lat) per region; stations land
+# uniformly inside their region's box.
+REGION_BOUNDS = {
+    "new_england": (-73.7, 41.0, -67.0, 47.4),
+    "mid_atlantic": (-80.5, 39.7, -72.0, 45.0),
+    "east_north_central": (-91.5, 37.0, -80.5, 47.0),
+    "west_north_central": (-104.0, 36.5, -89.5, 49.0),
+    "south_atlantic": (-87.6, 25.0, -75.5, 39.7),
+    "east_south_central": (-91.6, 30.2, -81.7, 39.1),
+    "west_south_central": (-106.6, 25.9, -89.0, 37.0),
+    "mountain": (-120.0, 31.3, -102.0, 49.0),
+    "pacific": (-124.4, 32.5, -114.1, 49.0),
+}
+
+STATION_COLUMNS = "id, opis_id, name, address, city, state, price, geom, created_at, updated_at"
+HISTORY_COLUMNS = "id, station_id, opis_id, state, price, ingestion_id, observed_at"
+HISTORY_MONTHS = 12
+LAYOUTS = ("flat", "part")
+
+
+def station_ddl(layout: str) -> List[str]:
+    table = f"bench_station_{layout}"
+    columns = (
+        "id bigint NOT NULL, opis_id varchar(32) NOT NULL, name varchar(255) NOT NULL,"
+        " address varchar(255) NOT NULL, city varchar(128) NOT NULL, state varchar(32) NOT NULL,"
+        " price numeric(6, 3) NOT NULL, geom geography(Point, 4326) NULL,"
+        " created_at timestamp with time zone NOT NULL, updated_at timestamp with time zone NOT NULL"
+    )
+    if layout == "flat":
+        return [
+            f"CREATE TABLE {table} ({columns}, PRIMARY KEY (id), UNIQUE (opis_id, state))",
+            f"CREATE INDEX ON {table} (state)",
+            f"CREATE INDEX ON {table} (price)",
+            f"CREATE INDEX ON {table} USING GIST (geom)",
+        ]
+    return [
+        f"CREATE TABLE {table} ({columns},"
+        " lon double precision GENERATED ALWAYS AS (ST_X(geom::geometry)) STORED,"
+        " lat double precision GENERATED ALWAYS AS (ST_Y(geom::geometry)) STORED,"
+        " PRIMARY KEY (id, state), UNIQUE (opis_id, state)) PARTITION BY LIST (state)",
+        f"CREATE INDEX ON {table} (state)",
+        f"CREATE INDEX ON {table} USING GIST (geom) INCLUDE (price)",
+        f"CREATE INDEX ON {table} (lat, lon) INCLUDE (id, price, name)",
+        *[
+            f"CREATE TABLE {table}_{region} PARTITION OF {table} "
+            f"FOR VALUES IN ({', '.join(repr(state) for state in states)})"
+            for region, states in REGIONS.items()
+        ],
+        f"CREATE TABLE {table}_other PARTITION OF {table} DEFAULT",
+    ]
+
+
+def month_start(now: datetime, months_back: int) -> datetime:
+    index = now.year * 12 + now.month - 1 - months_back
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def history_ddl(layout: str, now: datetime) -> List[str]:
+    table = f"bench_history_{layout}"
+    columns = (
+        "id bigint NOT NULL, station_id bigint NOT NULL, opis_id varchar(32) NOT NULL,"
+        " state varchar(32) NOT NULL, price numeric(6, 3) NOT NULL, ingestion_id bigint NULL,"
+        " observed_at timestamp with time zone NOT NULL"
+    )
+    if layout == "flat":
+        return [
+            f"CREATE TABLE {table} ({columns}, PRIMARY KEY (id))",
+            f"CREATE INDEX ON {table} (station_id, observed_at) INCLUDE (price)",
+            f"CREATE INDEX ON {table} (observed_at)",
+        ]
+    statements = [
+        f"CREATE TABLE {table} ({columns}, PRIMARY KEY (id, observed_at)) PARTITION BY RANGE (observed_at)",
+        f"CREATE INDEX ON {table} (station_id, observed_at) INCLUDE (price)",
+        f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT",
+    ]
+    for back in range(HISTORY_MONTHS, -2, -1):
+        start, end = month_start(now, back), month_start(now, back - 1)
+        statements.append(
+            f"CREATE TABLE {table}_y{start:%Y}m{start:%m} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    return statements
+
+
+def generate_sources(cursor, stations: int, history_rows: int, seed: int) -> None:
+    """Synthetic rows, generated in the database once and copied into every layout."""
+    cursor.execute("SELECT setseed(%s)", [(seed % 1000) / 1000])
+    cursor.execute("DROP TABLE IF EXISTS bench_station_regions, bench_station_source, bench_history_source")
+    cursor.execute(
+        "CREATE TABLE bench_station_regions (idx int, state text, min_lon float, min_lat float,"
+        " max_lon float, max_lat float)"
+    )
+    rows = [
+        (i, state, *REGION_BOUNDS[region])
+        for i, (region, state) in enumerate(
+            (region, state) for region, states in REGIONS.items() for state in states
+        )
+    ]
+    cursor.executemany("INSERT INTO bench_station_regions VALUES (%s, %s, %s, %s, %s, %s)", rows)
+    cursor.execute(
+        f"""
+        CREATE TABLE bench_station_source AS
+        SELECT g AS id, 'BENCH-' || g AS opis_id, 'Bench ' || g AS name, '' AS address, '' AS city,
+               r.state, round((2.8 + random() * 1.7)::numeric, 3) AS price,
+               ST_SetSRID(ST_MakePoint(r.min_lon + random() * (r.max_lon - r.min_lon),
+                                       r.min_lat + random() * (r.max_lat - r.min_lat)), 4326)::geography AS geom,
+               now() AS created_at, now() AS updated_at
+        FROM generate_series(1, %s) g
+        JOIN bench_station_regions r ON r.idx = g %% {len(rows)}
+        """,
+        [stations],
+    )
+    cursor.execute(
+        """
+        CREATE TABLE bench_history_source AS
+        SELECT h.id, s.id AS station_id, s.opis_id, s.state,
+               round((2.8 + random() * 1.7)::numeric, 3) AS price, NULL::bigint AS ingestion_id, h.observed_at
+        FROM (
+            SELECT g AS id, 1 + floor(random() * %s)::bigint AS station_id,
+                   now() - random() * make_interval(days => %s) AS observed_at
+            FROM generate_series(1, %s) g
+        ) h JOIN bench_station_source s ON s.id = h.station_id
+        """,
+        [stations, HISTORY_MONTHS * 30, history_rows],
+    )
+
+
+def load(cursor, layout: str, now: datetime) -> dict:
+    sizes = {}
+    for kind, ddl, columns in (
+        ("station", station_ddl(layout), STATION_COLUMNS),
+        ("history", history_ddl(layout, now), HISTORY_COLUMNS),
+    ):
+        table = f"bench_{kind}_{layout}"
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        for statement in ddl:
+            cursor.execute(statement)
+        t0 = time.perf_counter()
+        cursor.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM bench_{kind}_source")
+        sizes[f"{kind}_load_seconds"] = round(time.perf_counter() - t0, 1)
+        # Index-only scans need the visibility map set.
+        cursor.execute(f"VACUUM ANALYZE {table}")
+        cursor.execute(
+            "SELECT COALESCE(SUM(pg_total_relation_size(relid)), 0) FROM pg_partition_tree(%s::regclass)", [table]
+        )
+        sizes[f"{kind}_total_bytes"] = int(cursor.fetchone()[0])
+    return sizes
+
+
+def plan_stats(plan: dict) -> dict:
+    """Buffers, heap fetches and scan types of an EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) plan."""
+    heap_fetches, scans = 0, set()
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if "Scan" in node["Node Type"]:
+            scans.add(node["Node Type"])
+        heap_fetches += node.get("Heap Fetches", 0)
+        stack.extend(node.get("Plans", []))
+    return {
+        "buffers": plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0),
+        "heap_fetches": heap_fetches,
+        "scans": sorted(scans),
+    }
+
+
+def measure(cursor, queries: Sequence[Tuple[str, list]]) -> dict:
+    cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {queries[0][0]}", queries[0][1])
+    raw = cursor.fetchone()[0]
+    plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+    samples = []
+    for sql, params in queries:
+        t0 = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        samples.append(time.perf_counter() - t0)
+    return {"p50_ms": round(statistics.median(samples) * 1000, 2), **plan_stats(plan)}
+
+
+def corridor_tiles(rng: random.Random, corridor_miles: float, size: float) -> list:
+    # A straight 200-400 mile corridor through one of the regions, in 50 segments.
+    min_lon, min_lat, max_lon, max_lat = REGION_BOUNDS[rng.choice(list(REGION_BOUNDS))]
+    lon, lat = rng.uniform(min_lon, max_lon), rng.uniform(min_lat, max_lat)
+    heading, miles = rng.uniform(0, 2 * math.pi), rng.uniform(200, 400)
+    dlon = miles / 69.17 / math.cos(math.radians(lat)) * math.cos(heading)
+    dlat = miles / 69.05 * math.sin(heading)
+    coords = [(lon + dlon * i / 50, lat + dlat * i / 50) for i in range(51)]
+    return list(corridor_segment_index(coords, corridor_miles, size))
+
+
+def tile_query(layout: str, tiles: list, size: float) -> Tuple[str, list]:
+    table = f"bench_station_{layout}"
+    if layout == "flat":
+        # The query fetch_tiles ran before migration 0002.
+        area = MultiPolygon(
+            [
+                Polygon.from_bbox(
+                    (
+                        tx * size - QUERY_PAD_DEGREES,
+                        ty * size - QUERY_PAD_DEGREES,
+                        (tx + 1) * size + QUERY_PAD_DEGREES,
+                        (ty + 1) * size + QUERY_PAD_DEGREES,
+                    )
+                )
+                for tx, ty in tiles
+            ],
+            srid=4326,
+        ).unary_union
+        return f"SELECT id, geom, price, name FROM {table} WHERE ST_Intersects(geom, %s::geography)", [area.ewkt]
+    ranges = tile_ranges(tiles, size)
+    sql = " UNION ALL ".join(
+        f"(SELECT id, lon, lat, price, name FROM {table} WHERE lat >= %s AND lat <= %s AND lon >= %s AND lon <= %s)"
+        for _ in ranges
+    )
+    return sql, [value for box in ranges for value in box]
+
+
+def nearby_query(table: str, rng: random.Random) -> Tuple[str, list]:
+    # The 20 closest stations within 50 miles, as /api/stations/nearby/ orders by distance.
+    lon, lat = rng.uniform(-110, -75), rng.uniform(30, 45)
+    sql = (
+        f"SELECT id, price FROM {table} WHERE ST_DWithin(geom, ST_MakePoint(%s, %s)::geography, 80467)"
+        " ORDER BY geom <-> ST_MakePoint(%s, %s)::geography LIMIT 20"
+    )
+    return sql, [lon, lat, lon, lat]
+
+
+def history_queries(layout: str, rng: random.Random, stations: int, repeat: int, now: datetime) -> Dict[str, list]:
+    table = f"bench_history_{layout}"
+    latest = [
+        (
+            f"SELECT price, observed_at FROM {table} WHERE station_id = %s ORDER BY observed_at DESC LIMIT 1",
+            [rng.randint(1, stations)],
+        )
+        for _ in range(repeat)
+    ]
+    months = [
+        (
+            f"SELECT state, AVG(price), COUNT(*) FROM {table} WHERE observed_at >= %s AND observed_at < %s GROUP BY state",
+            [month_start(now, back), month_start(now, back - 1)],
+        )
+        for back in [rng.randint(1, HISTORY_MONTHS - 1) for _ in range(repeat)]
+    ]
+    return {"history_latest_price": latest, "history_month_by_state": months}
+
+
+def drop_oldest_month(cursor, layout: str, now: datetime) -> float:
+    """Retention: delete the oldest month of history, or detach and drop its partition."""
+    table = f"bench_history_{layout}"
+    oldest = month_start(now, HISTORY_MONTHS)
+    t0 = time.perf_counter()
+    if layout == "flat":
+        cursor.execute(f"DELETE FROM {table} WHERE observed_at < %s", [month_start(now, HISTORY_MONTHS - 1)])
+    else:
+        partition = f"{table}_y{oldest:%Y}m{oldest:%m}"
+        cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {partition}")
+        cursor.execute(f"DROP TABLE {partition}")
+    return round((time.perf_counter() - t0) * 1000, 1)
+
+
+def run(layout: str, args, now: datetime) -> dict:
+    result = {"layout": layout, "stations": args.stations, "history_rows": args.history_rows}
+    table = f"bench_station_{layout}"
+    rng = random.Random(args.seed)
+    builders: Dict[str, Callable[[], Tuple[str, list]]] = {
+        "corridor_tiles": lambda: tile_query(layout, corridor_tiles(rng, args.corridor_miles, 0.25), 0.25),
+        "nearby_knn": lambda: nearby_query(table, rng),
+        "state_export": lambda: (
+            f"SELECT id, price FROM {table} WHERE state = %s",
+            [rng.choice([state for states in REGIONS.values() for state in states])],
+        ),
+    }
+    with connection.cursor() as cursor:
+        result.update(load(cursor, layout, now))
+        for name, build in builders.items():
+            result[name] = measure(cursor, [build() for _ in range(args.repeat)])
+        for name, queries in history_queries(layout, rng, args.stations, args.repeat, now).items():
+            result[name] = measure(cursor, queries)
+        result["history_drop_month_ms"] = drop_oldest_month(cursor, layout, now)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stations", type=int, default=1_000_000)
+    parser.add_argument("--history-rows", type=int, default=3_000_000)
+    parser.add_argument("--layouts", nargs="+", choices=LAYOUTS, default=list(LAYOUTS))
+    parser.add_argument("--corridor-miles", type=float, default=10)
+    parser.add_argument("--repeat", type=int, default=50, help="runs of each query")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep", action="store_true", help="leave the bench_ tables in place")
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc)
+    try:
+        with connection.cursor() as cursor:
+            generate_sources(cursor, args.stations, args.history_rows, args.seed)
+        for layout in args.layouts:
+            print(json.dumps(run(layout, args, now), default=str))
+    finally:
+        if not args.keep:
+            with connection.cursor() as cursor:
+                cursor.execute("DROP TABLE IF EXISTS bench_station_regions, bench_station_source, bench_history_source")
+                for layout in args.layouts:
+                    cursor.execute(f"DROP TABLE IF EXISTS bench_station_{layout}, bench_history_{layout}")
+
+
+if __name__ == "__main__":
+    main()
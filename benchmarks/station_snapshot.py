@@ -0,0 +1,110 @@
+"""
+Startup time and memory per worker: memory-mapped station snapshot vs a private copy.
+
+    python benchmarks/station_snapshot.py --stations 8000 1000000 --workers 4
+
+For each size a synthetic snapshot is written to a scratch directory. Then
+--workers processes start together in each mode, the way gunicorn and Celery
+workers would. Each one opens the data, touches every station and reports its
+startup time and its RSS / PSS / private memory from /proc/self/smaps_rollup
+(Linux). "mmap" maps the snapshot read-only. "heap" decodes it into Python
+tuples, which is what a per-process cache of station rows would hold. PSS
+divides shared pages among the processes that map them, so it shows the
+memory saved.
+"""
+
+import argparse
+import json
+import multiprocessing
+import random
+import tempfile
+import time
+from decimal import Decimal
+
+from _bootstrap import setup_django
+
+setup_django()
+
+from ingest.snapshot import StationSnapshot, write_snapshot  # noqa: E402
+
+
+def synthetic_rows(count: int, seed: int):
+    rng = random.Random(seed)
+    for i in range(1, count + 1):
+        yield (
+            i,
+            rng.uniform(-124.0, -67.0),
+            rng.uniform(25.0, 49.0),
+            Decimal(rng.randint(2800, 4500)).scaleb(-3),
+            f"Truck Stop #{i}",
+        )
+
+
+def memory_kb() -> dict:
+    wanted = {"Rss": "rss_mb", "Pss": "pss_mb", "Private_Clean": "private", "Private_Dirty": "private"}
+    result = {"rss_mb": 0.0, "pss_mb": 0.0, "private": 0.0}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in wanted:
+                result[wanted[key]] += int(value.split()[0]) / 1024
+    result["private_mb"] = result.pop("private")
+    return {k: round(v, 1) for k, v in result.items()}
+
+
+def worker(mode: str, path: str, barrier, results) -> None:
+    t0 = time.perf_counter()
+    snapshot = StationSnapshot(path)
+    if mode == "mmap":
+        # Touch every column page, like a first request scanning all stations.
+        checksum = sum(snapshot.lat) + sum(snapshot.price_mills) + len(bytes(snapshot._names[-1:]))
+        held = snapshot
+    else:
+        held = [snapshot.row(i) for i in range(snapshot.count)]
+        checksum = sum(row[2] for row in held)
+    startup_ms = (time.perf_counter() - t0) * 1000
+    barrier.wait()  # every worker alive at once, so PSS splits the shared pages
+    results.put({"mode": mode, "startup_ms": round(startup_ms, 1), **memory_kb(), "checksum": round(checksum)})
+    barrier.wait()
+    del held
+
+
+def run(mode: str, path: str, workers: int) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    barrier, results = ctx.Barrier(workers), ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(mode, path, barrier, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    rows = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return {
+        "mode": mode,
+        "workers": workers,
+        "startup_ms_max": max(r["startup_ms"] for r in rows),
+        "rss_mb_per_worker": round(sum(r["rss_mb"] for r in rows) / workers, 1),
+        "pss_mb_per_worker": round(sum(r["pss_mb"] for r in rows) / workers, 1),
+        "private_mb_per_worker": round(sum(r["private_mb"] for r in rows) / workers, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stations", type=int, nargs="+", default=[8_000, 1_000_000])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", nargs="+", choices=["mmap", "heap"], default=["mmap", "heap"])
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    for count in args.stations:
+        with tempfile.TemporaryDirectory() as directory:
+            t0 = time.perf_counter()
+            path = write_snapshot(directory, 1, synthetic_rows(count, args.seed))
+            write_seconds = time.perf_counter() - t0
+            for mode in args.modes:
+                result = run(mode, path, args.workers)
+                print(json.dumps({"stations": count, "write_seconds": round(write_seconds, 2), **result}))
+
+
+if __name__ == "__main__":
+    main()
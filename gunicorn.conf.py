@@ -0,0 +1,42 @@
+"""
+Gunicorn profile for the web tier. Route requests spend most of their time
+waiting on the directions provider, PostGIS and Redis, so a few processes with
+several threads each (gthread) serve more concurrent requests than sync workers
+for the same memory. Every knob can be overridden from the environment.
+"""
+
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+# A fixed count rather than one per CPU: each worker holds up to `threads`
+# Postgres connections (DB_POOL_MAX_SIZE with DB_POOL on), and the total has to
+# stay inside max_connections next to Celery. See the connection budget in README.
+workers = int(os.environ.get("GUNICORN_WORKERS", 2))
+# Keep DB_POOL_MAX_SIZE >= threads when DB_POOL is on.
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+# Recycle workers now and then to bound memory growth; jitter avoids restarting all at once.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 200))
+accesslog = os.environ.get("GUNICORN_ACCESSLOG", "-")
+
+
+def on_starting(server):
+    # Metric files from a previous master would be summed into /metrics forever.
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.endswith(".db"):
+                os.remove(os.path.join(directory, name))
+
+
+def child_exit(server, worker):
+    # Drop a recycled worker's live gauges from the multiprocess /metrics aggregation.
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,8 +1,27 @@
 import os
 from celery import Celery
+from celery.signals import worker_init, worker_process_shutdown
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "pathfinder.settings")
 
 app = Celery("pathfinder")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
+
+
+@worker_init.connect
+def start_metrics_exporter(**kwargs):
+    # Runs in the worker's main process before the pool forks.
+    from django.conf import settings
+    from pathfinder.metrics import reset_multiproc_dir, start_worker_exporter
+
+    reset_multiproc_dir()
+    start_worker_exporter(settings.WORKER_METRICS_PORT)
+
+
+@worker_process_shutdown.connect
+def mark_metrics_process_dead(pid=None, **kwargs):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(pid or os.getpid())
@@ -1,83 +1,233 @@
 from __future__ import annotations
 
+import gzip
 import json
+import sys
 import time
-from typing import Optional, Tuple
+from typing import IO, Iterable, Iterator, Optional, Tuple
 
 import requests
-import redis
 from django.conf import settings
 
-_redis = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+from ingest.models import GeocodeResult
+from pathfinder.metrics import GEOCODE_LOOKUPS
+from pathfinder.provider_http import RetryPolicy, request_with_retry
+from pathfinder.redis_pool import get_redis
+import logging
+
+logger = logging.getLogger(__name__)
+
 _http = requests.Session()
 
+CACHE_SECONDS = 60 * 60 * 24 * 30
+CACHE_PREFIX = "geocode:"
+
+
+def normalize_address(address: str) -> str:
+    return address.strip().lower()
+
 
 def _cache_key(address: str) -> str:
-    return f"geocode:{address.strip().lower()}"
+    return f"{CACHE_PREFIX}{normalize_address(address)}"
 
 
-def geocode_address(address: str) -> Optional[Tuple[float, float]]:
-    """
-    Geocode an address using Mapbox first, then ORS.
-    Returns (lon, lat) or None. Caches successful hits in Redis.
-    """
-    key = _cache_key(address)
-    cached = _redis.get(key)
+def _cache_get(key: str) -> Optional[Tuple[float, float]]:
+    try:
+        cached = get_redis().get(key)
+    except Exception as exc:  # the durable store answers while Redis is down
+        logger.warning("Geocode cache read failed: %s", exc)
+        return None
     if cached:
         try:
             lon, lat = json.loads(cached)
             return float(lon), float(lat)
         except (ValueError, TypeError):
             pass
+    return None
+
+
+def _cache_set(key: str, coords: Tuple[float, float]) -> None:
+    try:
+        get_redis().set(key, json.dumps(coords), ex=CACHE_SECONDS)
+    except Exception as exc:
+        logger.warning("Geocode cache write failed: %s", exc)
 
-    # Mapbox primary
-    if settings.MAPBOX_API_KEY:
-        coords = _geocode_mapbox(address)
-        if coords:
-            _redis.set(key, json.dumps(coords), ex=60 * 60 * 24 * 30)
-            return coords
 
-    # ORS fallback
-    if settings.ORS_API_KEY:
-        coords = _geocode_ors(address)
+def stored_geocode(address: str) -> Optional[Tuple[float, float]]:
+    row = GeocodeResult.objects.filter(address=normalize_address(address)).values_list("lon", "lat").first()
+    return (row[0], row[1]) if row else None
+
+
+def store_geocode(address: str, coords: Tuple[float, float], provider: str = "") -> None:
+    GeocodeResult.objects.update_or_create(
+        address=normalize_address(address),
+        defaults={"lon": coords[0], "lat": coords[1], "provider": provider},
+    )
+
+
+def geocode_address(address: str) -> Optional[Tuple[float, float]]:
+    """
+    Geocode an address using Mapbox first, then ORS.
+    Returns (lon, lat) or None. Lookups go Redis -> GeocodeResult table ->
+    providers; provider hits are written through to both, and a table hit
+    re-fills Redis after an eviction.
+    """
+    key = _cache_key(address)
+    coords = _cache_get(key)
+    if coords:
+        GEOCODE_LOOKUPS.labels("redis").inc()
+        return coords
+
+    coords = stored_geocode(address)
+    if coords:
+        GEOCODE_LOOKUPS.labels("store").inc()
+        _cache_set(key, coords)
+        return coords
+
+    for provider, enabled, geocode in (
+        ("mapbox", settings.MAPBOX_API_KEY, _geocode_mapbox),  # Mapbox primary
+        ("ors", settings.ORS_API_KEY, _geocode_ors),  # ORS fallback
+    ):
+        if not enabled:
+            continue
+        coords = geocode(address)
         if coords:
-            _redis.set(key, json.dumps(coords), ex=60 * 60 * 24 * 30)
+            GEOCODE_LOOKUPS.labels(provider).inc()
+            store_geocode(address, coords, provider)
+            _cache_set(key, coords)
             return coords
 
+    GEOCODE_LOOKUPS.labels("miss").inc()
     return None
 
 
+def load_geocodes_into_redis(batch_size: int = 5000) -> int:
+    """Copy every stored geocode into Redis, one pipeline per batch. Returns rows loaded."""
+    loaded = 0
+    rows = GeocodeResult.objects.order_by().values_list("address", "lon", "lat").iterator(chunk_size=batch_size)
+    pipe = get_redis().pipeline(transaction=False)
+    for address, lon, lat in rows:
+        pipe.set(_cache_key(address), json.dumps((lon, lat)), ex=CACHE_SECONDS)
+        loaded += 1
+        if loaded % batch_size == 0:
+            pipe.execute()
+    pipe.execute()
+    return loaded
+
+
+def open_geocode_dump(path: str, mode: str) -> IO[str]:
+    """NDJSON dump file for the import/export commands; gzip for *.gz, stdin/stdout for '-'."""
+    if path == "-":
+        return sys.stdin if mode == "r" else sys.stdout
+    opener = gzip.open if path.endswith(".gz") else open
+    return opener(path, mode + "t", encoding="utf-8")
+
+
+def export_geocodes(out: IO[str]) -> int:
+    """Write the store as NDJSON lines of address/lon/lat/provider. Returns rows written."""
+    written = 0
+    rows = GeocodeResult.objects.order_by("address").values("address", "lon", "lat", "provider")
+    for row in rows.iterator(chunk_size=5000):
+        out.write(json.dumps(row) + "\n")
+        written += 1
+    return written
+
+
+def read_geocode_lines(lines: Iterable[str]) -> Iterator[dict]:
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            yield {
+                "address": normalize_address(record["address"]),
+                "lon": float(record["lon"]),
+                "lat": float(record["lat"]),
+                "provider": record.get("provider") or "",
+            }
+        except (ValueError, TypeError, KeyError, AttributeError) as exc:
+            raise ValueError(f"line {number}: {exc!r}") from exc
+
+
+def redis_geocodes(batch_size: int = 1000) -> Iterator[dict]:
+    """Geocodes currently cached in Redis, for seeding the store from a running environment."""
+    redis = get_redis()
+    keys = []
+    for key in redis.scan_iter(match=f"{CACHE_PREFIX}*", count=batch_size):
+        keys.append(key)
+        if len(keys) >= batch_size:
+            yield from _decode_cached(keys, redis.mget(keys))
+            keys = []
+    if keys:
+        yield from _decode_cached(keys, redis.mget(keys))
+
+
+def _decode_cached(keys, values) -> Iterator[dict]:
+    for key, value in zip(keys, values):
+        try:
+            lon, lat = json.loads(value)
+        except (ValueError, TypeError):
+            continue
+        address = key.decode() if isinstance(key, bytes) else key
+        yield {"address": address[len(CACHE_PREFIX) :], "lon": float(lon), "lat": float(lat), "provider": ""}
+
+
+def import_geocodes(records: Iterable[dict], batch_size: int = 5000) -> int:
+    """
+    Upsert records into the store in batches; an address already stored gets
+    the imported coordinates. Returns rows written.
+    """
+    written = 0
+    batch = []
+    for record in records:
+        batch.append(GeocodeResult(**record))
+        if len(batch) >= batch_size:
+            written += _upsert(batch)
+            batch = []
+    if batch:
+        written += _upsert(batch)
+    return written
+
+
+def _upsert(batch) -> int:
+    # A dump may repeat an address; Postgres rejects one statement touching a row twice.
+    unique = list({result.address: result for result in batch}.values())
+    GeocodeResult.objects.bulk_create(
+        unique,
+        update_conflicts=True,
+        unique_fields=["address"],
+        update_fields=["lon", "lat", "provider", "updated_at"],
+    )
+    return len(unique)
+
+
 def _geocode_mapbox(address: str) -> Optional[Tuple[float, float]]:
     url = f"{settings.MAPBOX_GEOCODING_BASE_URL.rstrip('/')}/{address}.json"
     params = {"access_token": settings.MAPBOX_API_KEY, "limit": 1, "autocomplete": "false"}
-    for _ in range(max(1, settings.MAPBOX_GEOCODE_MAX_ATTEMPTS)):
-        try:
-            resp = _http.get(url, params=params, timeout=settings.HTTP_TIMEOUT_SECONDS)
-            if not resp.ok:
-                continue
-            data = resp.json()
-            feat = data.get("features", [])
-            if not feat:
-                return None
-            lon, lat = feat[0]["center"]
-            return float(lon), float(lat)
-        except Exception:
-            continue
-    return None
+    policy = RetryPolicy.from_settings(settings.MAPBOX_GEOCODE_MAX_ATTEMPTS)
+    try:
+        resp = request_with_retry(_http, "GET", url, policy, params=params)
+        if not resp.ok:
+            return None
+        feat = resp.json().get("features", [])
+        if not feat:
+            return None
+        lon, lat = feat[0]["center"]
+        return float(lon), float(lat)
+    except (requests.RequestException, ValueError, KeyError, IndexError, TypeError):
+        return None
 
 
 def _geocode_ors(address: str) -> Optional[Tuple[float, float]]:
     url = settings.ORS_GEOCODING_URL
     params = {"api_key": settings.ORS_API_KEY, "text": address, "size": 1}
-    for _ in range(max(1, settings.ORS_GEOCODE_MAX_ATTEMPTS)):
-        try:
-            resp = _http.get(url, params=params, timeout=settings.HTTP_TIMEOUT_SECONDS)
-            if not resp.ok:
-                continue
-            data = resp.json()
-            feat = data["features"][0]
-            lon, lat = feat["geometry"]["coordinates"]
-            return float(lon), float(lat)
-        except Exception:
-            continue
-    return None
+    policy = RetryPolicy.from_settings(settings.ORS_GEOCODE_MAX_ATTEMPTS)
+    try:
+        resp = request_with_retry(_http, "GET", url, policy, params=params)
+        if not resp.ok:
+            return None
+        feat = resp.json()["features"][0]
+        lon, lat = feat["geometry"]["coordinates"]
+        return float(lon), float(lat)
+    except (requests.RequestException, ValueError, KeyError, IndexError, TypeError):
+        return None
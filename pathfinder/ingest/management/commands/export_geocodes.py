@@ -0,0 +1,21 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from pathfinder.geocode import export_geocodes, open_geocode_dump
+
+
+class Command(BaseCommand):
+    help = "Dump the durable geocode store as NDJSON, to seed other environments without provider calls."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("output", help="file to write (gzip when it ends in .gz; '-' for stdout)")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        out = open_geocode_dump(options["output"], "w")
+        try:
+            written = export_geocodes(out)
+        finally:
+            if options["output"] != "-":
+                out.close()
+        self.stderr.write(f"exported {written} geocodes")
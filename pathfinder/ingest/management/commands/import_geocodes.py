@@ -0,0 +1,44 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from pathfinder.geocode import (
+    import_geocodes,
+    load_geocodes_into_redis,
+    open_geocode_dump,
+    read_geocode_lines,
+    redis_geocodes,
+)
+
+
+class Command(BaseCommand):
+    help = "Load geocodes into the durable store from an export_geocodes dump, or from the Redis cache."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("source", nargs="?", help="NDJSON dump (gzip when it ends in .gz; '-' for stdin)")
+        parser.add_argument(
+            "--from-redis", action="store_true", help="copy the geocodes cached in Redis instead of reading a dump"
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--load-redis", action="store_true", help="bulk-load the whole store into Redis afterwards")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if bool(options["source"]) == options["from_redis"]:
+            raise CommandError("Give either a dump file or --from-redis")
+        if options["from_redis"]:
+            imported = import_geocodes(redis_geocodes(), options["batch_size"])
+        else:
+            try:
+                source = open_geocode_dump(options["source"], "r")
+            except OSError as exc:
+                raise CommandError(f"Cannot read {options['source']}: {exc}") from exc
+            try:
+                imported = import_geocodes(read_geocode_lines(source), options["batch_size"])
+            except ValueError as exc:
+                raise CommandError(f"Bad geocode dump {options['source']}: {exc}") from exc
+            finally:
+                if options["source"] != "-":
+                    source.close()
+        self.stdout.write(f"imported {imported} geocodes")
+        if options["load_redis"]:
+            self.stdout.write(f"loaded {load_geocodes_into_redis(options['batch_size'])} geocodes into Redis")
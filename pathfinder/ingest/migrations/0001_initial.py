@@ -0,0 +1,78 @@
+from django.db import migrations, models
+import django.contrib.gis.db.models.fields
+import django.utils.timezone
+
+# The tables as `migrate --run-syncdb` used to create them. Existing databases
+# record this migration without running it: `python manage.py migrate --fake-initial`.
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="Ingestion",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("source", models.CharField(default="upload", max_length=64)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("processing", "Processing"),
+                            ("success", "Success"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=16,
+                    ),
+                ),
+                ("error_message", models.TextField(blank=True)),
+                ("meta", models.JSONField(blank=True, default=dict)),
+                ("started_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="FuelStation",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("opis_id", models.CharField(max_length=32)),
+                ("name", models.CharField(max_length=255)),
+                ("address", models.CharField(max_length=255)),
+                ("city", models.CharField(max_length=128)),
+                ("state", models.CharField(max_length=32)),
+                ("price", models.DecimalField(decimal_places=3, max_digits=6)),
+                (
+                    "geom",
+                    django.contrib.gis.db.models.fields.PointField(blank=True, geography=True, null=True, srid=4326),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["state"], name="ingest_fuel_state_72064b_idx"),
+                    models.Index(fields=["price"], name="ingest_fuel_price_3eb4e7_idx"),
+                    models.Index(fields=["geom"], name="fuelstation_geom_idx"),
+                ],
+                "unique_together": {("opis_id", "state")},
+            },
+        ),
+        migrations.CreateModel(
+            name="GeocodeResult",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("address", models.CharField(max_length=512, unique=True)),
+                ("lon", models.FloatField()),
+                ("lat", models.FloatField()),
+                ("provider", models.CharField(blank=True, max_length=16)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,237 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+# FuelStation becomes list-partitioned by state, one partition per census
+# division plus a default for anything else, so state filters prune to one
+# partition and each region's indexes stay small. Postgres requires the
+# partition key in the primary key, so it becomes (id, state); ids still come
+# from one identity sequence and stay unique, which is all the ORM relies on.
+#
+# Stored lon/lat columns carry a covering (lat, lon) B-tree index with id,
+# price and name, so the tile query reads stations without touching the heap.
+# The GiST index on geom includes price as well, but geography GiST keys are
+# lossy boxes, so queries through it still recheck rows in the heap.
+#
+# Prices are also appended to ingest_fuelpricehistory, range-partitioned by
+# month on observed_at like routing_route (routing migration 0007), and seeded
+# here with each station's current price.
+#
+# All of this is SQL: Django's PostGIS schema editor drops `include` from
+# spatial indexes and knows nothing of partitions. The state operations keep
+# the models in step.
+
+REGIONS = {
+    "new_england": ["CT", "ME", "MA", "NH", "RI", "VT"],
+    "mid_atlantic": ["NJ", "NY", "PA"],
+    "east_north_central": ["IL", "IN", "MI", "OH", "WI"],
+    "west_north_central": ["IA", "KS", "MN", "MO", "NE", "ND", "SD"],
+    "south_atlantic": ["DE", "DC", "FL", "GA", "MD", "NC", "SC", "VA", "WV"],
+    "east_south_central": ["AL", "KY", "MS", "TN"],
+    "west_south_central": ["AR", "LA", "OK", "TX"],
+    "mountain": ["AZ", "CO", "ID", "MT", "NV", "NM", "UT", "WY"],
+    "pacific": ["AK", "CA", "HI", "OR", "WA"],
+}
+
+STATION_COLUMNS = "id, opis_id, name, address, city, state, price, geom, created_at, updated_at"
+
+STATION_PARTITIONS = [
+    f"CREATE TABLE ingest_fuelstation_{region} PARTITION OF ingest_fuelstation "
+    f"FOR VALUES IN ({', '.join(repr(state) for state in states)})"
+    for region, states in REGIONS.items()
+] + ["CREATE TABLE ingest_fuelstation_other PARTITION OF ingest_fuelstation DEFAULT"]
+
+DROP_OLD_STATION_INDEXES = """
+DO $$
+DECLARE item record;
+BEGIN
+    FOR item IN
+        SELECT conname FROM pg_constraint
+        WHERE conrelid = 'ingest_fuelstation_old'::regclass AND contype = 'u'
+    LOOP
+        EXECUTE format('ALTER TABLE ingest_fuelstation_old DROP CONSTRAINT %I', item.conname);
+    END LOOP;
+    FOR item IN
+        SELECT indexname FROM pg_indexes
+        WHERE schemaname = current_schema()
+          AND tablename = 'ingest_fuelstation_old'
+          AND indexname <> 'ingest_fuelstation_old_pkey'
+    LOOP
+        EXECUTE format('DROP INDEX %I', item.indexname);
+    END LOOP;
+END
+$$;
+"""
+
+RESET_STATION_SEQUENCE = """
+SELECT setval(pg_get_serial_sequence('ingest_fuelstation', 'id'), COALESCE(MAX(id), 0) + 1, false)
+FROM ingest_fuelstation;
+"""
+
+ENSURE_HISTORY_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION ingest_fuelpricehistory_ensure_partitions(first_month date, last_month date)
+RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    month date := date_trunc('month', first_month)::date;
+    partition text;
+    created integer := 0;
+BEGIN
+    WHILE month <= last_month LOOP
+        partition := format('ingest_fuelpricehistory_y%sm%s', to_char(month, 'YYYY'), to_char(month, 'MM'));
+        IF to_regclass(partition) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF ingest_fuelpricehistory FOR VALUES FROM (%L) TO (%L)',
+                partition,
+                month::timestamp AT TIME ZONE 'UTC',
+                (month + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+            );
+            created := created + 1;
+        END IF;
+        month := (month + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END
+$$;
+"""
+
+FORWARD = [
+    "ALTER TABLE ingest_fuelstation RENAME TO ingest_fuelstation_old",
+    "ALTER TABLE ingest_fuelstation_old RENAME CONSTRAINT ingest_fuelstation_pkey TO ingest_fuelstation_old_pkey",
+    DROP_OLD_STATION_INDEXES,
+    """
+    CREATE TABLE ingest_fuelstation (
+        LIKE ingest_fuelstation_old INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING STORAGE,
+        lon double precision GENERATED ALWAYS AS (ST_X(geom::geometry)) STORED,
+        lat double precision GENERATED ALWAYS AS (ST_Y(geom::geometry)) STORED
+    ) PARTITION BY LIST (state)
+    """,
+    "ALTER TABLE ingest_fuelstation ADD CONSTRAINT ingest_fuelstation_pkey PRIMARY KEY (id, state)",
+    "ALTER TABLE ingest_fuelstation ADD CONSTRAINT ingest_fuelstation_opis_id_state_uniq UNIQUE (opis_id, state)",
+    "CREATE INDEX ingest_fuel_state_72064b_idx ON ingest_fuelstation (state)",
+    "CREATE INDEX fuelstation_geom_idx ON ingest_fuelstation USING GIST (geom) INCLUDE (price)",
+    "CREATE INDEX fuelstation_lat_lon_idx ON ingest_fuelstation (lat, lon) INCLUDE (id, price, name)",
+    *STATION_PARTITIONS,
+    f"INSERT INTO ingest_fuelstation ({STATION_COLUMNS}) SELECT {STATION_COLUMNS} FROM ingest_fuelstation_old",
+    "DROP TABLE ingest_fuelstation_old",
+    RESET_STATION_SEQUENCE,
+    """
+    CREATE TABLE ingest_fuelpricehistory (
+        id bigint GENERATED BY DEFAULT AS IDENTITY,
+        station_id bigint NOT NULL,
+        opis_id varchar(32) NOT NULL,
+        state varchar(32) NOT NULL,
+        price numeric(6, 3) NOT NULL,
+        ingestion_id bigint NULL,
+        observed_at timestamp with time zone NOT NULL,
+        CONSTRAINT ingest_fuelpricehistory_pkey PRIMARY KEY (id, observed_at)
+    ) PARTITION BY RANGE (observed_at)
+    """,
+    "CREATE INDEX fuelpricehistory_station_idx ON ingest_fuelpricehistory (station_id, observed_at) INCLUDE (price)",
+    ENSURE_HISTORY_PARTITIONS_FUNCTION,
+    # Catches rows outside the pre-created months; ingest.tasks.create_price_history_partitions
+    # keeps PRICE_HISTORY_PARTITION_MONTHS_AHEAD months ready so it normally stays empty.
+    "CREATE TABLE ingest_fuelpricehistory_default PARTITION OF ingest_fuelpricehistory DEFAULT",
+    """
+    SELECT ingest_fuelpricehistory_ensure_partitions(
+        COALESCE((SELECT MIN(updated_at) FROM ingest_fuelstation), now())::date,
+        (now() + interval '3 months')::date
+    )
+    """,
+    """
+    INSERT INTO ingest_fuelpricehistory (station_id, opis_id, state, price, observed_at)
+    SELECT id, opis_id, state, price, updated_at FROM ingest_fuelstation
+    """,
+]
+
+BACKWARD = [
+    "DROP TABLE ingest_fuelpricehistory",
+    "DROP FUNCTION ingest_fuelpricehistory_ensure_partitions(date, date)",
+    """
+    CREATE TABLE ingest_fuelstation_flat (
+        LIKE ingest_fuelstation INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING STORAGE
+    )
+    """,
+    # LIKE without INCLUDING GENERATED copies lon/lat as plain columns.
+    "ALTER TABLE ingest_fuelstation_flat DROP COLUMN lon, DROP COLUMN lat",
+    f"INSERT INTO ingest_fuelstation_flat ({STATION_COLUMNS}) SELECT {STATION_COLUMNS} FROM ingest_fuelstation",
+    "DROP TABLE ingest_fuelstation",
+    "ALTER TABLE ingest_fuelstation_flat RENAME TO ingest_fuelstation",
+    "ALTER TABLE ingest_fuelstation ADD CONSTRAINT ingest_fuelstation_pkey PRIMARY KEY (id)",
+    "ALTER TABLE ingest_fuelstation ADD CONSTRAINT ingest_fuelstation_opis_id_state_uniq UNIQUE (opis_id, state)",
+    "CREATE INDEX ingest_fuel_state_72064b_idx ON ingest_fuelstation (state)",
+    "CREATE INDEX ingest_fuel_price_3eb4e7_idx ON ingest_fuelstation (price)",
+    "CREATE INDEX fuelstation_geom_idx ON ingest_fuelstation USING GIST (geom)",
+    RESET_STATION_SEQUENCE,
+]
+
+
+def station_coordinate(function: str) -> models.Func:
+    return models.Func(
+        models.F("geom"), template=f"{function}(%(expressions)s::geometry)", output_field=models.FloatField()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ingest", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunSQL(FORWARD, reverse_sql=BACKWARD)],
+            state_operations=[
+                migrations.AddField(
+                    model_name="fuelstation",
+                    name="lon",
+                    field=models.GeneratedField(
+                        db_persist=True, expression=station_coordinate("ST_X"), output_field=models.FloatField()
+                    ),
+                ),
+                migrations.AddField(
+                    model_name="fuelstation",
+                    name="lat",
+                    field=models.GeneratedField(
+                        db_persist=True, expression=station_coordinate("ST_Y"), output_field=models.FloatField()
+                    ),
+                ),
+                migrations.RemoveIndex(model_name="fuelstation", name="ingest_fuel_price_3eb4e7_idx"),
+                migrations.RemoveIndex(model_name="fuelstation", name="fuelstation_geom_idx"),
+                migrations.AddIndex(
+                    model_name="fuelstation",
+                    index=models.Index(fields=["geom"], include=["price"], name="fuelstation_geom_idx"),
+                ),
+                migrations.AddIndex(
+                    model_name="fuelstation",
+                    index=models.Index(
+                        fields=["lat", "lon"], include=["id", "price", "name"], name="fuelstation_lat_lon_idx"
+                    ),
+                ),
+                migrations.CreateModel(
+                    name="FuelPriceHistory",
+                    fields=[
+                        (
+                            "id",
+                            models.BigAutoField(
+                                auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                            ),
+                        ),
+                        ("station_id", models.BigIntegerField()),
+                        ("opis_id", models.CharField(max_length=32)),
+                        ("state", models.CharField(max_length=32)),
+                        ("price", models.DecimalField(decimal_places=3, max_digits=6)),
+                        ("ingestion_id", models.BigIntegerField(blank=True, null=True)),
+                        ("observed_at", models.DateTimeField(default=django.utils.timezone.now)),
+                    ],
+                    options={
+                        "indexes": [
+                            models.Index(
+                                fields=["station_id", "observed_at"],
+                                include=["price"],
+                                name="fuelpricehistory_station_idx",
+                            )
+                        ],
+                    },
+                ),
+            ],
+        ),
+    ]
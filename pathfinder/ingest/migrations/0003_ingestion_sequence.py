@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+# Existing successful runs are numbered in the order they finished.
+FORWARD = [
+    "CREATE SEQUENCE ingest_ingestion_sequence_seq",
+    """
+    UPDATE ingest_ingestion AS ingestion SET sequence = ordered.n
+    FROM (
+        SELECT id, row_number() OVER (ORDER BY finished_at, id) AS n
+        FROM ingest_ingestion WHERE status = 'success'
+    ) AS ordered
+    WHERE ingestion.id = ordered.id
+    """,
+    """
+    SELECT setval('ingest_ingestion_sequence_seq', COALESCE(MAX(sequence), 0) + 1, false)
+    FROM ingest_ingestion
+    """,
+]
+
+BACKWARD = ["DROP SEQUENCE ingest_ingestion_sequence_seq"]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ingest", "0002_partition_stations_and_price_history"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingestion",
+            name="sequence",
+            field=models.BigIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.RunSQL(FORWARD, reverse_sql=BACKWARD),
+    ]
@@ -1,6 +1,20 @@
+from typing import Optional
+
 from django.contrib.gis.db import models
+from django.contrib.gis.geos import Point
+from django.contrib.gis.measure import D
+from django.db.models import F, FloatField, Func
+from django.db.models.expressions import RawSQL
 from django.utils import timezone
 
+METERS_PER_MILE = 1609.34
+
+
+class IngestionQuerySet(models.QuerySet):
+    def latest_success(self) -> Optional["Ingestion"]:
+        """Most recent completed ingestion; its sequence versions the station snapshot."""
+        return self.filter(status=Ingestion.Status.SUCCESS).order_by(F("sequence").desc(nulls_last=True)).first()
+
 
 class Ingestion(models.Model):
     class Status(models.TextChoices):
@@ -17,11 +31,19 @@ class Ingestion(models.Model):
     meta = models.JSONField(default=dict, blank=True)
     started_at = models.DateTimeField(default=timezone.now)
     finished_at = models.DateTimeField(null=True, blank=True)
+    # Completion order, drawn from a database sequence by mark_success. Ids follow
+    # start order, so a long upload finishing after a short geocode run has the
+    # smaller id but the larger sequence.
+    sequence = models.BigIntegerField(null=True, blank=True, unique=True)
+
+    objects = IngestionQuerySet.as_manager()
 
     def mark_success(self) -> None:
         self.status = self.Status.SUCCESS
         self.finished_at = timezone.now()
-        self.save(update_fields=["status", "finished_at"])
+        self.sequence = RawSQL("nextval('ingest_ingestion_sequence_seq')", ())
+        self.save(update_fields=["status", "finished_at", "sequence"])
+        self.refresh_from_db(fields=["sequence"])
 
     def mark_failed(self, message: str) -> None:
         self.status = self.Status.FAILED
@@ -30,7 +52,34 @@ class Ingestion(models.Model):
         self.save(update_fields=["status", "error_message", "finished_at"])
 
 
+class FuelStationQuerySet(models.QuerySet):
+    def nearby(self, lon: float, lat: float, radius_miles: float) -> "FuelStationQuerySet":
+        """
+        Stations within radius_miles, annotated with distance_m. The distance
+        uses the KNN operator (<->) so ordering by it walks fuelstation_geom_idx.
+        """
+        point = Point(lon, lat, srid=4326)
+        return self.filter(geom__dwithin=(point, D(mi=radius_miles))).annotate(
+            distance_m=RawSQL(
+                '"ingest_fuelstation"."geom" <-> ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography',
+                (lon, lat),
+                output_field=FloatField(),
+            )
+        )
+
+
+def _coordinate(function: str) -> Func:
+    return Func(F("geom"), template=f"{function}(%(expressions)s::geometry)", output_field=FloatField())
+
+
 class FuelStation(models.Model):
+    """
+    List-partitioned by state into census-division tables (ingest migration
+    0002), so the primary key is (id, state) in the database; id alone is
+    still unique. lon/lat are stored copies of geom for the covering
+    fuelstation_lat_lon_idx that corridor tiles read from.
+    """
+
     opis_id = models.CharField(max_length=32)
     name = models.CharField(max_length=255)
     address = models.CharField(max_length=255)
@@ -38,16 +87,64 @@ class FuelStation(models.Model):
     state = models.CharField(max_length=32)
     price = models.DecimalField(max_digits=6, decimal_places=3)
     geom = models.PointField(geography=True, null=True, blank=True)
+    lon = models.GeneratedField(expression=_coordinate("ST_X"), output_field=FloatField(), db_persist=True)
+    lat = models.GeneratedField(expression=_coordinate("ST_Y"), output_field=FloatField(), db_persist=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = FuelStationQuerySet.as_manager()
+
     class Meta:
         unique_together = ("opis_id", "state")
+        # Created in SQL by migration 0002: the PostGIS schema editor drops
+        # `include` from spatial indexes.
         indexes = [
             models.Index(fields=["state"]),
-            models.Index(fields=["price"]),
-            models.Index(fields=["geom"], name="fuelstation_geom_idx"),
+            models.Index(fields=["geom"], include=["price"], name="fuelstation_geom_idx"),
+            models.Index(fields=["lat", "lon"], include=["id", "price", "name"], name="fuelstation_lat_lon_idx"),
         ]
 
     def __str__(self) -> str:  # pragma: no cover - trivial
         return f"{self.name} ({self.state})"
+
+
+class FuelPriceHistory(models.Model):
+    """
+    Append-only log of station prices, one row whenever an ingestion sees a
+    new station or a changed price. Range-partitioned by month on observed_at
+    (ingest migration 0002); ingest.tasks.create_price_history_partitions
+    keeps upcoming months created. Plain ids rather than foreign keys, so
+    rows outlive the stations they describe.
+    """
+
+    station_id = models.BigIntegerField()
+    opis_id = models.CharField(max_length=32)
+    state = models.CharField(max_length=32)
+    price = models.DecimalField(max_digits=6, decimal_places=3)
+    ingestion_id = models.BigIntegerField(null=True, blank=True)
+    observed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["station_id", "observed_at"], include=["price"], name="fuelpricehistory_station_idx"
+            ),
+        ]
+
+
+class GeocodeResult(models.Model):
+    """
+    Durable copy of every provider geocode hit, keyed by the normalized
+    address. Redis is only a cache in front of it, so an eviction or a fresh
+    Redis costs a database read instead of a paid provider call.
+    """
+
+    address = models.CharField(max_length=512, unique=True)
+    lon = models.FloatField()
+    lat = models.FloatField()
+    provider = models.CharField(max_length=16, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:  # pragma: no cover - trivial
+        return self.address
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 
-from .models import FuelStation, Ingestion
+from .models import METERS_PER_MILE, FuelStation, Ingestion
 
 
 class IngestionSerializer(serializers.ModelSerializer):
@@ -30,3 +30,33 @@ class FuelStationSerializer(serializers.ModelSerializer):
             "price",
             "geom",
         ]
+
+
+class NearbyStationsQuerySerializer(serializers.Serializer):
+    lon = serializers.FloatField(min_value=-180, max_value=180)
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    radius_miles = serializers.FloatField(default=25, min_value=0.1, max_value=500)
+    order = serializers.ChoiceField(choices=["price", "distance"], default="price")
+    limit = serializers.IntegerField(default=20, min_value=1, max_value=200)
+    cursor = serializers.CharField(required=False)
+
+
+class NearbyStationSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    opis_id = serializers.CharField()
+    name = serializers.CharField()
+    address = serializers.CharField()
+    city = serializers.CharField()
+    state = serializers.CharField()
+    price = serializers.DecimalField(max_digits=6, decimal_places=3)
+    lon = serializers.FloatField(source="geom.x")
+    lat = serializers.FloatField(source="geom.y")
+    distance_miles = serializers.SerializerMethodField()
+
+    def get_distance_miles(self, obj: FuelStation) -> float:
+        return round(obj.distance_m / METERS_PER_MILE, 2)
+
+
+class NearbyStationsResponseSerializer(serializers.Serializer):
+    results = NearbyStationSerializer(many=True)
+    next_cursor = serializers.CharField(allow_null=True)
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import bisect
+import fcntl
+import json
+import mmap
+import os
+import sys
+import tempfile
+import threading
+from array import array
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"PFSTNS1\n"
+POINTER = "CURRENT"
+LOCK = ".lock"
+# (id, lon, lat, price, name) per geocoded station.
+SnapshotRow = Tuple[int, float, float, Decimal, str]
+# Fixed-width columns in file order; names follow as offsets + one UTF-8 blob.
+COLUMNS = (("ids", "q"), ("lon", "d"), ("lat", "d"), ("price_mills", "i"), ("name_offsets", "q"))
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def snapshot_filename(version: int) -> str:
+    return f"stations-{version:012d}.bin"
+
+
+def _read_pointer(directory: str) -> str:
+    try:
+        with open(os.path.join(directory, POINTER)) as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+@contextmanager
+def _directory_lock(directory: str) -> Iterator[None]:
+    # Snapshot writers run in several worker processes; flock serialises them.
+    with open(os.path.join(directory, LOCK), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _write_private(directory: str, prefix: str, data: Iterable[bytes]) -> str:
+    """Write chunks to a new temp file only this call uses, fsynced and readable by other users."""
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=prefix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            os.fchmod(f.fileno(), 0o644)
+            for chunk in data:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return tmp
+
+
+def write_snapshot(directory: str, version: int, rows: Iterable[SnapshotRow], keep: int = 2) -> str:
+    """
+    Write rows as a columnar snapshot sorted by latitude, then point CURRENT at
+    it. The file is built in a private temp file, then renamed into place and
+    CURRENT replaced atomically under a lock on the directory, so readers see
+    either the old version or the complete new one, and CURRENT never moves
+    back to an older version even with several writers. Only the newest `keep`
+    files are left; a reader still mapping a removed file keeps its pages until
+    it swaps.
+    """
+    filename = snapshot_filename(version)
+    current = _read_pointer(directory)
+    if current > filename:
+        logger.info("Skipping station snapshot %s, %s is newer", filename, current)
+        return os.path.join(directory, current)
+
+    ordered = sorted(rows, key=lambda row: row[2])
+    columns: Dict[str, array] = {name: array(code) for name, code in COLUMNS}
+    names = bytearray()
+    columns["name_offsets"].append(0)
+    for station_id, lon, lat, price, name in ordered:
+        columns["ids"].append(station_id)
+        columns["lon"].append(lon)
+        columns["lat"].append(lat)
+        columns["price_mills"].append(int(Decimal(price).scaleb(3)))
+        names += name.encode()
+        columns["name_offsets"].append(len(names))
+
+    layout: Dict[str, List[int]] = {}
+    offset = 0
+    for name, _ in COLUMNS:
+        nbytes = len(columns[name]) * columns[name].itemsize
+        layout[name] = [offset, nbytes]
+        offset = _align(offset + nbytes)
+    layout["names"] = [offset, len(names)]
+    header = json.dumps(
+        {"version": version, "count": len(ordered), "byteorder": sys.byteorder, "columns": layout}
+    ).encode()
+    # Pad the header line so every column starts 8-byte aligned in the mapping.
+    header += b" " * (_align(len(MAGIC) + len(header) + 1) - len(MAGIC) - len(header) - 1) + b"\n"
+
+    def chunks() -> Iterator[bytes]:
+        yield MAGIC + header
+        position = 0
+        for name, _ in COLUMNS:
+            yield b"\0" * (layout[name][0] - position)
+            yield columns[name].tobytes()
+            position = layout[name][0] + layout[name][1]
+        yield b"\0" * (layout["names"][0] - position)
+        yield bytes(names)
+
+    os.makedirs(directory, exist_ok=True)
+    tmp = _write_private(directory, f".{filename}.", chunks())
+    with _directory_lock(directory):
+        # Another writer may have published a newer version since the check above.
+        current = _read_pointer(directory)
+        if current > filename:
+            os.unlink(tmp)
+            logger.info("Skipping station snapshot %s, %s is newer", filename, current)
+            return os.path.join(directory, current)
+        os.replace(tmp, os.path.join(directory, filename))
+        pointer_tmp = _write_private(directory, f".{POINTER}.", [filename.encode()])
+        os.replace(pointer_tmp, os.path.join(directory, POINTER))
+
+        for old in sorted(n for n in os.listdir(directory) if n.startswith("stations-"))[:-keep or None]:
+            if old != filename:
+                os.remove(os.path.join(directory, old))
+    return os.path.join(directory, filename)
+
+
+class StationSnapshot:
+    """
+    Read-only memory map of a snapshot file. Columns are memoryviews straight
+    into the mapping, so every worker on the host shares one copy through the
+    page cache instead of holding its own.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap.readline() != MAGIC:
+            raise ValueError(f"{path} is not a station snapshot")
+        header = json.loads(self._mmap.readline())
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(f"{path} was written on a {header['byteorder']}-endian host")
+        self.version: int = header["version"]
+        self.count: int = header["count"]
+        base = self._mmap.tell()
+        view = memoryview(self._mmap)
+        for name, code in COLUMNS:
+            start, nbytes = header["columns"][name]
+            setattr(self, name, view[base + start : base + start + nbytes].cast(code))
+        start, nbytes = header["columns"]["names"]
+        self._names = view[base + start : base + start + nbytes]
+
+    def name(self, i: int) -> str:
+        return bytes(self._names[self.name_offsets[i] : self.name_offsets[i + 1]]).decode()
+
+    def row(self, i: int) -> SnapshotRow:
+        price = Decimal(self.price_mills[i]).scaleb(-3)
+        return self.ids[i], self.lon[i], self.lat[i], price, self.name(i)
+
+    def lat_range(self, min_lat: float, max_lat: float) -> range:
+        """Row indices with min_lat <= lat <= max_lat (rows are sorted by latitude)."""
+        return range(bisect.bisect_left(self.lat, min_lat), bisect.bisect_right(self.lat, max_lat))
+
+    def in_bbox(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> Iterator[int]:
+        lon = self.lon
+        for i in self.lat_range(min_lat, max_lat):
+            if min_lon <= lon[i] <= max_lon:
+                yield i
+
+
+_snapshot: Optional[StationSnapshot] = None
+_checked_at: Optional[float] = None
+_snapshot_lock = threading.Lock()
+
+
+def current_snapshot() -> Optional[StationSnapshot]:
+    """
+    This process's mapping of the snapshot CURRENT points at. CURRENT is
+    re-read at most every STATION_SNAPSHOT_CHECK_SECONDS; when it names a new
+    file the mapping is swapped, and requests already holding the old one
+    finish on it. None when STATION_SNAPSHOT_DIR is unset or holds no snapshot.
+    """
+    global _snapshot, _checked_at
+    directory = settings.STATION_SNAPSHOT_DIR
+    if not directory:
+        return None
+    if _checked_at is not None and time.monotonic() - _checked_at < settings.STATION_SNAPSHOT_CHECK_SECONDS:
+        return _snapshot
+    with _snapshot_lock:
+        if _checked_at is not None and time.monotonic() - _checked_at < settings.STATION_SNAPSHOT_CHECK_SECONDS:
+            return _snapshot
+        try:
+            with open(os.path.join(directory, POINTER)) as f:
+                path = os.path.join(directory, f.read().strip())
+            if _snapshot is None or _snapshot.path != path:
+                _snapshot = StationSnapshot(path)
+                logger.info("Mapped station snapshot %s (%s stations)", path, _snapshot.count)
+        except (OSError, ValueError) as exc:
+            # Keep serving the mapping we have; the next check tries again.
+            logger.warning("Station snapshot unavailable in %s: %s", directory, exc)
+        _checked_at = time.monotonic()
+    return _snapshot
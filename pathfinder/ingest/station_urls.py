@@ -0,0 +1,7 @@
+from django.urls import path
+
+from .views import NearbyStationsView
+
+urlpatterns = [
+    path("nearby/", NearbyStationsView.as_view(), name="stations-nearby"),
+]
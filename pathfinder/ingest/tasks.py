@@ -1,23 +1,64 @@
 import csv
 from decimal import Decimal
-from typing import Iterable
+from typing import Iterable, List, Optional, Sequence, Tuple
 
 from celery import shared_task
+from celery.signals import worker_ready
 from django.contrib.gis.geos import Point
 from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
 
-from pathfinder.geocode import geocode_address
+from pathfinder.geocode import geocode_address, load_geocodes_into_redis
+from pathfinder.metrics import TASK_ITEMS, observe_task
+from routing.tasks import rebuild_station_graph, recost_routes, warm_hot_lanes
+from routing.tiles import invalidate_station_tiles
 
-from .models import FuelStation, Ingestion
+from .models import FuelPriceHistory, FuelStation, Ingestion
+from .snapshot import write_snapshot
 import logging
 import time
 
 logger = logging.getLogger(__name__)
 
+PRICE_HISTORY_BATCH_SIZE = 500
+
+
 def parse_price(value: str) -> Decimal:
     return Decimal(value).quantize(Decimal("0.001"))
 
 
+def schedule_graph_rebuild(debounce_seconds: int = 0) -> None:
+    if settings.ROUTING_GRAPH_MODE != "precomputed":
+        return
+    if not debounce_seconds:
+        rebuild_station_graph.delay()
+        return
+    # One delayed rebuild covers every request inside the window.
+    if cache.add("ingest:graph-rebuild-scheduled", 1, timeout=debounce_seconds):
+        rebuild_station_graph.apply_async(countdown=debounce_seconds)
+
+
+def schedule_station_snapshot(debounce_seconds: int = 0) -> None:
+    if not settings.STATION_SNAPSHOT_DIR:
+        return
+    if not debounce_seconds:
+        write_station_snapshot.delay()
+        return
+    if cache.add("ingest:station-snapshot-scheduled", 1, timeout=debounce_seconds):
+        write_station_snapshot.apply_async(countdown=debounce_seconds)
+
+
+def schedule_lane_warming() -> None:
+    # After commit, so workers see the new prices and version.
+    transaction.on_commit(warm_hot_lanes.delay)
+
+
+def schedule_route_recost() -> None:
+    if settings.ROUTE_RECOST_WINDOW_DAYS:
+        transaction.on_commit(recost_routes.delay)
+
+
 def read_rows(path: str) -> Iterable[dict]:
     with open(path) as f:
         reader = csv.DictReader(f)
@@ -25,7 +66,28 @@ def read_rows(path: str) -> Iterable[dict]:
             yield row
 
 
+def ensure_price_history_partitions(months_ahead: int) -> int:
+    """Create monthly ingest_fuelpricehistory partitions through months_ahead; returns how many were new."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT ingest_fuelpricehistory_ensure_partitions("
+            "now()::date, (now() + make_interval(months => %s))::date)",
+            [months_ahead],
+        )
+        return cursor.fetchone()[0]
+
+
 @shared_task
+@observe_task
+def create_price_history_partitions() -> int:
+    """Keep PRICE_HISTORY_PARTITION_MONTHS_AHEAD monthly price history partitions ready. Returns number created."""
+    created = ensure_price_history_partitions(settings.PRICE_HISTORY_PARTITION_MONTHS_AHEAD)
+    logger.info("create_price_history_partitions: %s new partitions", created)
+    return created
+
+
+@shared_task(acks_late=True)
+@observe_task
 def ingest_csv(ingestion_id: int, path: str) -> None:
     ingestion = Ingestion.objects.get(id=ingestion_id)
     ingestion.status = Ingestion.Status.PROCESSING
@@ -34,6 +96,14 @@ def ingest_csv(ingestion_id: int, path: str) -> None:
 
     try:
         processed = 0
+        # Only new stations and changed prices go into the history.
+        known_prices = {
+            (opis_id, state): price
+            for opis_id, state, price in FuelStation.objects.values_list("opis_id", "state", "price").iterator(
+                chunk_size=10_000
+            )
+        }
+        history: List[FuelPriceHistory] = []
         for row in read_rows(path):
             address = row.get("Address", "")
             city = row.get("City", "")
@@ -47,7 +117,7 @@ def ingest_csv(ingestion_id: int, path: str) -> None:
                 coords = geocode_address(full_address)
                 geom = Point(coords[0], coords[1]) if coords else None
 
-            FuelStation.objects.update_or_create(
+            station, _ = FuelStation.objects.update_or_create(
                 opis_id=opis_id,
                 state=state,
                 defaults={
@@ -58,20 +128,71 @@ def ingest_csv(ingestion_id: int, path: str) -> None:
                     "geom": geom,
                 },
             )
+            if known_prices.get((opis_id, state)) != price:
+                known_prices[(opis_id, state)] = price
+                history.append(
+                    FuelPriceHistory(
+                        station_id=station.id,
+                        opis_id=opis_id,
+                        state=state,
+                        price=price,
+                        ingestion_id=ingestion.id,
+                        observed_at=ingestion.started_at,
+                    )
+                )
+                if len(history) >= PRICE_HISTORY_BATCH_SIZE:
+                    FuelPriceHistory.objects.bulk_create(history)
+                    history = []
             processed += 1
             if processed % 500 == 0:
                 logger.info("Ingestion %s: processed %s rows", ingestion.id, processed)
                 # gentle throttle to avoid hammering provider; ~20 qps
                 time.sleep(0.1)
+        FuelPriceHistory.objects.bulk_create(history)
         ingestion.mark_success()
+        TASK_ITEMS.labels("ingest_csv").inc(processed)
         logger.info("Ingestion %s: completed (%s rows)", ingestion.id, processed)
     except Exception as exc:  # pragma: no cover - logged via celery
         ingestion.mark_failed(str(exc))
         logger.exception("Ingestion %s: failed: %s", ingestion.id, exc)
         raise
+    schedule_graph_rebuild()
+    schedule_station_snapshot()
+    schedule_lane_warming()
+    schedule_route_recost()
 
 
-@shared_task
+def geocode_stations(rows: Sequence[dict], deadline: Optional[float] = None) -> Tuple[int, List[dict]]:
+    """
+    Geocode station rows (id/address/city/state) and store hits. Stops once
+    time.monotonic() passes deadline; returns (updated, rows not attempted).
+    Corridor tiles holding the new coordinates are invalidated.
+    """
+    located: List[Tuple[float, float]] = []
+    remaining: List[dict] = []
+    for i, row in enumerate(rows):
+        if deadline is not None and time.monotonic() >= deadline:
+            remaining = list(rows[i:])
+            break
+        full_address = f"{row['address']}, {row['city']}, {row['state']}"
+        coords = geocode_address(full_address)
+        if coords:
+            FuelStation.objects.filter(id=row["id"]).update(geom=Point(coords[0], coords[1]))
+            located.append((coords[0], coords[1]))
+    if located:
+        invalidate_station_tiles(located)
+    return len(located), remaining
+
+
+def record_geocode_snapshot(updated: int, debounce_seconds: int = 0) -> None:
+    # Record the backfill as a snapshot change so exports and caches see new coordinates.
+    Ingestion.objects.create(source="geocode", meta={"updated": updated}).mark_success()
+    schedule_graph_rebuild(debounce_seconds)
+    schedule_station_snapshot(debounce_seconds)
+
+
+@shared_task(acks_late=True)
+@observe_task
 def geocode_pending(batch_size: int = 5000) -> int:
     """
     Geocode stations with null geom up to batch_size.
@@ -80,12 +201,96 @@ def geocode_pending(batch_size: int = 5000) -> int:
     to_process = list(
         FuelStation.objects.filter(geom__isnull=True).values("id", "address", "city", "state")[:batch_size]
     )
-    updated = 0
-    for row in to_process:
-        full_address = f"{row['address']}, {row['city']}, {row['state']}"
-        coords = geocode_address(full_address)
-        if coords:
-            FuelStation.objects.filter(id=row["id"]).update(geom=Point(coords[0], coords[1]))
-            updated += 1
+    updated, _ = geocode_stations(to_process)
+    if updated:
+        record_geocode_snapshot(updated)
     logger.info("geocode_pending: updated %s stations (batch_size=%s)", updated, batch_size)
     return updated
+
+
+@shared_task
+@observe_task
+def geocode_backfill(batch_size: int = 5000, chunk_size: Optional[int] = None) -> int:
+    """
+    Queue up to batch_size stations with null geom as geocode_chunk tasks of
+    chunk_size (default GEOCODE_CHUNK_SIZE). Returns number of stations queued.
+    """
+    chunk_size = chunk_size or settings.GEOCODE_CHUNK_SIZE
+    ids = list(FuelStation.objects.filter(geom__isnull=True).order_by("id").values_list("id", flat=True)[:batch_size])
+    for start in range(0, len(ids), chunk_size):
+        geocode_chunk.delay(ids[start : start + chunk_size])
+    logger.info("geocode_backfill: queued %s stations in chunks of %s", len(ids), chunk_size)
+    return len(ids)
+
+
+@shared_task(acks_late=True)
+@observe_task
+def geocode_chunk(station_ids: List[int]) -> int:
+    """
+    Geocode one chunk of stations. Anything left after GEOCODE_CHUNK_MAX_SECONDS
+    (slow or throttled provider) is re-queued as a new chunk, so no task comes
+    near the Celery time limit. Returns number geocoded.
+    """
+    rows = list(
+        FuelStation.objects.filter(id__in=station_ids, geom__isnull=True)
+        .order_by("id")
+        .values("id", "address", "city", "state")
+    )
+    updated, remaining = geocode_stations(rows, deadline=time.monotonic() + settings.GEOCODE_CHUNK_MAX_SECONDS)
+    if remaining:
+        geocode_chunk.delay([row["id"] for row in remaining])
+    if updated:
+        record_geocode_snapshot(updated, debounce_seconds=settings.GRAPH_REBUILD_DEBOUNCE_SECONDS)
+    logger.info("geocode_chunk: updated %s of %s stations, re-queued %s", updated, len(rows), len(remaining))
+    return updated
+
+
+@shared_task(acks_late=True)
+@observe_task
+def write_station_snapshot() -> int:
+    """
+    Write the memory-mapped station snapshot (ids, coordinates, prices, names
+    of geocoded stations) for the latest successful ingestion into
+    STATION_SNAPSHOT_DIR, versioned by its completion sequence. Returns number
+    of stations written.
+    """
+    latest = Ingestion.objects.latest_success()
+    if latest is None or not settings.STATION_SNAPSHOT_DIR:
+        return 0
+    rows = [
+        (station_id, geom.x, geom.y, price, name)
+        for station_id, geom, price, name in FuelStation.objects.filter(geom__isnull=False)
+        .values_list("id", "geom", "price", "name")
+        .iterator(chunk_size=10_000)
+    ]
+    path = write_snapshot(
+        settings.STATION_SNAPSHOT_DIR, latest.sequence, rows, keep=settings.STATION_SNAPSHOT_KEEP
+    )
+    TASK_ITEMS.labels("write_station_snapshot").inc(len(rows))
+    logger.info("write_station_snapshot: %s stations at version %s -> %s", len(rows), latest.sequence, path)
+    return len(rows)
+
+
+@shared_task
+@observe_task
+def load_geocode_cache() -> int:
+    """
+    Bulk-load the durable geocode store into Redis, so a fresh or flushed
+    Redis doesn't send every address back through the store one by one.
+    Returns number of geocodes loaded.
+    """
+    loaded = load_geocodes_into_redis()
+    logger.info("load_geocode_cache: loaded %s geocodes into Redis", loaded)
+    return loaded
+
+
+@worker_ready.connect
+def load_geocode_cache_on_start(**kwargs) -> None:
+    if not settings.GEOCODE_LOAD_ON_START:
+        return
+    # Every worker fires worker_ready; one load per window is enough.
+    try:
+        if cache.add("ingest:geocode-load-scheduled", 1, timeout=settings.GEOCODE_LOAD_INTERVAL_SECONDS):
+            load_geocode_cache.delay()
+    except Exception as exc:  # a worker must start even with Redis down
+        logger.warning("Geocode cache load not scheduled: %s", exc)
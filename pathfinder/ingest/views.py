@@ -1,18 +1,33 @@
-import tempfile
-from typing import Any
+import base64
+import csv
+import hashlib
+import json
+from decimal import Decimal
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
 from pathlib import Path
 
-from django.http import FileResponse, HttpRequest
+from django.contrib.gis.geos import Polygon
+from django.db.models import Q
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date
+from django.views.decorators.gzip import gzip_page
 from drf_spectacular.types import OpenApiTypes
-from drf_spectacular.utils import OpenApiResponse, extend_schema, inline_serializer
+from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, extend_schema, inline_serializer
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser
 from rest_framework import serializers
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import Ingestion
-from .serializers import IngestionSerializer
+from .models import FuelStation, Ingestion
+from .serializers import (
+    IngestionSerializer,
+    NearbyStationSerializer,
+    NearbyStationsQuerySerializer,
+    NearbyStationsResponseSerializer,
+)
 from .tasks import ingest_csv
 import logging
 
@@ -65,16 +80,198 @@ class IngestionStatusView(APIView):
         return Response(IngestionSerializer(ingestion).data)
 
 
+EXPORT_COLUMNS = [
+    "OPIS Truckstop ID",
+    "Truckstop Name",
+    "Address",
+    "City",
+    "State",
+    "Retail Price",
+    "Longitude",
+    "Latitude",
+]
+EXPORT_FIELDS = ["opis_id", "name", "address", "city", "state", "price", "geom"]
+EXPORT_CHUNK_ROWS = 2000
+EXPORT_CONTENT_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def parse_bbox(raw: str) -> Polygon:
+    parts = [float(p) for p in raw.split(",")]
+    if len(parts) != 4:
+        raise ValueError("bbox must be minLon,minLat,maxLon,maxLat")
+    min_lon, min_lat, max_lon, max_lat = parts
+    if min_lon >= max_lon or min_lat >= max_lat:
+        raise ValueError("bbox min values must be below max values")
+    return Polygon.from_bbox((min_lon, min_lat, max_lon, max_lat))
+
+
+def _export_rows(rows: Iterable[tuple]) -> Iterator[List[Any]]:
+    for opis_id, name, address, city, state, price, geom in rows:
+        yield [
+            opis_id,
+            name,
+            address,
+            city,
+            state,
+            str(price),
+            geom.x if geom else None,
+            geom.y if geom else None,
+        ]
+
+
+class _LineBuffer:
+    """Minimal file-like target so csv.writer returns each line instead of buffering."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def stream_csv(rows: Iterable[tuple]) -> Iterator[str]:
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(EXPORT_COLUMNS)
+    chunk: List[str] = []
+    for values in _export_rows(rows):
+        chunk.append(writer.writerow(["" if v is None else v for v in values]))
+        if len(chunk) >= EXPORT_CHUNK_ROWS:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+def stream_ndjson(rows: Iterable[tuple]) -> Iterator[str]:
+    keys = ["opis_id", "name", "address", "city", "state", "price", "lon", "lat"]
+    chunk: List[str] = []
+    for values in _export_rows(rows):
+        chunk.append(json.dumps(dict(zip(keys, values))) + "\n")
+        if len(chunk) >= EXPORT_CHUNK_ROWS:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+@method_decorator(gzip_page, name="dispatch")
 class IngestionDownloadView(APIView):
+    """
+    Stream the current FuelStation snapshot. The ETag/Last-Modified pair is
+    derived from the latest successful ingestion, so polling clients get a
+    304 without the station table being read.
+    """
+
     @extend_schema(
+        parameters=[
+            OpenApiParameter("output", str, enum=list(EXPORT_CONTENT_TYPES), description="csv (default) or ndjson"),
+            OpenApiParameter("state", str, description="Comma-separated state codes, e.g. TX,OK"),
+            OpenApiParameter("bbox", str, description="minLon,minLat,maxLon,maxLat"),
+        ],
         responses={
             200: OpenApiResponse(
                 response=OpenApiTypes.BINARY,
-                description="Fuel prices CSV download",
-            )
-        }
+                description="Fuel prices export",
+            ),
+            304: OpenApiResponse(description="Snapshot unchanged since If-None-Match / If-Modified-Since"),
+            400: OpenApiResponse(description="Invalid filter"),
+        },
     )
-    def get(self, request: HttpRequest, *args: Any, **kwargs: Any) -> FileResponse:
-        response = FileResponse(open("fuel-prices-for-be-assessment.csv", "rb"))
-        response["Content-Disposition"] = "attachment; filename=fuel-prices.csv"
+    def get(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
+        output = request.query_params.get("output", "csv")
+        if output not in EXPORT_CONTENT_TYPES:
+            return Response({"detail": "output must be csv or ndjson"}, status=status.HTTP_400_BAD_REQUEST)
+        states = sorted(
+            {code.strip().upper() for code in request.query_params.get("state", "").split(",") if code.strip()}
+        )
+        bbox_raw = request.query_params.get("bbox", "")
+        bbox: Optional[Polygon] = None
+        if bbox_raw:
+            try:
+                bbox = parse_bbox(bbox_raw)
+            except ValueError as exc:
+                return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        etag, last_modified = self._validators(output, states, bbox_raw)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        qs = FuelStation.objects.order_by("id")
+        if states:
+            qs = qs.filter(state__in=states)
+        if bbox is not None:
+            bbox.srid = 4326
+            qs = qs.filter(geom__intersects=bbox)
+        # iterator() uses a server-side cursor on PostgreSQL, so memory stays flat.
+        rows = qs.values_list(*EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_ROWS)
+        stream = stream_csv(rows) if output == "csv" else stream_ndjson(rows)
+
+        response = StreamingHttpResponse(stream, content_type=EXPORT_CONTENT_TYPES[output])
+        response["Content-Disposition"] = f"attachment; filename=fuel-prices.{output}"
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        response["Cache-Control"] = "no-cache"
         return response
+
+    @staticmethod
+    def _validators(output: str, states: List[str], bbox_raw: str) -> Tuple[str, Optional[int]]:
+        latest = Ingestion.objects.latest_success()
+        version = f"{latest.id}:{latest.finished_at.isoformat()}" if latest else "empty"
+        digest = hashlib.sha1(f"{version}|{output}|{','.join(states)}|{bbox_raw}".encode()).hexdigest()
+        last_modified = int(latest.finished_at.timestamp()) if latest else None
+        return f'"{digest}"', last_modified
+
+
+def encode_cursor(order: str, key: Any, station_id: int) -> str:
+    raw = json.dumps({"o": order, "k": str(key) if order == "price" else key, "i": station_id})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order: str) -> Tuple[Any, int]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    if data["o"] != order:
+        raise ValueError("cursor was issued for a different order")
+    key = Decimal(data["k"]) if order == "price" else float(data["k"])
+    return key, int(data["i"])
+
+
+class NearbyStationsView(APIView):
+    """
+    Cheapest or closest stations around a point. Pages are keyset-based:
+    next_cursor encodes the last (price|distance, id) pair, so deep pages cost
+    the same as the first one.
+    """
+
+    @extend_schema(
+        parameters=[NearbyStationsQuerySerializer],
+        responses={
+            200: NearbyStationsResponseSerializer,
+            400: OpenApiResponse(description="Invalid query or cursor"),
+        },
+    )
+    def get(self, request: HttpRequest, *args: Any, **kwargs: Any) -> Response:
+        query = NearbyStationsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        order = params["order"]
+        key_field = "price" if order == "price" else "distance_m"
+
+        qs = FuelStation.objects.nearby(params["lon"], params["lat"], params["radius_miles"]).order_by(
+            key_field, "id"
+        )
+        if params.get("cursor"):
+            try:
+                last_key, last_id = decode_cursor(params["cursor"], order)
+            except (ValueError, KeyError, TypeError):
+                return Response({"detail": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+            qs = qs.filter(Q(**{f"{key_field}__gt": last_key}) | Q(**{key_field: last_key, "id__gt": last_id}))
+
+        page = list(qs.only("id", "opis_id", "name", "address", "city", "state", "price", "geom")[: params["limit"] + 1])
+        next_cursor = None
+        if len(page) > params["limit"]:
+            page = page[: params["limit"]]
+            last = page[-1]
+            next_cursor = encode_cursor(order, getattr(last, key_field), last.id)
+        return Response(
+            {"results": NearbyStationSerializer(page, many=True).data, "next_cursor": next_cursor}
+        )
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import functools
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+from django.http import HttpRequest, HttpResponse
+from pathfinder.profiling import task_profile
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+ROUTE_STAGE_SECONDS = Histogram(
+    "route_stage_seconds",
+    "Time spent in each stage of a route request",
+    ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+ROUTE_REQUESTS = Counter("route_requests_total", "Route requests by outcome", ["outcome"])
+ROUTE_COALESCED = Counter(
+    "route_coalesced_total",
+    "Route computations shared with a concurrent identical request",
+    ["source"],
+)
+ROUTE_TILE_LOOKUPS = Counter(
+    "route_tile_lookups_total",
+    "Corridor tile cache lookups by result (per-tile counts: GET /api/route/tiles/)",
+    ["result"],
+)
+ROUTE_CORRIDOR_STATIONS = Histogram(
+    "route_corridor_stations",
+    "Stations returned by the corridor query",
+    buckets=(0, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+ROUTE_GRAPH_NODES = Histogram(
+    "route_graph_nodes",
+    "Nodes in the fuel-cost graph after pruning",
+    buckets=(2, 10, 25, 50, 100, 250, 500, 1000, 2500),
+)
+ROUTE_GRAPH_EDGES = Histogram(
+    "route_graph_edges",
+    "Edges in the fuel-cost graph (edges generated by the search in lazy mode)",
+    buckets=(1, 100, 1_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000),
+)
+GEOCODE_LOOKUPS = Counter(
+    "geocode_lookups_total",
+    "Geocode lookups by where the answer came from (redis, store, mapbox, ors, miss)",
+    ["source"],
+)
+PROVIDER_RETRIES = Counter(
+    "provider_http_retries_total",
+    "Retried routing/geocoding provider calls by reason",
+    ["reason"],
+)
+TASK_SECONDS = Histogram(
+    "celery_task_seconds",
+    "Celery task duration",
+    ["task"],
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600),
+)
+TASK_RUNS = Counter("celery_task_runs_total", "Celery task runs by outcome", ["task", "outcome"])
+TASK_ITEMS = Counter("celery_task_items_total", "Rows processed by Celery tasks", ["task"])
+
+
+class StageTimings:
+    """Per-request stage durations, rendered as a Server-Timing header."""
+
+    def __init__(self) -> None:
+        self.stages: List[Tuple[str, float]] = []
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages.append((name, seconds))
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages)
+
+
+_current_timings: ContextVar[Optional[StageTimings]] = ContextVar("stage_timings", default=None)
+
+
+@contextmanager
+def collect_stages() -> Iterator[StageTimings]:
+    timings = StageTimings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Time a block as one route stage: always observed in the Prometheus
+    histogram, and added to the request's Server-Timing when collecting.
+    """
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        ROUTE_STAGE_SECONDS.labels(name).observe(elapsed)
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.add(name, elapsed)
+
+
+def observe_task(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Record duration and outcome of a Celery task; int return values count as
+    items. Runs opted in to profiling are profiled here too.
+    """
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        t0 = time.perf_counter()
+        try:
+            with task_profile(name):
+                result = fn(*args, **kwargs)
+        except Exception:
+            TASK_RUNS.labels(name, "failure").inc()
+            raise
+        finally:
+            TASK_SECONDS.labels(name).observe(time.perf_counter() - t0)
+        TASK_RUNS.labels(name, "success").inc()
+        if isinstance(result, int):
+            TASK_ITEMS.labels(name).inc(result)
+        return result
+
+    return wrapper
+
+
+def metrics_registry() -> CollectorRegistry:
+    # With several gunicorn/Celery processes, each writes to PROMETHEUS_MULTIPROC_DIR
+    # and the scrape aggregates them; otherwise expose this process's registry.
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def reset_multiproc_dir() -> None:
+    """
+    Delete metric files left in PROMETHEUS_MULTIPROC_DIR by an earlier run, so
+    counters of dead processes don't carry over. Call once per container,
+    before any worker process starts.
+    """
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith(".db"):
+            os.remove(os.path.join(directory, name))
+
+
+def start_worker_exporter(port: int) -> None:
+    """
+    Serve /metrics for a Celery worker container from its main process. Pool
+    processes record into PROMETHEUS_MULTIPROC_DIR and the exporter aggregates
+    them, so autoscaled children are scraped through one port.
+    """
+    if port:
+        start_http_server(port, registry=metrics_registry())
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    return HttpResponse(generate_latest(metrics_registry()), content_type=CONTENT_TYPE_LATEST)
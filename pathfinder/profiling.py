@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import cProfile
+import hmac
+import json
+import marshal
+import pstats
+import random
+import threading
+import time
+import uuid
+import zlib
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
+from django.utils import timezone
+
+from pathfinder.redis_pool import get_redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+INDEX_KEY = "profile:index"
+TOP_FUNCTIONS = 40
+TOP_STATEMENTS = 20
+
+# cProfile hooks are process-wide on Python 3.12+: a second enable() in another
+# thread raises, and one profile sees every thread's frames. One at a time.
+_profile_lock = threading.Lock()
+
+
+def _record_key(profile_id: str) -> str:
+    return f"profile:{profile_id}"
+
+
+def _pstats_key(profile_id: str) -> str:
+    return f"profile:{profile_id}:pstats"
+
+
+class QueryLog:
+    """Database execute_wrapper keeping every statement's SQL and duration, up to limit."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.queries: List[dict] = []
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute: Callable, sql: str, params: Any, many: bool, context: dict) -> Any:
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - t0
+            self.count += 1
+            self.seconds += elapsed
+            if len(self.queries) < self.limit:
+                self.queries.append({"sql": sql, "ms": round(elapsed * 1000, 3), "many": many})
+
+    def statements(self) -> List[dict]:
+        """Logged queries grouped by SQL text, most total time first; repeated statements stand out."""
+        grouped: Dict[str, dict] = defaultdict(lambda: {"count": 0, "ms": 0.0})
+        for query in self.queries:
+            row = grouped[query["sql"]]
+            row["count"] += 1
+            row["ms"] += query["ms"]
+        ranked = sorted(grouped.items(), key=lambda item: -item[1]["ms"])[:TOP_STATEMENTS]
+        return [{"sql": sql, "count": row["count"], "ms": round(row["ms"], 3)} for sql, row in ranked]
+
+
+def top_functions(stats: pstats.Stats, limit: int = TOP_FUNCTIONS) -> List[dict]:
+    ranked = sorted(stats.stats.items(), key=lambda item: -item[1][3])[:limit]
+    return [
+        {
+            "function": pstats.func_std_string(func),
+            "calls": calls,
+            "tottime_ms": round(tottime * 1000, 3),
+            "cumtime_ms": round(cumtime * 1000, 3),
+        }
+        for func, (_, calls, tottime, cumtime, _) in ranked
+    ]
+
+
+def save_profile(info: dict, profiler: cProfile.Profile, log: QueryLog) -> Optional[str]:
+    """
+    Store a finished profile in Redis for PROFILING_RETENTION_SECONDS. Only the
+    newest PROFILING_KEEP stay listed; older ones are deleted as new ones
+    arrive. Returns the profile id, or None when Redis is unavailable.
+    """
+    profile_id = uuid.uuid4().hex[:16]
+    stats = pstats.Stats(profiler)
+    summary = {
+        **info,
+        "id": profile_id,
+        "created_at": timezone.now().isoformat(),
+        "queries": log.count,
+        "sql_ms": round(log.seconds * 1000, 3),
+    }
+    record = {
+        **summary,
+        "functions": top_functions(stats),
+        "statements": log.statements(),
+        "sql": log.queries,
+        "sql_truncated": log.count > len(log.queries),
+    }
+    ttl, keep = settings.PROFILING_RETENTION_SECONDS, settings.PROFILING_KEEP
+    try:
+        redis = get_redis()
+        pipe = redis.pipeline(transaction=False)
+        pipe.set(_record_key(profile_id), zlib.compress(json.dumps(record).encode()), ex=ttl)
+        pipe.set(_pstats_key(profile_id), zlib.compress(marshal.dumps(stats.stats)), ex=ttl)
+        pipe.lpush(INDEX_KEY, json.dumps(summary))
+        pipe.lrange(INDEX_KEY, keep, -1)
+        pipe.ltrim(INDEX_KEY, 0, keep - 1)
+        pipe.expire(INDEX_KEY, ttl)
+        evicted = [json.loads(raw)["id"] for raw in pipe.execute()[3]]
+        if evicted:
+            redis.delete(*[key for old in evicted for key in (_record_key(old), _pstats_key(old))])
+    except Exception as exc:  # profiling must not fail the request or task
+        logger.warning("Profile of %s %s not stored: %s", info["kind"], info["name"], exc)
+        return None
+    logger.info(
+        "Profiled %s %s: %.1f ms, %s queries (%.1f ms), id %s",
+        info["kind"],
+        info["name"],
+        info["duration_ms"],
+        log.count,
+        log.seconds * 1000,
+        profile_id,
+    )
+    return profile_id
+
+
+@contextmanager
+def profiled(kind: str, name: str) -> Iterator[dict]:
+    """
+    cProfile the block and log the SQL it runs on every database connection,
+    then store both. The yielded dict is saved with the profile (callers add
+    e.g. the response status) and gets its "id" once stored. Only one profile
+    runs per process: nested calls, and blocks started while another thread is
+    profiling, run unprofiled.
+    """
+    info: dict = {"kind": kind, "name": name}
+    if not _profile_lock.acquire(blocking=False):
+        yield info
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except Exception as exc:  # e.g. another profiler already active; never fail the request
+        _profile_lock.release()
+        logger.warning("Profiling %s %s skipped: %s", kind, name, exc)
+        yield info
+        return
+    log = QueryLog(settings.PROFILING_MAX_QUERIES)
+    t0 = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(log))
+            yield info
+    finally:
+        profiler.disable()
+        _profile_lock.release()
+        info["duration_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+        info["id"] = save_profile(info, profiler, log)
+
+
+def should_profile_request(request: HttpRequest) -> bool:
+    """
+    X-Profile with the PROFILING_TOKEN value, or X-Profile from a staff
+    session, profiles a request; otherwise PROFILING_SAMPLE_RATE samples them.
+    Only paths under PROFILING_PATHS are considered.
+    """
+    requested = request.META.get(PROFILE_HEADER)
+    rate = settings.PROFILING_SAMPLE_RATE
+    if not requested and rate <= 0:
+        return False
+    if not request.path.startswith(tuple(settings.PROFILING_PATHS)):
+        return False
+    if requested:
+        token = settings.PROFILING_TOKEN
+        if token and hmac.compare_digest(requested.encode(), token.encode()):
+            return True
+        user = getattr(request, "user", None)
+        if user is not None and user.is_active and user.is_staff:
+            return True
+    return rate > 0 and random.random() < rate
+
+
+class ProfilingMiddleware:
+    """Profiles opted-in requests; the stored profile's id comes back in X-Profile-Id."""
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if not should_profile_request(request):
+            return self.get_response(request)
+        with profiled("request", f"{request.method} {request.path}") as info:
+            response = self.get_response(request)
+            info["status"] = response.status_code
+        if info.get("id"):
+            response["X-Profile-Id"] = info["id"]
+        return response
+
+
+@contextmanager
+def task_profile(name: str) -> Iterator[None]:
+    """Profile a Celery task run when it is listed in PROFILING_TASKS or sampled by PROFILING_TASK_SAMPLE_RATE."""
+    rate = settings.PROFILING_TASK_SAMPLE_RATE
+    if name in settings.PROFILING_TASKS or (rate > 0 and random.random() < rate):
+        with profiled("task", name):
+            yield
+    else:
+        yield
+
+
+def stored_profiles() -> List[dict]:
+    """Summaries of the retained profiles, newest first."""
+    since = timezone.now() - timedelta(seconds=settings.PROFILING_RETENTION_SECONDS)
+    summaries = [json.loads(raw) for raw in get_redis().lrange(INDEX_KEY, 0, -1)]
+    return [s for s in summaries if datetime.fromisoformat(s["created_at"]) >= since]
+
+
+@staff_member_required
+def profile_list_view(request: HttpRequest) -> JsonResponse:
+    return JsonResponse({"profiles": stored_profiles()})
+
+
+@staff_member_required
+def profile_detail_view(request: HttpRequest, profile_id: str) -> HttpResponse:
+    """
+    The stored profile as JSON: top functions by cumulative time, SQL grouped
+    by statement and the full query log. ?download=pstats returns the raw
+    cProfile stats for pstats/snakeviz.
+    """
+    if request.GET.get("download") == "pstats":
+        data = get_redis().get(_pstats_key(profile_id))
+        if data is None:
+            raise Http404("profile expired or unknown")
+        response = HttpResponse(zlib.decompress(data), content_type="application/octet-stream")
+        response["Content-Disposition"] = f'attachment; filename="profile-{profile_id}.prof"'
+        return response
+    data = get_redis().get(_record_key(profile_id))
+    if data is None:
+        raise Http404("profile expired or unknown")
+    return HttpResponse(zlib.decompress(data), content_type="application/json")
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Iterator, Optional
+
+import requests
+from django.conf import settings
+
+from pathfinder.metrics import PROVIDER_RETRIES
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Throttled or transiently unavailable; anything else is returned to the caller as-is.
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int
+    attempt_timeout: float
+    deadline: float
+    backoff_base: float
+    backoff_max: float
+
+    @classmethod
+    def from_settings(cls, max_attempts: int) -> "RetryPolicy":
+        return cls(
+            max_attempts=max(1, max_attempts),
+            attempt_timeout=settings.HTTP_TIMEOUT_SECONDS,
+            deadline=settings.HTTP_DEADLINE_SECONDS,
+            backoff_base=settings.HTTP_BACKOFF_BASE_SECONDS,
+            backoff_max=settings.HTTP_BACKOFF_MAX_SECONDS,
+        )
+
+    def backoff(self, retry: int) -> float:
+        # "Full jitter": uniform over the exponential window, so synchronized
+        # clients spread out instead of retrying in lockstep.
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (retry - 1)))
+
+
+class _RetryBudget:
+    def __init__(self, retries: int) -> None:
+        self.remaining = retries
+
+    def take(self) -> bool:
+        if self.remaining <= 0:
+            return False
+        self.remaining -= 1
+        return True
+
+
+_current_budget: ContextVar[Optional[_RetryBudget]] = ContextVar("retry_budget", default=None)
+
+
+@contextmanager
+def retry_budget(retries: int) -> Iterator[_RetryBudget]:
+    """Cap the retries of every provider call made inside the block, taken together."""
+    budget = _RetryBudget(retries)
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+def retry_after_seconds(response: Optional[requests.Response]) -> Optional[float]:
+    """Retry-After as delta-seconds or HTTP-date, or None when absent/unparseable."""
+    if response is None:
+        return None
+    raw = response.headers.get("Retry-After")
+    if not raw:
+        return None
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(raw)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def _retry_reason(response: Optional[requests.Response], error: Optional[Exception]) -> str:
+    if response is not None:
+        return "429" if response.status_code == 429 else "5xx"
+    return "timeout" if isinstance(error, requests.Timeout) else "connection"
+
+
+def request_with_retry(
+    session: requests.Session,
+    method: str,
+    url: str,
+    policy: RetryPolicy,
+    **kwargs: Any,
+) -> requests.Response:
+    """
+    Send a request, retrying throttling (429), 5xx, timeouts and connection
+    errors with jittered exponential backoff, or after Retry-After when the
+    provider sends one. Each attempt is bounded by policy.attempt_timeout and the
+    whole call by policy.deadline; a retry that would wait past the deadline, or
+    exceed the active retry_budget, is not made. Returns the last response, so
+    callers keep using raise_for_status(); raises the last requests error if no
+    response was received at all.
+    """
+    deadline = time.monotonic() + policy.deadline
+    attempt = 0
+    while True:
+        attempt += 1
+        timeout = min(policy.attempt_timeout, deadline - time.monotonic())
+        response: Optional[requests.Response] = None
+        error: Optional[Exception] = None
+        try:
+            response = session.request(method, url, timeout=max(timeout, 0.001), **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            error = exc
+        if response is not None and response.status_code not in RETRYABLE_STATUSES:
+            return response
+
+        if attempt >= policy.max_attempts:
+            break
+        delay = retry_after_seconds(response)
+        if delay is None:
+            delay = policy.backoff(attempt)
+        if time.monotonic() + delay >= deadline:
+            logger.info("%s %s: retry in %.2fs would pass the deadline", method, url, delay)
+            break
+        budget = _current_budget.get()
+        if budget is not None and not budget.take():
+            logger.info("%s %s: retry budget exhausted", method, url)
+            break
+        PROVIDER_RETRIES.labels(_retry_reason(response, error)).inc()
+        time.sleep(delay)
+
+    if response is not None:
+        return response
+    assert error is not None
+    raise error
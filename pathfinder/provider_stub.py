@@ -0,0 +1,352 @@
+"""
+Local stand-in for the Mapbox and OpenRouteService directions and geocoding
+APIs, so load tests never reach the real providers or their quotas.
+
+    python -m pathfinder.provider_stub --port 9000 --latency-ms 80 --throttle-rate 0.02
+
+It answers the same URLs and response shapes the app uses (see
+docker-compose.loadtest.yml for the settings that point at it), with a
+configurable latency, 5xx rate and 429 rate. Directions replay recorded
+polylines when the trip's points match one, and otherwise draw a densified
+straight line. Geocodes come from an export_geocodes dump, or else from a
+hash of the address inside the lower 48. Only the standard library is used,
+so the stub runs from the app image without Django settings.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+import urllib.request
+from collections import Counter
+from dataclasses import asdict, dataclass, fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+import logging
+
+logger = logging.getLogger(__name__)
+
+Point = Tuple[float, float]
+Reply = Tuple[int, Dict[str, str], dict]
+
+MAPBOX_DIRECTIONS = "/directions/v5/mapbox/driving/"
+MAPBOX_GEOCODING = "/geocoding/v5/mapbox.places/"
+ORS_DIRECTIONS = "/v2/directions/driving-car"
+ORS_GEOCODING = "/geocode/search"
+
+EARTH_RADIUS_MILES = 3958.8
+METERS_PER_MILE = 1609.34
+# Lower 48 bounding box for hashed geocodes.
+US_BOUNDS = (-124.0, 25.0, -67.0, 49.0)
+
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after: int = 1
+    step_miles: float = 1.0  # vertex spacing of synthetic polylines
+    speed_mph: float = 55.0
+
+
+def haversine_miles(a: Point, b: Point) -> float:
+    lon1, lat1, lon2, lat2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(h))
+
+
+def synthetic_polyline(points: Sequence[Point], step_miles: float) -> List[List[float]]:
+    """Straight legs through every point, with a vertex about every step_miles like a provider polyline."""
+    coords = [[round(points[0][0], 6), round(points[0][1], 6)]]
+    for a, b in zip(points, points[1:]):
+        steps = max(1, math.ceil(haversine_miles(a, b) / step_miles))
+        for i in range(1, steps + 1):
+            t = i / steps
+            coords.append([round(a[0] + (b[0] - a[0]) * t, 6), round(a[1] + (b[1] - a[1]) * t, 6)])
+    return coords
+
+
+def hashed_geocode(address: str) -> Point:
+    digest = hashlib.sha1(address.encode()).digest()
+    x = int.from_bytes(digest[:4], "big") / 2**32
+    y = int.from_bytes(digest[4:8], "big") / 2**32
+    min_lon, min_lat, max_lon, max_lat = US_BOUNDS
+    return round(min_lon + x * (max_lon - min_lon), 6), round(min_lat + y * (max_lat - min_lat), 6)
+
+
+def route_key(points: Iterable[Sequence[float]]) -> Tuple[Tuple[float, float], ...]:
+    # ~11 m, the same rounding as hot-lane keys.
+    return tuple((round(float(lon), 4), round(float(lat), 4)) for lon, lat in points)
+
+
+def parse_points(raw: str) -> List[Point]:
+    points = []
+    for pair in raw.split(";"):
+        lon, lat = pair.split(",")
+        points.append((float(lon), float(lat)))
+    return points
+
+
+class ProviderStub:
+    """
+    Request handling without the HTTP server, so tests can drive it directly.
+    recordings maps route_key(points) to replayed coordinates; geocodes maps
+    lower-cased addresses to (lon, lat).
+    """
+
+    def __init__(
+        self,
+        config: Optional[StubConfig] = None,
+        recordings: Optional[Dict[Tuple[Tuple[float, float], ...], List[List[float]]]] = None,
+        geocodes: Optional[Dict[str, Point]] = None,
+        seed: Optional[int] = None,
+        record_to: Optional[str] = None,
+        upstream: Optional[str] = None,
+        upstream_token: str = "",
+    ) -> None:
+        self.config = config or StubConfig()
+        self.recordings = recordings or {}
+        self.geocodes = geocodes or {}
+        self.record_to = record_to
+        self.upstream = upstream
+        self.upstream_token = upstream_token
+        self.counts: Counter = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def load_recordings(self, lines: Iterable[str]) -> int:
+        """Add recorded polylines from JSON lines of {"points": [[lon, lat], ...], "coordinates": [...]}."""
+        loaded = 0
+        for line in lines:
+            if line.strip():
+                record = json.loads(line)
+                self.recordings[route_key(record["points"])] = record["coordinates"]
+                loaded += 1
+        return loaded
+
+    def load_geocodes(self, lines: Iterable[str]) -> int:
+        """Add geocodes from export_geocodes NDJSON (address/lon/lat per line)."""
+        loaded = 0
+        for line in lines:
+            if line.strip():
+                record = json.loads(line)
+                self.geocodes[record["address"].strip().lower()] = (float(record["lon"]), float(record["lat"]))
+                loaded += 1
+        return loaded
+
+    def _fault(self) -> Optional[Reply]:
+        config = self.config
+        with self._lock:
+            delay = config.latency_ms + self._rng.uniform(-config.jitter_ms, config.jitter_ms)
+            roll = self._rng.random()
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if roll < config.throttle_rate:
+            return 429, {"Retry-After": str(config.retry_after)}, {"message": "Too Many Requests"}
+        if roll < config.throttle_rate + config.error_rate:
+            return 503, {}, {"message": "Service Unavailable"}
+        return None
+
+    def handle(self, method: str, url: str, body: bytes = b"") -> Reply:
+        parts = urlsplit(url)
+        path, query = parts.path, parse_qs(parts.query)
+        if path.startswith("/_stub/"):
+            return self._control(method, path, body)
+
+        if method == "GET" and path.startswith(MAPBOX_DIRECTIONS):
+            endpoint = "mapbox_directions"
+        elif method == "GET" and path.startswith(MAPBOX_GEOCODING) and path.endswith(".json"):
+            endpoint = "mapbox_geocoding"
+        elif method == "GET" and path.rstrip("/") == ORS_DIRECTIONS:
+            endpoint = "ors_directions"
+        elif method == "POST" and path.rstrip("/") == ORS_DIRECTIONS + "/geojson":
+            endpoint = "ors_directions"
+        elif method == "GET" and path.rstrip("/") == ORS_GEOCODING:
+            endpoint = "ors_geocoding"
+        else:
+            return self._count("unknown", (404, {}, {"message": "Not Found"}))
+
+        reply = self._fault()
+        if reply is None:
+            try:
+                reply = getattr(self, "_" + endpoint)(path, query, body)
+            except (ValueError, KeyError, IndexError, TypeError) as exc:
+                reply = 422, {}, {"code": "InvalidInput", "message": str(exc)}
+        return self._count(endpoint, reply)
+
+    def _count(self, endpoint: str, reply: Reply) -> Reply:
+        with self._lock:
+            self.counts[f"{endpoint}:{reply[0]}"] += 1
+        return reply
+
+    def _control(self, method: str, path: str, body: bytes) -> Reply:
+        if path == "/_stub/stats" and method == "GET":
+            with self._lock:
+                return 200, {}, {"counts": dict(self.counts), "config": asdict(self.config)}
+        if path == "/_stub/reset" and method == "POST":
+            with self._lock:
+                self.counts.clear()
+            return 200, {}, {"counts": {}}
+        if path == "/_stub/config" and method == "POST":
+            # Change latency or fault rates mid-run, e.g. to degrade the provider during a scenario.
+            changes = json.loads(body or b"{}")
+            known = {f.name: f.type for f in fields(StubConfig)}
+            unknown = set(changes) - set(known)
+            if unknown:
+                return 400, {}, {"message": f"unknown settings: {sorted(unknown)}"}
+            for name, value in changes.items():
+                setattr(self.config, name, int(value) if name == "retry_after" else float(value))
+            return 200, {}, {"config": asdict(self.config)}
+        return 404, {}, {"message": "Not Found"}
+
+    def directions(self, points: List[Point]) -> Tuple[List[List[float]], float, float]:
+        """Coordinates, meters and seconds for a trip through points."""
+        coords = self.recordings.get(route_key(points))
+        if coords is None and self.record_to and self.upstream:
+            coords = self._record(points)
+        if coords is None:
+            coords = synthetic_polyline(points, self.config.step_miles)
+        miles = sum(haversine_miles(a, b) for a, b in zip(coords, coords[1:]))
+        return coords, round(miles * METERS_PER_MILE, 1), round(miles / self.config.speed_mph * 3600, 1)
+
+    def _record(self, points: List[Point]) -> List[List[float]]:
+        # Fetch once from the real Mapbox API and keep it for replay.
+        url = (
+            f"{self.upstream.rstrip('/')}/{';'.join(f'{lon},{lat}' for lon, lat in points)}"
+            f"?geometries=geojson&access_token={self.upstream_token}"
+        )
+        with urllib.request.urlopen(url, timeout=30) as resp:
+            coords = json.load(resp)["routes"][0]["geometry"]["coordinates"]
+        with self._lock:
+            self.recordings[route_key(points)] = coords
+            with open(self.record_to, "a") as f:
+                f.write(json.dumps({"points": [list(p) for p in points], "coordinates": coords}) + "\n")
+        return coords
+
+    def geocode(self, address: str) -> Point:
+        return self.geocodes.get(address.strip().lower()) or hashed_geocode(address.strip().lower())
+
+    def _mapbox_directions(self, path: str, query: dict, body: bytes) -> Reply:
+        coords, meters, seconds = self.directions(parse_points(unquote(path[len(MAPBOX_DIRECTIONS) :])))
+        route = {"geometry": {"type": "LineString", "coordinates": coords}, "distance": meters, "duration": seconds}
+        return 200, {}, {"code": "Ok", "routes": [route]}
+
+    def _mapbox_geocoding(self, path: str, query: dict, body: bytes) -> Reply:
+        address = unquote(path[len(MAPBOX_GEOCODING) : -len(".json")])
+        lon, lat = self.geocode(address)
+        feature = {"type": "Feature", "center": [lon, lat], "place_name": address}
+        return 200, {}, {"type": "FeatureCollection", "features": [feature]}
+
+    def _ors_directions(self, path: str, query: dict, body: bytes) -> Reply:
+        if body:
+            points = [(float(lon), float(lat)) for lon, lat in json.loads(body)["coordinates"]]
+        else:
+            points = parse_points(f"{query['start'][0]};{query['end'][0]}")
+        coords, meters, seconds = self.directions(points)
+        feature = {
+            "type": "Feature",
+            "geometry": {"type": "LineString", "coordinates": coords},
+            "properties": {"summary": {"distance": meters, "duration": seconds}},
+        }
+        return 200, {}, {"type": "FeatureCollection", "features": [feature]}
+
+    def _ors_geocoding(self, path: str, query: dict, body: bytes) -> Reply:
+        lon, lat = self.geocode(query["text"][0])
+        feature = {"type": "Feature", "geometry": {"type": "Point", "coordinates": [lon, lat]}}
+        return 200, {}, {"type": "FeatureCollection", "features": [feature]}
+
+
+def _open(path: str):
+    return gzip.open(path, "rt", encoding="utf-8") if path.endswith(".gz") else open(path, encoding="utf-8")
+
+
+def serve(stub: ProviderStub, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the HTTP server on a background thread; port 0 picks a free one."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+        def _reply(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            status, headers, body = stub.handle(self.command, self.path, self.rfile.read(length) if length else b"")
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = do_POST = _reply
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, args=(0.1,), daemon=True).start()
+    return server
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every provider response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="uniform +/- around --latency-ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of responses that are 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of responses that are 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds on 429s")
+    parser.add_argument("--recordings", action="append", default=[], help="JSON lines of recorded polylines")
+    parser.add_argument("--geocodes", action="append", default=[], help="export_geocodes NDJSON to answer from")
+    parser.add_argument("--record", help="fetch unknown trips from --upstream and append them to this file")
+    parser.add_argument("--upstream", default="https://api.mapbox.com/directions/v5/mapbox/driving")
+    parser.add_argument("--upstream-token", default="", help="Mapbox token for --record")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    config = StubConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+    )
+    stub = ProviderStub(
+        config,
+        seed=args.seed,
+        record_to=args.record,
+        upstream=args.upstream if args.record else None,
+        upstream_token=args.upstream_token,
+    )
+    if args.record and os.path.exists(args.record):
+        args.recordings.append(args.record)
+    for path in args.recordings:
+        with _open(path) as f:
+            logger.info("Loaded %s recorded routes from %s", stub.load_recordings(f), path)
+    for path in args.geocodes:
+        with _open(path) as f:
+            logger.info("Loaded %s geocodes from %s", stub.load_geocodes(f), path)
+
+    server = serve(stub, args.host, args.port)
+    logger.info("Provider stub listening on %s:%s", args.host, server.server_port)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Optional
+
+import redis
+from django.conf import settings
+
+_pool: Optional[redis.ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def shared_pool() -> redis.ConnectionPool:
+    """
+    Process-wide pool for REDIS_URL, created on first use. Blocking, so a burst
+    of threads waits for a free connection instead of opening new sockets; redis-py
+    resets it in forked children, so gunicorn/Celery workers each get their own.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = redis.BlockingConnectionPool.from_url(
+                    settings.REDIS_URL,
+                    max_connections=settings.REDIS_MAX_CONNECTIONS,
+                    timeout=settings.REDIS_POOL_TIMEOUT_SECONDS,
+                    health_check_interval=settings.REDIS_HEALTH_CHECK_SECONDS,
+                    socket_keepalive=True,
+                )
+    return _pool
+
+
+def get_redis() -> redis.Redis:
+    return redis.Redis(connection_pool=shared_pool())
+
+
+class SharedConnectionPool(redis.BlockingConnectionPool):
+    """pool_class for Django's RedisCache: REDIS_URL resolves to the shared pool."""
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs: Any) -> redis.ConnectionPool:
+        if url == settings.REDIS_URL:
+            return shared_pool()
+        return redis.BlockingConnectionPool.from_url(url, **kwargs)
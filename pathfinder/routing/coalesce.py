@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import copy
+import threading
+import uuid
+from typing import Any, Callable, Dict, Optional, Sequence, TypeVar
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from pathfinder.metrics import ROUTE_COALESCED
+
+from . import services
+from .lanes import lane_key, price_version
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+_in_flight: Dict[str, _Call] = {}
+_in_flight_lock = threading.Lock()
+
+
+def route_flight_key(start: Point, end: Point, waypoints: Sequence[Point] = ()) -> str:
+    """Identical requests share a key only under the same vehicle profile and price version."""
+    version, _ = price_version()
+    profile = f"{services.MILES_PER_GALLON}:{services.MAX_RANGE_MILES}"
+    return f"{lane_key(start, end, waypoints)}:{profile}:{version}"
+
+
+def single_flight(key: str, fn: Callable[[], T]) -> T:
+    """
+    Run fn once per key across concurrent callers. Threads in this process wait
+    on the leader's call; other processes are coordinated through a lock in the
+    Django cache (Redis) and pick up the leader's result from it. Followers get
+    their own copy of the result, so callers may mutate what they receive.
+    """
+    with _in_flight_lock:
+        call = _in_flight.get(key)
+        leader = call is None
+        if leader:
+            call = _in_flight[key] = _Call()
+
+    if not leader:
+        call.done.wait()
+        ROUTE_COALESCED.labels("local").inc()
+        if call.error is not None:
+            raise call.error
+        return copy.deepcopy(call.result)
+
+    try:
+        result = _run_distributed(key, fn)
+        call.result = copy.deepcopy(result)
+        return result
+    except BaseException as exc:
+        call.error = exc
+        raise
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+        call.done.set()
+
+
+def _run_distributed(key: str, fn: Callable[[], T]) -> T:
+    lock_key = f"route:flight:lock:{key}"
+    result_key = f"route:flight:result:{key}"
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + settings.ROUTE_COALESCE_WAIT_SECONDS
+
+    while True:
+        try:
+            # add() is SET NX on Redis: exactly one process gets the lock.
+            if cache.add(lock_key, token, timeout=settings.ROUTE_COALESCE_LOCK_SECONDS):
+                shared = cache.get(result_key)
+                if shared is not None:
+                    cache.delete(lock_key)
+                    ROUTE_COALESCED.labels("remote").inc()
+                    return shared
+                break
+            shared = cache.get(result_key)
+        except Exception as exc:  # cache outage: coalesce within this process only
+            logger.warning("Single-flight lock unavailable for %s: %s", key, exc)
+            return fn()
+        if shared is not None:
+            ROUTE_COALESCED.labels("remote").inc()
+            return shared
+        if time.monotonic() >= deadline:
+            logger.info("Single-flight wait for %s timed out; computing locally", key)
+            return fn()
+        time.sleep(settings.ROUTE_COALESCE_POLL_SECONDS)
+
+    try:
+        result = fn()
+        try:
+            cache.set(result_key, result, timeout=settings.ROUTE_COALESCE_RESULT_SECONDS)
+        except Exception as exc:
+            logger.warning("Single-flight result not shared for %s: %s", key, exc)
+        return result
+    finally:
+        try:
+            # Not atomic, but the lock TTL bounds the damage if it expired meanwhile.
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+        except Exception as exc:
+            logger.warning("Single-flight unlock failed for %s: %s", key, exc)
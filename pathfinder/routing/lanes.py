@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import hashlib
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import requests
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.utils import timezone
+from ingest.models import Ingestion
+
+from .models import Lane, Route
+from .services import compute_route
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def lane_key(start: Point, end: Point, waypoints: Sequence[Point] = ()) -> str:
+    # Four decimals is ~11 m: close enough to treat repeat depot runs as one lane.
+    parts = [f"{p.x:.4f},{p.y:.4f}" for p in (start, *waypoints, end)]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+def _cache_key(key: str) -> str:
+    return f"route:lane:{key}"
+
+
+def price_version() -> Tuple[int, Optional[datetime]]:
+    """Id and finish time of the latest price ingestion (geocode backfills don't change prices)."""
+    latest = Ingestion.objects.exclude(source="geocode").latest_success()
+    if latest is None:
+        return 0, None
+    return latest.id, latest.finished_at
+
+
+def cached_lane_payload(key: str) -> Optional[dict]:
+    """
+    Cached route payload for a registered lane. An entry from the previous
+    price version is still served for ROUTE_LANE_STALE_SECONDS after a refresh,
+    which covers the window while warm_hot_lanes recomputes it.
+    """
+    if not Lane.objects.filter(key=key, enabled=True).exists():
+        return None
+    try:
+        entry = cache.get(_cache_key(key))
+    except Exception as exc:  # cache outage must not fail the request
+        logger.warning("Lane cache read failed for %s: %s", key, exc)
+        return None
+    if not entry:
+        return None
+    version, refreshed_at = price_version()
+    if entry["version"] != version:
+        if refreshed_at is None:
+            return None
+        age = (timezone.now() - refreshed_at).total_seconds()
+        if age > settings.ROUTE_LANE_STALE_SECONDS:
+            return None
+    return dict(entry["payload"])
+
+
+def store_lane_payload(key: str, payload: dict, version: int) -> None:
+    entry = {"version": version, "payload": {k: v for k, v in payload.items() if k != "polyline"}}
+    cache.set(_cache_key(key), entry, timeout=settings.ROUTE_LANE_CACHE_SECONDS)
+
+
+def forget_lane(key: str) -> None:
+    cache.delete(_cache_key(key))
+
+
+def warm_lane(lane: Lane, version: int) -> bool:
+    waypoints = [Point(lon, lat) for lon, lat in lane.waypoints]
+    start = Point(lane.start_point.x, lane.start_point.y)
+    end = Point(lane.end_point.x, lane.end_point.y)
+    try:
+        payload = compute_route(start, end, waypoints=waypoints)
+    except (ValueError, requests.RequestException) as exc:
+        logger.warning("Lane %s: warm failed: %s", lane.key, exc)
+        return False
+    store_lane_payload(lane.key, payload, version)
+    lane.warmed_version = version
+    lane.last_warmed_at = timezone.now()
+    lane.save(update_fields=["warmed_version", "last_warmed_at"])
+    return True
+
+
+def hot_lane_candidates(window_days: int, min_hits: int, limit: int) -> List[Tuple[str, Route, int]]:
+    """Most frequent lanes in recent Route history as (key, sample route, hits)."""
+    since = timezone.now() - timedelta(days=window_days)
+    counts: Counter = Counter()
+    samples: Dict[str, Route] = {}
+    routes = Route.objects.filter(created_at__gte=since).only("start_point", "end_point", "waypoints")
+    for route in routes.iterator(chunk_size=2000):
+        waypoints = [Point(lon, lat) for lon, lat in route.waypoints]
+        key = lane_key(route.start_point, route.end_point, waypoints)
+        counts[key] += 1
+        samples.setdefault(key, route)
+    return [(key, samples[key], hits) for key, hits in counts.most_common(limit) if hits >= min_hits]
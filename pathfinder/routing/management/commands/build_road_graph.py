@@ -0,0 +1,43 @@
+import json
+from typing import Any, Iterator
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from routing.offline import RoadGraph
+
+
+def read_features(path: str) -> Iterator[dict]:
+    """GeoJSON FeatureCollection, or one feature per line (GeoJSONSeq) for large extracts."""
+    with open(path, encoding="utf-8") as f:
+        try:
+            first = json.loads(f.readline().strip().lstrip("\x1e") or "null")
+        except ValueError:
+            first = None
+        if not isinstance(first, dict) or first.get("type") != "Feature":
+            f.seek(0)
+            yield from json.load(f).get("features", [])
+            return
+        yield first
+        for line in f:
+            line = line.strip().lstrip("\x1e")
+            if line:
+                yield json.loads(line)
+
+
+class Command(BaseCommand):
+    help = "Build the offline routing graph file from OSM road LineStrings in GeoJSON."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("source", help="GeoJSON or GeoJSONSeq of highway LineStrings")
+        parser.add_argument("output", help="graph file to write (point ROAD_GRAPH_PATH at it)")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        try:
+            graph = RoadGraph.from_features(read_features(options["source"]))
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f"Cannot read {options['source']}: {exc}") from exc
+        with open(options["output"], "wb") as f:
+            graph.save(f)
+        self.stdout.write(
+            self.style.SUCCESS(f"wrote {graph.node_count} nodes, {graph.edge_count} edges to {options['output']}")
+        )
@@ -0,0 +1,73 @@
+import json
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils.dateparse import parse_date
+
+from routing.models import Route
+from routing.storage import route_storage_fields
+
+
+class Command(BaseCommand):
+    help = "Simplify geometry and gzip or drop route_json on Route rows stored before compaction."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--mode", choices=["compact", "minimal"], help="default: ROUTE_STORAGE_MODE, or compact")
+        parser.add_argument("--tolerance-meters", type=float, help="default: ROUTE_GEOMETRY_TOLERANCE_METERS")
+        parser.add_argument("--before", help="only rows created before this date (YYYY-MM-DD)")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="report savings without writing")
+        parser.add_argument("--vacuum", action="store_true", help="VACUUM ANALYZE routing_route afterwards")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        mode = options["mode"] or ("compact" if settings.ROUTE_STORAGE_MODE == "full" else settings.ROUTE_STORAGE_MODE)
+        tolerance = options["tolerance_meters"]
+        if tolerance is None:
+            tolerance = settings.ROUTE_GEOMETRY_TOLERANCE_METERS
+
+        routes = Route.objects.filter(compacted_at__isnull=True).order_by("id")
+        if options["before"]:
+            before = parse_date(options["before"])
+            if before is None:
+                raise CommandError("--before expects YYYY-MM-DD")
+            routes = routes.filter(created_at__date__lt=before)
+        routes = routes.only("id", "geometry", "route_json")
+
+        rows = vertices_before = vertices_after = json_before = json_after = 0
+        last_id = 0
+        while True:
+            # Keyset batches: each one is a short transaction and never rescans compacted rows.
+            batch = list(routes.filter(id__gt=last_id)[: options["batch_size"]])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            for route in batch:
+                json_before += len(json.dumps(route.route_json, cls=DjangoJSONEncoder)) if route.route_json else 0
+                vertices_before += len(route.geometry) if route.geometry else 0
+                for field, value in route_storage_fields(route.geometry, route.route_json, mode, tolerance).items():
+                    setattr(route, field, value)
+                vertices_after += len(route.geometry) if route.geometry else 0
+                json_after += len(route.route_json_gz or b"")
+            if not options["dry_run"]:
+                with transaction.atomic():
+                    Route.objects.bulk_update(
+                        batch, ["geometry", "route_json", "route_json_gz", "compacted_at"]
+                    )
+            rows += len(batch)
+            self.stdout.write(f"compacted {rows} routes (up to id {last_id})")
+
+        verb = "would compact" if options["dry_run"] else "compacted"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {rows} routes: vertices {vertices_before} -> {vertices_after}, "
+                f"route_json bytes {json_before} -> {json_after}"
+            )
+        )
+        if options["vacuum"] and not options["dry_run"]:
+            # Plain VACUUM makes the space reusable for new rows; returning it to the OS
+            # needs VACUUM FULL or pg_repack, which lock the table.
+            with connection.cursor() as cursor:
+                cursor.execute("VACUUM ANALYZE routing_route")
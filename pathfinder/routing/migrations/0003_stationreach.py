@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("routing", "0002_route_json"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StationReach",
+            fields=[
+                ("station_id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("max_range_miles", models.FloatField()),
+                ("neighbor_ids", models.BinaryField()),
+                ("distances", models.BinaryField()),
+                ("built_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
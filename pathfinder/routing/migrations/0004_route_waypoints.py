@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("routing", "0003_stationreach"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="route",
+            name="waypoints",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+import django.contrib.gis.db.models.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("routing", "0004_route_waypoints"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Lane",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("key", models.CharField(max_length=40, unique=True)),
+                ("start_point", django.contrib.gis.db.models.fields.PointField(geography=True, srid=4326)),
+                ("end_point", django.contrib.gis.db.models.fields.PointField(geography=True, srid=4326)),
+                ("waypoints", models.JSONField(blank=True, default=list)),
+                ("hits", models.PositiveIntegerField(default=0)),
+                ("pinned", models.BooleanField(default=False)),
+                ("enabled", models.BooleanField(default=True)),
+                ("warmed_version", models.BigIntegerField(blank=True, null=True)),
+                ("last_warmed_at", models.DateTimeField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("routing", "0005_lane"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="route",
+            name="route_json_gz",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="route",
+            name="compacted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        # Already gzipped: let TOAST move it out of row without compressing again.
+        migrations.RunSQL(
+            "ALTER TABLE routing_route ALTER COLUMN route_json_gz SET STORAGE EXTERNAL",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,110 @@
+from django.db import migrations
+
+# Route history is append-only and queried by recency, so it is range-partitioned
+# by month on created_at: old months can be compacted, detached or dropped without
+# touching current inserts. Postgres requires the partition key in the primary
+# key, so it becomes (id, created_at); ids still come from one identity sequence
+# and stay unique, which is all the ORM relies on.
+
+ENSURE_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION routing_route_ensure_partitions(first_month date, last_month date)
+RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    month date := date_trunc('month', first_month)::date;
+    partition text;
+    created integer := 0;
+BEGIN
+    WHILE month <= last_month LOOP
+        partition := format('routing_route_y%sm%s', to_char(month, 'YYYY'), to_char(month, 'MM'));
+        IF to_regclass(partition) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF routing_route FOR VALUES FROM (%L) TO (%L)',
+                partition,
+                month::timestamp AT TIME ZONE 'UTC',
+                (month + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+            );
+            created := created + 1;
+        END IF;
+        month := (month + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END
+$$;
+"""
+
+ROUTE_INDEXES = """
+CREATE INDEX routing_route_start_point_id ON routing_route USING GIST (start_point);
+CREATE INDEX routing_route_end_point_id ON routing_route USING GIST (end_point);
+CREATE INDEX routing_route_geometry_id ON routing_route USING GIST (geometry);
+"""
+
+RESET_ID_SEQUENCE = """
+SELECT setval(pg_get_serial_sequence('routing_route', 'id'), COALESCE(MAX(id), 0) + 1, false)
+FROM routing_route;
+"""
+
+FORWARD = [
+    "ALTER TABLE routing_route RENAME TO routing_route_old",
+    "ALTER TABLE routing_route_old RENAME CONSTRAINT routing_route_pkey TO routing_route_old_pkey",
+    """
+    DO $$
+    DECLARE idx record;
+    BEGIN
+        FOR idx IN
+            SELECT indexname FROM pg_indexes
+            WHERE schemaname = current_schema()
+              AND tablename = 'routing_route_old'
+              AND indexname <> 'routing_route_old_pkey'
+        LOOP
+            EXECUTE format('DROP INDEX %I', idx.indexname);
+        END LOOP;
+    END
+    $$;
+    """,
+    """
+    CREATE TABLE routing_route (
+        LIKE routing_route_old INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING STORAGE
+    ) PARTITION BY RANGE (created_at)
+    """,
+    "ALTER TABLE routing_route ADD CONSTRAINT routing_route_pkey PRIMARY KEY (id, created_at)",
+    ROUTE_INDEXES,
+    ENSURE_PARTITIONS_FUNCTION,
+    # Catches rows outside the pre-created months; routing.tasks.create_route_partitions
+    # keeps ROUTE_PARTITION_MONTHS_AHEAD months ready so it normally stays empty.
+    "CREATE TABLE routing_route_default PARTITION OF routing_route DEFAULT",
+    """
+    SELECT routing_route_ensure_partitions(
+        COALESCE((SELECT MIN(created_at) FROM routing_route_old), now())::date,
+        (now() + interval '3 months')::date
+    )
+    """,
+    "INSERT INTO routing_route SELECT * FROM routing_route_old",
+    "DROP TABLE routing_route_old",
+    RESET_ID_SEQUENCE,
+]
+
+BACKWARD = [
+    """
+    CREATE TABLE routing_route_flat (
+        LIKE routing_route INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING STORAGE
+    )
+    """,
+    "INSERT INTO routing_route_flat SELECT * FROM routing_route",
+    "DROP TABLE routing_route",
+    "DROP FUNCTION routing_route_ensure_partitions(date, date)",
+    "ALTER TABLE routing_route_flat RENAME TO routing_route",
+    "ALTER TABLE routing_route ADD CONSTRAINT routing_route_pkey PRIMARY KEY (id)",
+    ROUTE_INDEXES,
+    RESET_ID_SEQUENCE,
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("routing", "0006_route_compaction"),
+    ]
+
+    operations = [
+        migrations.RunSQL(FORWARD, reverse_sql=BACKWARD),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("routing", "0007_partition_route_by_month"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="route",
+            name="corridor_stations",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="route",
+            name="recosted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
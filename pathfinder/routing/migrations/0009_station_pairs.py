@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+# Reachability moves from one packed neighbour row per station to one row per
+# station pair, so a corridor reads only the pairs with both ends inside it.
+# The table is derived data: it starts empty and routing.tasks.rebuild_station_graph
+# fills it; until then precomputed mode measures distances on the fly.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("routing", "0008_route_corridor_stations"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StationPair",
+            fields=[
+                (
+                    "pk",
+                    models.CompositePrimaryKey(
+                        "station_id", "neighbor_id", blank=True, editable=False, primary_key=True, serialize=False
+                    ),
+                ),
+                ("station_id", models.BigIntegerField()),
+                ("neighbor_id", models.BigIntegerField()),
+                ("miles", models.FloatField()),
+                ("max_range_miles", models.FloatField()),
+            ],
+        ),
+        migrations.DeleteModel(
+            name="StationReach",
+        ),
+    ]
@@ -1,14 +1,74 @@
 from django.contrib.gis.db import models
 
+from .storage import unpack_route_json
+
 
 class Route(models.Model):
     start_point = models.PointField(geography=True)
     end_point = models.PointField(geography=True)
+    # Ordered [lon, lat] pairs visited between start and end.
+    waypoints = models.JSONField(default=list, blank=True)
     geometry = models.LineStringField(geography=True, null=True, blank=True)
     fuel_stops = models.JSONField(default=list, blank=True)
     total_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     route_json = models.JSONField(default=dict, blank=True)
+    # Provider payload gzipped out of row when ROUTE_STORAGE_MODE is "compact".
+    route_json_gz = models.BinaryField(null=True, blank=True)
+    # Set once geometry is simplified and route_json moved/dropped (see compact_routes).
+    compacted_at = models.DateTimeField(null=True, blank=True)
+    # Corridor stations the plan was chosen from (storage.pack_corridor); lets
+    # recost_routes re-run the optimizer after a price update.
+    corridor_stations = models.BinaryField(null=True, blank=True)
+    recosted_at = models.DateTimeField(null=True, blank=True)
+    # Table is range-partitioned by month on created_at (migration 0007).
     created_at = models.DateTimeField(auto_now_add=True)
 
+    def route_payload(self) -> dict:
+        """Provider payload regardless of where it is stored."""
+        return self.route_json or unpack_route_json(self.route_json_gz)
+
     def __str__(self) -> str:  # pragma: no cover - trivial
         return f"Route {self.id}"
+
+
+class StationPair(models.Model):
+    """
+    Two stations within max_range_miles of each other, stored once with
+    station_id < neighbor_id. The primary key index serves lookups that need
+    both ends inside one corridor.
+    """
+
+    pk = models.CompositePrimaryKey("station_id", "neighbor_id")
+    station_id = models.BigIntegerField()
+    neighbor_id = models.BigIntegerField()
+    miles = models.FloatField()
+    max_range_miles = models.FloatField()
+
+    @classmethod
+    def between(cls, a_id: int, b_id: int, miles: float, max_range_miles: float) -> "StationPair":
+        low, high = sorted((a_id, b_id))
+        return cls(station_id=low, neighbor_id=high, miles=miles, max_range_miles=max_range_miles)
+
+    def __str__(self) -> str:  # pragma: no cover - trivial
+        return f"StationPair {self.station_id}-{self.neighbor_id}"
+
+
+class Lane(models.Model):
+    """
+    A start/end (+ waypoints) pair whose route result is kept warm in cache.
+    Lanes are discovered from Route history or registered explicitly (pinned).
+    """
+
+    key = models.CharField(max_length=40, unique=True)
+    start_point = models.PointField(geography=True)
+    end_point = models.PointField(geography=True)
+    waypoints = models.JSONField(default=list, blank=True)
+    hits = models.PositiveIntegerField(default=0)
+    pinned = models.BooleanField(default=False)
+    enabled = models.BooleanField(default=True)
+    warmed_version = models.BigIntegerField(null=True, blank=True)
+    last_warmed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:  # pragma: no cover - trivial
+        return f"Lane {self.key}"
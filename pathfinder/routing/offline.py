@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import heapq
+import json
+import math
+import sys
+import threading
+from array import array
+from collections import defaultdict
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .services import haversine_miles
+
+METERS_PER_MILE = 1609.344
+MAGIC = b"PFROADS1\n"
+# Grid cell for nearest-node lookup; ~5 km, so a snap usually checks one ring of cells.
+CELL_DEGREES = 0.05
+# Free-flow speeds for OSM highway classes without a usable maxspeed tag.
+SPEEDS_KPH: Dict[str, float] = {
+    "motorway": 105,
+    "motorway_link": 70,
+    "trunk": 90,
+    "trunk_link": 60,
+    "primary": 80,
+    "primary_link": 50,
+    "secondary": 65,
+    "secondary_link": 45,
+    "tertiary": 55,
+    "tertiary_link": 40,
+    "unclassified": 45,
+    "residential": 35,
+    "service": 20,
+}
+DEFAULT_SPEED_KPH = 40.0
+
+
+def _speed_kph(props: dict) -> float:
+    raw = str(props.get("maxspeed") or "").strip().lower()
+    if raw:
+        number = raw.split()[0]
+        try:
+            value = float(number)
+        except ValueError:
+            value = 0.0
+        if value > 0:
+            return value * 1.609344 if "mph" in raw else value
+    return SPEEDS_KPH.get(str(props.get("highway") or ""), DEFAULT_SPEED_KPH)
+
+
+def _direction(props: dict) -> int:
+    """1 = both ways, 2 = forward only, 3 = reverse only (OSM oneway=-1)."""
+    oneway = str(props.get("oneway") or "").strip().lower()
+    if oneway in ("yes", "true", "1"):
+        return 2
+    if oneway == "-1":
+        return 3
+    return 1
+
+
+def _line_parts(geometry: dict) -> Iterator[Sequence[Sequence[float]]]:
+    if geometry.get("type") == "LineString":
+        yield geometry["coordinates"]
+    elif geometry.get("type") == "MultiLineString":
+        yield from geometry["coordinates"]
+
+
+class RoadGraph:
+    """
+    Directed road network in compressed sparse row form: the edges leaving node
+    u are targets[offsets[u]:offsets[u + 1]], with lengths in meters and costs
+    in free-flow seconds. Node coordinates are parallel lon/lat arrays.
+    """
+
+    def __init__(
+        self,
+        lon: array,
+        lat: array,
+        offsets: array,
+        targets: array,
+        lengths: array,
+        costs: array,
+    ) -> None:
+        self.lon, self.lat = lon, lat
+        self.offsets, self.targets = offsets, targets
+        self.lengths, self.costs = lengths, costs
+        # Fastest edge bounds the A* heuristic (straight-line meters / top speed).
+        self.max_speed = max((l / c for l, c in zip(lengths, costs) if c > 0), default=1.0)
+        self._cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for node, (x, y) in enumerate(zip(lon, lat)):
+            self._cells[(math.floor(x / CELL_DEGREES), math.floor(y / CELL_DEGREES))].append(node)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.lon)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    @classmethod
+    def from_features(cls, features: Iterable[dict]) -> "RoadGraph":
+        """Build from GeoJSON LineString features with OSM highway/oneway/maxspeed properties."""
+        index: Dict[Tuple[float, float], int] = {}
+        lon, lat = array("d"), array("d")
+        edges: List[Tuple[int, int, float, float]] = []
+
+        def node_id(coord: Sequence[float]) -> int:
+            key = (round(coord[0], 6), round(coord[1], 6))
+            node = index.get(key)
+            if node is None:
+                node = index[key] = len(lon)
+                lon.append(key[0])
+                lat.append(key[1])
+            return node
+
+        for feature in features:
+            props = feature.get("properties") or {}
+            mps = _speed_kph(props) / 3.6
+            direction = _direction(props)
+            for part in _line_parts(feature.get("geometry") or {}):
+                for a, b in zip(part, part[1:]):
+                    u, v = node_id(a), node_id(b)
+                    if u == v:
+                        continue
+                    meters = haversine_miles((lon[u], lat[u]), (lon[v], lat[v])) * METERS_PER_MILE
+                    if direction in (1, 2):
+                        edges.append((u, v, meters, meters / mps))
+                    if direction in (1, 3):
+                        edges.append((v, u, meters, meters / mps))
+
+        edges.sort()
+        offsets = array("q", [0] * (len(lon) + 1))
+        for u, _, _, _ in edges:
+            offsets[u + 1] += 1
+        for i in range(len(lon)):
+            offsets[i + 1] += offsets[i]
+        return cls(
+            lon,
+            lat,
+            offsets,
+            array("i", [e[1] for e in edges]),
+            array("f", [e[2] for e in edges]),
+            array("f", [e[3] for e in edges]),
+        )
+
+    def save(self, f: IO[bytes]) -> None:
+        header = {"nodes": self.node_count, "edges": self.edge_count, "byteorder": sys.byteorder}
+        f.write(MAGIC)
+        f.write(json.dumps(header).encode() + b"\n")
+        for values in (self.lon, self.lat, self.offsets, self.targets, self.lengths, self.costs):
+            values.tofile(f)
+
+    @classmethod
+    def load(cls, f: IO[bytes]) -> "RoadGraph":
+        if f.readline() != MAGIC:
+            raise ValueError("Not a road graph file (run manage.py build_road_graph)")
+        header = json.loads(f.readline())
+        n, m = header["nodes"], header["edges"]
+        parts = []
+        for typecode, count in (("d", n), ("d", n), ("q", n + 1), ("i", m), ("f", m), ("f", m)):
+            values = array(typecode)
+            values.fromfile(f, count)
+            if header["byteorder"] != sys.byteorder:
+                values.byteswap()
+            parts.append(values)
+        return cls(*parts)
+
+    def nearest_node(self, lon: float, lat: float, max_meters: float) -> Optional[int]:
+        cx, cy = math.floor(lon / CELL_DEGREES), math.floor(lat / CELL_DEGREES)
+        # Narrowest cell side (longitude shrinks with latitude) bounds how far a ring reaches.
+        cell_meters = CELL_DEGREES * 111_320 * max(0.1, math.cos(math.radians(lat)))
+        best, best_meters = None, max_meters
+        for ring in range(math.ceil(max_meters / cell_meters) + 1):
+            for dx in range(-ring, ring + 1):
+                for dy in range(-ring, ring + 1):
+                    if max(abs(dx), abs(dy)) != ring:
+                        continue
+                    for node in self._cells.get((cx + dx, cy + dy), ()):
+                        meters = haversine_miles((lon, lat), (self.lon[node], self.lat[node])) * METERS_PER_MILE
+                        if meters <= best_meters:
+                            best, best_meters = node, meters
+            # Nodes in later rings are at least ring * cell_meters away.
+            if best is not None and best_meters <= ring * cell_meters:
+                break
+        return best
+
+    def shortest_path(self, source: int, target: int) -> Optional[List[int]]:
+        """A* on travel time with an admissible straight-line / top-speed heuristic."""
+        tx, ty = self.lon[target], self.lat[target]
+
+        def h(node: int) -> float:
+            return haversine_miles((self.lon[node], self.lat[node]), (tx, ty)) * METERS_PER_MILE / self.max_speed
+
+        best: Dict[int, float] = {source: 0.0}
+        prev: Dict[int, int] = {}
+        heap = [(h(source), 0.0, source)]
+        done = set()
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if node == target:
+                path = [node]
+                while node in prev:
+                    node = prev[node]
+                    path.append(node)
+                return path[::-1]
+            if node in done:
+                continue
+            done.add(node)
+            for i in range(self.offsets[node], self.offsets[node + 1]):
+                nxt = self.targets[i]
+                new_cost = cost + self.costs[i]
+                if new_cost < best.get(nxt, math.inf):
+                    best[nxt] = new_cost
+                    prev[nxt] = node
+                    heapq.heappush(heap, (new_cost + h(nxt), new_cost, nxt))
+        return None
+
+    def directions(self, points: Sequence[Tuple[float, float]], max_snap_meters: float) -> dict:
+        """Route through points in order, in the normalized provider shape."""
+        nodes = []
+        for lon, lat in points:
+            node = self.nearest_node(lon, lat, max_snap_meters)
+            if node is None:
+                raise ValueError(f"No road within {max_snap_meters:.0f} m of {lon},{lat}")
+            nodes.append(node)
+
+        path: List[int] = [nodes[0]]
+        for a, b in zip(nodes, nodes[1:]):
+            leg = self.shortest_path(a, b)
+            if leg is None:
+                raise ValueError("No road connection between route points in the offline graph")
+            path.extend(leg[1:])
+
+        distance = duration = 0.0
+        for u, v in zip(path, path[1:]):
+            for i in range(self.offsets[u], self.offsets[u + 1]):
+                if self.targets[i] == v:
+                    distance += self.lengths[i]
+                    duration += self.costs[i]
+                    break
+        coords = [[self.lon[n], self.lat[n]] for n in path]
+        if len(coords) == 1:
+            coords.append(list(coords[0]))
+        return {
+            "features": [
+                {
+                    "geometry": {"coordinates": coords},
+                    "properties": {"summary": {"distance": distance, "duration": duration}},
+                }
+            ]
+        }
+
+
+_graph: Optional[RoadGraph] = None
+_graph_path: Optional[str] = None
+_graph_lock = threading.Lock()
+
+
+def road_graph(path: str) -> RoadGraph:
+    """The graph at path, loaded once per process."""
+    global _graph, _graph_path
+    if _graph is None or _graph_path != path:
+        with _graph_lock:
+            if _graph is None or _graph_path != path:
+                with open(path, "rb") as f:
+                    _graph = RoadGraph.load(f)
+                _graph_path = path
+    return _graph
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from dataclasses import replace
+from datetime import timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from django.contrib.gis.geos import Point
+from django.utils import timezone
+from ingest.models import FuelStation
+
+from .models import Route
+from .services import StationNode, plan_fuel_stops
+from .storage import pack_corridor, unpack_corridor
+import logging
+
+logger = logging.getLogger(__name__)
+
+# (lon, lat, price, name) of a geocoded station.
+StationInfo = Tuple[float, float, Decimal, str]
+
+RECOST_FIELDS = ["fuel_stops", "total_cost", "corridor_stations", "recosted_at"]
+
+
+def load_stations(station_ids: Iterable[int], known: Dict[int, StationInfo]) -> None:
+    """Add the current price and position of station_ids not yet in known, in one query."""
+    missing = [station_id for station_id in set(station_ids) if station_id not in known]
+    if not missing:
+        return
+    rows = FuelStation.objects.filter(id__in=missing, geom__isnull=False).values_list("id", "geom", "price", "name")
+    for station_id, geom, price, name in rows:
+        known[station_id] = (geom.x, geom.y, price, name)
+
+
+def recost_route(route: Route, stations: Dict[int, StationInfo]) -> bool:
+    """
+    Re-run the optimizer for a stored route over its stored corridor at current
+    prices, without the directions provider or the corridor query. Returns
+    False, leaving the route untouched, when no corridor price changed or the
+    plan is no longer feasible.
+    """
+    nodes: List[StationNode] = []
+    changed = False
+    for station_id, route_miles, costed_mills in unpack_corridor(route.corridor_stations):
+        info = stations.get(station_id)
+        if info is None:  # deleted or lost its coordinates
+            changed = True
+            continue
+        lon, lat, price, name = info
+        node = StationNode(id=station_id, lon=lon, lat=lat, price=price, name=name, route_miles=route_miles)
+        changed = changed or node.price_mills != costed_mills
+        nodes.append(node)
+    if not changed:
+        return False
+
+    waypoints = [(lon, lat) for lon, lat in route.waypoints]
+    coords = route.geometry.coords if waypoints and route.geometry else None
+    planned = nodes
+    if coords:
+        # Stored route_miles were measured on the provider line, which compact
+        # storage simplifies (shortens); place stations on the stored line the
+        # waypoints are located on, so both use the same mileage.
+        planned = [replace(node, route_miles=None) for node in nodes]
+    start = Point(route.start_point.x, route.start_point.y)
+    end = Point(route.end_point.x, route.end_point.y)
+    try:
+        plan = plan_fuel_stops(start, end, planned, waypoints, coords)
+    except ValueError as exc:
+        logger.info("Route %s: not re-costed: %s", route.id, exc)
+        return False
+    route.fuel_stops = plan["fuel_stops"]
+    route.total_cost = plan["total_cost"]
+    route.corridor_stations = pack_corridor(nodes)
+    route.recosted_at = timezone.now()
+    return True
+
+
+def recost_batch(routes: Sequence[Route], stations: Dict[int, StationInfo]) -> List[Route]:
+    """Re-cost routes in memory; returns the ones that changed, ready for bulk_update."""
+    load_stations(
+        (station_id for route in routes for station_id, _, _ in unpack_corridor(route.corridor_stations)),
+        stations,
+    )
+    return [route for route in routes if recost_route(route, stations)]
+
+
+def recost_candidates(window_days: int):
+    """Routes created in the last window_days that stored their corridor."""
+    since = timezone.now() - timedelta(days=window_days)
+    return (
+        Route.objects.filter(created_at__gte=since, corridor_stations__isnull=False)
+        .order_by("id")
+        .only("id", "start_point", "end_point", "waypoints", "geometry", "corridor_stations")
+    )
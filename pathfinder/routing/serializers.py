@@ -1,9 +1,31 @@
 from rest_framework import serializers
 
+from .models import Lane
+
 
 class RouteRequestSerializer(serializers.Serializer):
     start = serializers.CharField(help_text="Start coordinate as 'lon,lat'")
     end = serializers.CharField(help_text="End coordinate as 'lon,lat'")
+    waypoints = serializers.ListField(
+        child=serializers.CharField(),
+        required=False,
+        default=list,
+        # Mapbox accepts at most 25 coordinates per directions call.
+        max_length=23,
+        help_text="Ordered intermediate stops as 'lon,lat' strings",
+    )
+    alternatives = serializers.IntegerField(
+        required=False,
+        default=0,
+        min_value=0,
+        max_value=5,
+        help_text="Also return this many next-cheapest distinct fuel-stop plans",
+    )
+    max_stops = serializers.IntegerField(
+        required=False,
+        min_value=0,
+        help_text="Also return the cheapest plan with at most this many fuel stops",
+    )
 
 
 class RouteGeometrySerializer(serializers.Serializer):
@@ -31,9 +53,55 @@ class FuelStopSerializer(serializers.Serializer):
     price = serializers.CharField()
 
 
+class FuelPlanSerializer(serializers.Serializer):
+    fuel_stops = FuelStopSerializer(many=True)
+    total_cost = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    gallons = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+
+
 class RouteResponseSerializer(serializers.Serializer):
     route = RoutePayloadSerializer()
     fuel_stops = FuelStopSerializer(many=True)
     total_cost = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
     gallons = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
     static_map_url = serializers.CharField(allow_blank=True)
+    alternatives = FuelPlanSerializer(
+        many=True, required=False, help_text="Next-cheapest distinct plans, when requested"
+    )
+    max_stops_plan = FuelPlanSerializer(
+        required=False, allow_null=True, help_text="Cheapest plan within max_stops; null when none exists"
+    )
+
+
+class TileStatsSerializer(serializers.Serializer):
+    tile = serializers.CharField(help_text="Grid cell as 'x:y' in ROUTE_TILE_DEGREES units")
+    bounds = serializers.ListField(child=serializers.FloatField(), help_text="min lon, min lat, max lon, max lat")
+    hits = serializers.IntegerField()
+    misses = serializers.IntegerField()
+    hit_rate = serializers.FloatField()
+
+
+class LaneSerializer(serializers.ModelSerializer):
+    start = serializers.SerializerMethodField()
+    end = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Lane
+        fields = [
+            "id",
+            "key",
+            "start",
+            "end",
+            "waypoints",
+            "hits",
+            "pinned",
+            "enabled",
+            "warmed_version",
+            "last_warmed_at",
+        ]
+
+    def get_start(self, obj: Lane) -> str:
+        return f"{obj.start_point.x},{obj.start_point.y}"
+
+    def get_end(self, obj: Lane) -> str:
+        return f"{obj.end_point.x},{obj.end_point.y}"
@@ -1,17 +1,41 @@
 from __future__ import annotations
 
+import bisect
+import heapq
+import logging
 import math
-from dataclasses import dataclass
-from decimal import Decimal
-from typing import Dict, List, Tuple
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import ROUND_HALF_EVEN, Decimal
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
 import requests
 from django.conf import settings
 from django.contrib.gis.geos import LineString, Point
+from django.db.models.expressions import RawSQL
 from ingest.models import FuelStation
+from pathfinder.metrics import (
+    ROUTE_CORRIDOR_STATIONS,
+    ROUTE_GRAPH_EDGES,
+    ROUTE_GRAPH_NODES,
+    stage,
+)
+from pathfinder.provider_http import RetryPolicy, request_with_retry
+
+from .models import StationPair
+from .storage import pack_corridor
+
+logger = logging.getLogger(__name__)
 
 MILES_PER_GALLON = Decimal(str(settings.VEHICLE_MPG))
 MAX_RANGE_MILES = float(settings.VEHICLE_MAX_RANGE_MILES)
+# The optimizer works in integers: prices in mills (tenths of a cent, the
+# precision OPIS quotes) and distances in millionths of a mile, fine enough that
+# rounding never moves a trip total by a cent. An edge weighs distance units *
+# mills; dividing by MPG is the same for every edge, so it is left to
+# cost_to_dollars at the response boundary.
+MILLS_PER_DOLLAR = 1000
+DISTANCE_UNITS_PER_MILE = 1_000_000
 _HTTP_SESSION = requests.Session()
 
 
@@ -22,37 +46,62 @@ class StationNode:
     lat: float
     price: Decimal
     name: str
+    # Distance from the route start measured along the polyline, when known.
+    route_miles: Optional[float] = None
+    price_mills: int = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.price_mills = price_to_mills(self.price)
 
 
 class RoutingClient:
     def __init__(self, api_key: str | None = None) -> None:
         self.api_key = api_key or settings.MAPBOX_API_KEY or settings.ORS_API_KEY
 
-    def directions(self, start: Tuple[float, float], end: Tuple[float, float]) -> dict:
-        if settings.MAPBOX_API_KEY:
-            return self._directions_mapbox(start, end)
-        if settings.ORS_API_KEY:
+    def directions(
+        self,
+        start: Tuple[float, float],
+        end: Tuple[float, float],
+        waypoints: Sequence[Tuple[float, float]] = (),
+    ) -> dict:
+        provider = settings.ROUTING_PROVIDER
+        if provider == "offline" or (
+            provider == "auto"
+            and not (settings.MAPBOX_API_KEY or settings.ORS_API_KEY)
+            and settings.ROAD_GRAPH_PATH
+        ):
+            return self._directions_offline([start, *waypoints, end])
+        if settings.MAPBOX_API_KEY and provider in ("auto", "mapbox"):
+            return self._directions_mapbox(start, end, waypoints)
+        if settings.ORS_API_KEY and provider in ("auto", "ors"):
+            if waypoints:
+                return self._directions_ors_multi([start, *waypoints, end])
             return self._directions_ors(start, end)
         raise ValueError("No routing API key configured")
 
-    def _directions_mapbox(self, start: Tuple[float, float], end: Tuple[float, float]) -> dict:
-        url = (
-            f"{settings.MAPBOX_DIRECTIONS_BASE_URL.rstrip('/')}/"
-            f"{start[0]},{start[1]};{end[0]},{end[1]}"
-        )
+    def _directions_offline(self, points: List[Tuple[float, float]]) -> dict:
+        from .offline import road_graph
+
+        if not settings.ROAD_GRAPH_PATH:
+            raise ValueError("ROAD_GRAPH_PATH is not set for the offline routing provider")
+        return road_graph(settings.ROAD_GRAPH_PATH).directions(points, settings.ROAD_GRAPH_MAX_SNAP_METERS)
+
+    def _directions_mapbox(
+        self,
+        start: Tuple[float, float],
+        end: Tuple[float, float],
+        waypoints: Sequence[Tuple[float, float]] = (),
+    ) -> dict:
+        points = ";".join(f"{lon},{lat}" for lon, lat in [start, *waypoints, end])
+        url = f"{settings.MAPBOX_DIRECTIONS_BASE_URL.rstrip('/')}/{points}"
         params = {"access_token": settings.MAPBOX_API_KEY, "geometries": "geojson"}
-        last_response = None
-        for _ in range(max(1, settings.MAPBOX_DIRECTIONS_MAX_ATTEMPTS)):
-            resp = _HTTP_SESSION.get(url, params=params, timeout=settings.HTTP_TIMEOUT_SECONDS)
-            last_response = resp
-            if resp.ok:
-                data = resp.json()
-                # Normalize to ORS-like shape
-                coords = data["routes"][0]["geometry"]["coordinates"]
-                return {"features": [{"geometry": {"coordinates": coords}}]}
-        if last_response is not None:
-            last_response.raise_for_status()
-        raise ValueError("Mapbox directions call failed")
+        policy = RetryPolicy.from_settings(settings.MAPBOX_DIRECTIONS_MAX_ATTEMPTS)
+        resp = request_with_retry(_HTTP_SESSION, "GET", url, policy, params=params)
+        resp.raise_for_status()
+        data = resp.json()
+        # Normalize to ORS-like shape
+        coords = data["routes"][0]["geometry"]["coordinates"]
+        return {"features": [{"geometry": {"coordinates": coords}}]}
 
     def _directions_ors(self, start: Tuple[float, float], end: Tuple[float, float]) -> dict:
         url = settings.ORS_DIRECTIONS_URL
@@ -61,15 +110,20 @@ class RoutingClient:
             "start": f"{start[0]},{start[1]}",
             "end": f"{end[0]},{end[1]}",
         }
-        last_response = None
-        for _ in range(max(1, settings.ORS_DIRECTIONS_MAX_ATTEMPTS)):
-            resp = _HTTP_SESSION.get(url, params=params, timeout=settings.HTTP_TIMEOUT_SECONDS)
-            last_response = resp
-            if resp.ok:
-                return resp.json()
-        if last_response is not None:
-            last_response.raise_for_status()
-        raise ValueError("ORS directions call failed")
+        policy = RetryPolicy.from_settings(settings.ORS_DIRECTIONS_MAX_ATTEMPTS)
+        resp = request_with_retry(_HTTP_SESSION, "GET", url, policy, params=params)
+        resp.raise_for_status()
+        return resp.json()
+
+    def _directions_ors_multi(self, points: List[Tuple[float, float]]) -> dict:
+        # The GET endpoint only takes start/end; via points need the POST GeoJSON variant.
+        url = f"{settings.ORS_DIRECTIONS_URL.rstrip('/')}/geojson"
+        headers = {"Authorization": settings.ORS_API_KEY}
+        body = {"coordinates": [list(p) for p in points]}
+        policy = RetryPolicy.from_settings(settings.ORS_DIRECTIONS_MAX_ATTEMPTS)
+        resp = request_with_retry(_HTTP_SESSION, "POST", url, policy, json=body, headers=headers)
+        resp.raise_for_status()
+        return resp.json()
 
 
 def haversine_miles(p1: Tuple[float, float], p2: Tuple[float, float]) -> float:
@@ -85,11 +139,103 @@ def haversine_miles(p1: Tuple[float, float], p2: Tuple[float, float]) -> float:
     return R * c
 
 
+def polyline_miles(coords: List[Tuple[float, float]]) -> float:
+    return sum(haversine_miles(coords[i], coords[i + 1]) for i in range(len(coords) - 1))
+
+
+def locate_on_polyline(coords: Sequence[Sequence[float]], point: Tuple[float, float]) -> float:
+    """
+    Fraction (0..1) of the polyline's planar lon/lat length at the closest
+    point to `point`; the same measure as PostGIS ST_LineLocatePoint.
+    """
+    px, py = point
+    lengths = [math.dist(coords[i], coords[i + 1]) for i in range(len(coords) - 1)]
+    total = sum(lengths)
+    if total == 0:
+        return 0.0
+    best, best_along, walked = float("inf"), 0.0, 0.0
+    for (ax, ay), (bx, by), length in zip(coords, coords[1:], lengths):
+        t = 0.0
+        if length:
+            t = min(1.0, max(0.0, ((px - ax) * (bx - ax) + (py - ay) * (by - ay)) / (length * length)))
+        qx, qy = ax + t * (bx - ax), ay + t * (by - ay)
+        dist = (px - qx) ** 2 + (py - qy) ** 2
+        if dist < best:
+            best, best_along = dist, walked + t * length
+        walked += length
+    return best_along / total
+
+
+class TripLayout:
+    """
+    Ordered waypoints of a multi-stop trip. Every node belongs to a layer: the
+    number of waypoints passed before reaching it along the route. A leg may
+    only move forward through layers, and its length runs via each waypoint
+    in between, so fuel bought before a waypoint is carried past it.
+    """
+
+    def __init__(self, waypoints: List[Tuple[float, float]], layers: Dict[int, int]) -> None:
+        self.waypoints = waypoints
+        self.layers = layers
+        # via[k] = miles from waypoint k to the last waypoint, through the ones between.
+        self.via = [0.0] * len(waypoints)
+        for k in range(len(waypoints) - 2, -1, -1):
+            self.via[k] = self.via[k + 1] + haversine_miles(waypoints[k], waypoints[k + 1])
+
+    @classmethod
+    def for_route(
+        cls,
+        coords: Sequence[Sequence[float]],
+        waypoints: List[Tuple[float, float]],
+        nodes: List[StationNode],
+        start_id: int,
+        end_id: int,
+    ) -> "TripLayout":
+        route_length = polyline_miles([tuple(c) for c in coords])
+        marks: List[float] = []
+        for point in waypoints:
+            # Waypoints are visited in order, so positions can't move backwards.
+            mile = locate_on_polyline(coords, point) * route_length
+            marks.append(max(mile, marks[-1]) if marks else mile)
+        layers = {start_id: 0, end_id: len(waypoints)}
+        for node in nodes:
+            if node.id in layers:
+                continue
+            mile = node.route_miles
+            if mile is None:
+                mile = locate_on_polyline(coords, (node.lon, node.lat)) * route_length
+            layers[node.id] = bisect.bisect_right(marks, mile)
+        return cls(waypoints, layers)
+
+    def leg_miles(self, a: StationNode, b: StationNode) -> Optional[float]:
+        la, lb = self.layers[a.id], self.layers[b.id]
+        if lb < la:
+            return None
+        if la == lb:
+            return haversine_miles((a.lon, a.lat), (b.lon, b.lat))
+        return (
+            haversine_miles((a.lon, a.lat), self.waypoints[la])
+            + self.via[la]
+            - self.via[lb - 1]
+            + haversine_miles(self.waypoints[lb - 1], (b.lon, b.lat))
+        )
+
+
 def filter_stations_along_route(polyline: LineString, corridor_miles: float = 25) -> List[StationNode]:
+    if settings.ROUTE_TILE_CACHE:
+        from .tiles import stations_from_tiles
+
+        return stations_from_tiles(polyline, corridor_miles)
     # Quick spatial filter using PostGIS via queryset
     corridor_meters = corridor_miles * 1609.34
+    route_length = polyline_miles(polyline.coords)
     qs = (
-        FuelStation.objects.annotate()
+        FuelStation.objects.annotate(
+            route_fraction=RawSQL(
+                "ST_LineLocatePoint(ST_GeomFromText(%s, 4326), geom::geometry)",
+                (polyline.wkt,),
+            )
+        )
         .filter(geom__distance_lte=(polyline, corridor_meters))
         .only("id", "geom", "price", "name")
     )
@@ -103,37 +249,257 @@ def filter_stations_along_route(polyline: LineString, corridor_miles: float = 25
                     lat=station.geom.y,
                     price=station.price,
                     name=station.name,
+                    route_miles=station.route_fraction * route_length,
                 )
             )
     return nodes
 
 
-def build_graph(nodes: List[StationNode]) -> Dict[int, Dict[int, float]]:
-    graph: Dict[int, Dict[int, float]] = {node.id: {} for node in nodes}
+def prune_dominated_stations(
+    stations: List[StationNode], bin_miles: float, top_k: int
+) -> List[StationNode]:
+    """
+    Bin stations by along-route mileage and keep only the top_k cheapest per
+    bin. Stations without a known route position are always kept. Not exact:
+    a dropped station may be the only one reachable for the next leg, so the
+    plan can cost more than the unpruned optimum.
+    """
+    if bin_miles <= 0 or top_k <= 0:
+        return list(stations)
+    kept: List[StationNode] = []
+    bins: Dict[int, List[StationNode]] = defaultdict(list)
+    for station in stations:
+        if station.route_miles is None:
+            kept.append(station)
+        else:
+            bins[int(station.route_miles // bin_miles)].append(station)
+    for members in bins.values():
+        kept.extend(sorted(members, key=lambda n: (n.price, n.id))[:top_k])
+    return kept
+
+
+def price_to_mills(price: Decimal | float | str) -> int:
+    return int((Decimal(str(price)) * MILLS_PER_DOLLAR).to_integral_value(ROUND_HALF_EVEN))
+
+
+def leg_cost(distance_miles: float, price_mills: int) -> int:
+    # Fuel cost is paid at the source stop before driving the leg.
+    return round(distance_miles * DISTANCE_UNITS_PER_MILE) * price_mills
+
+
+def cost_to_dollars(cost: int) -> Decimal:
+    """Dollars for a sum of leg_cost weights, rounded to the cent."""
+    dollars = Decimal(cost) / (DISTANCE_UNITS_PER_MILE * MILLS_PER_DOLLAR * MILES_PER_GALLON)
+    return round(dollars, 2)
+
+
+def build_graph(
+    nodes: List[StationNode], layout: Optional[TripLayout] = None
+) -> Dict[int, Dict[int, int]]:
+    if layout is not None:
+        return _build_layered_graph(nodes, layout)
+    graph: Dict[int, Dict[int, int]] = {node.id: {} for node in nodes}
     coords = {node.id: (node.lon, node.lat) for node in nodes}
-    prices = {node.id: node.price for node in nodes}
+    prices = {node.id: node.price_mills for node in nodes}
     for a in nodes:
         for b in nodes:
             if a.id == b.id:
                 continue
             dist = haversine_miles(coords[a.id], coords[b.id])
             if dist <= MAX_RANGE_MILES:
-                gallons = Decimal(dist) / MILES_PER_GALLON
-                # Fuel cost is paid at the source stop before driving the leg.
-                cost = gallons * prices[a.id]
-                graph[a.id][b.id] = float(cost)
+                graph[a.id][b.id] = leg_cost(dist, prices[a.id])
     return graph
 
 
-def dijkstra(graph: Dict[int, Dict[int, float]], start: int, end: int) -> List[int]:
-    import heapq
+def _build_layered_graph(nodes: List[StationNode], layout: TripLayout) -> Dict[int, Dict[int, int]]:
+    graph: Dict[int, Dict[int, int]] = {node.id: {} for node in nodes}
+    for a in nodes:
+        for b in nodes:
+            if a.id == b.id:
+                continue
+            dist = layout.leg_miles(a, b)
+            if dist is not None and dist <= MAX_RANGE_MILES:
+                graph[a.id][b.id] = leg_cost(dist, a.price_mills)
+    return graph
+
+
+def station_pairs_within_range(
+    nodes: List[StationNode], max_range_miles: float
+) -> Iterator[Tuple[int, int, float]]:
+    """
+    Yield (a_id, b_id, miles) for every unordered pair within max range.
+    Nodes are swept in latitude order so only pairs inside the latitude
+    window are measured instead of the full n^2 product.
+    """
+    ordered = sorted(nodes, key=lambda n: n.lat)
+    lats = [n.lat for n in ordered]
+    # One degree of latitude is ~69.09 miles; 69.0 keeps the window conservative.
+    window = max_range_miles / 69.0
+    for i, a in enumerate(ordered):
+        hi = bisect.bisect_right(lats, a.lat + window, lo=i + 1)
+        for b in ordered[i + 1 : hi]:
+            dist = haversine_miles((a.lon, a.lat), (b.lon, b.lat))
+            if dist <= max_range_miles:
+                yield a.id, b.id, dist
+
+
+def load_reachability(station_ids: Iterable[int]) -> Dict[int, Dict[int, float]]:
+    """
+    Stored distances between the given stations, in both directions. Both ends
+    of a pair must be in the set, so the primary key index answers the query
+    and pairs leading out of the corridor are never read.
+    """
+    wanted = list(set(station_ids))
+    reach: Dict[int, Dict[int, float]] = {}
+    pairs = StationPair.objects.filter(
+        station_id__in=wanted, neighbor_id__in=wanted, max_range_miles=MAX_RANGE_MILES
+    ).values_list("station_id", "neighbor_id", "miles")
+    for a_id, b_id, dist in pairs:
+        reach.setdefault(a_id, {})[b_id] = dist
+        reach.setdefault(b_id, {})[a_id] = dist
+    return reach
+
 
+def build_graph_from_reachability(
+    nodes: List[StationNode], reach: Dict[int, Dict[int, float]]
+) -> Dict[int, Dict[int, int]]:
+    """
+    Same graph as build_graph, but station-to-station distances come from the
+    precomputed table. Virtual nodes and stations without stored pairs (added
+    since the last rebuild, or with no neighbour in the corridor) are measured
+    on the fly.
+    """
+    graph: Dict[int, Dict[int, int]] = {node.id: {} for node in nodes}
+    by_id = {node.id: node for node in nodes}
+    stored = {node.id for node in nodes if node.id in reach}
+    for a_id in stored:
+        for b_id, dist in reach[a_id].items():
+            if b_id in by_id and dist <= MAX_RANGE_MILES:
+                graph[a_id][b_id] = leg_cost(dist, by_id[a_id].price_mills)
+    for a in nodes:
+        if a.id in stored:
+            continue
+        for b in nodes:
+            if a.id == b.id:
+                continue
+            dist = haversine_miles((a.lon, a.lat), (b.lon, b.lat))
+            if dist <= MAX_RANGE_MILES:
+                graph[a.id][b.id] = leg_cost(dist, a.price_mills)
+                if b.id in stored:
+                    graph[b.id][a.id] = leg_cost(dist, b.price_mills)
+    return graph
+
+
+class LazyGraph:
+    """
+    Implicit station graph: a node's out-edges are generated the first time the
+    search asks for them, from a latitude-sorted index of the nodes, so stations
+    the search never reaches never have edges computed. Reads like the dict
+    graphs (graph[node], graph.get(node)) and gives the same weights as
+    build_graph. edges_generated counts every weight computed so far.
+    """
+
+    def __init__(
+        self,
+        nodes: List[StationNode],
+        layout: Optional[TripLayout] = None,
+        reverse: bool = False,
+        _index: Optional[Tuple[List[StationNode], List[float]]] = None,
+    ) -> None:
+        self.nodes = {node.id: node for node in nodes}
+        self.layout = layout
+        self._reverse = reverse
+        if _index is None:
+            ordered = sorted(nodes, key=lambda n: n.lat)
+            _index = (ordered, [n.lat for n in ordered])
+        self._ordered, self._lats = _index
+        # One degree of latitude is ~69.09 miles; 69.0 keeps the window conservative.
+        self._window = MAX_RANGE_MILES / 69.0
+        self._edges: Dict[int, Dict[int, int]] = {}
+        self.edges_generated = 0
+
+    def reversed(self) -> "LazyGraph":
+        """The same graph with edges pointing back at their source, for backward search."""
+        return LazyGraph(list(self.nodes.values()), self.layout, not self._reverse, (self._ordered, self._lats))
+
+    def _neighbors(self, node: StationNode) -> Dict[int, int]:
+        edges: Dict[int, int] = {}
+        lo = bisect.bisect_left(self._lats, node.lat - self._window)
+        hi = bisect.bisect_right(self._lats, node.lat + self._window)
+        for other in self._ordered[lo:hi]:
+            if other.id == node.id:
+                continue
+            a, b = (other, node) if self._reverse else (node, other)
+            if self.layout is not None:
+                dist = self.layout.leg_miles(a, b)
+            else:
+                dist = haversine_miles((a.lon, a.lat), (b.lon, b.lat))
+            if dist is not None and dist <= MAX_RANGE_MILES:
+                edges[other.id] = leg_cost(dist, a.price_mills)
+        self.edges_generated += len(edges)
+        return edges
+
+    def get(self, node_id: int, default: Optional[Dict[int, int]] = None) -> Optional[Dict[int, int]]:
+        if node_id not in self.nodes:
+            return default
+        return self[node_id]
+
+    def __getitem__(self, node_id: int) -> Dict[int, int]:
+        edges = self._edges.get(node_id)
+        if edges is None:
+            edges = self._edges[node_id] = self._neighbors(self.nodes[node_id])
+        return edges
+
+    def __contains__(self, node_id: object) -> bool:
+        return node_id in self.nodes
+
+
+def graph_edge_count(graph: Dict[int, Dict[int, int]] | LazyGraph) -> int:
+    if isinstance(graph, LazyGraph):
+        return graph.edges_generated
+    return sum(len(edges) for edges in graph.values())
+
+
+def build_route_graph(
+    nodes: List[StationNode], layout: Optional[TripLayout] = None
+) -> Dict[int, Dict[int, int]] | LazyGraph:
+    if settings.ROUTING_GRAPH_MODE == "lazy":
+        return LazyGraph(nodes, layout)
+    # Waypoint legs run via the waypoints, so stored station-pair distances don't apply.
+    if layout is not None:
+        return build_graph(nodes, layout)
+    if settings.ROUTING_GRAPH_MODE == "precomputed":
+        reach = load_reachability(node.id for node in nodes if node.id >= 0)
+        return build_graph_from_reachability(nodes, reach)
+    return build_graph(nodes)
+
+
+def _reconstruct_path(prev: Dict[int, int], start: int, end: int) -> List[int]:
+    path: List[int] = []
+    node = end
+    while node in prev or node == start:
+        path.append(node)
+        if node == start:
+            break
+        node = prev[node]
+    path.reverse()
+    return path
+
+
+def dijkstra(
+    graph: Dict[int, Dict[int, float]],
+    start: int,
+    end: int,
+    stats: Optional[Dict[str, int]] = None,
+) -> List[int]:
     queue: List[Tuple[float, int]] = [(0.0, start)]
     dist: Dict[int, float] = {start: 0.0}
     prev: Dict[int, int] = {}
+    expanded = 0
 
     while queue:
         cost, node = heapq.heappop(queue)
+        expanded += 1
         if node == end:
             break
         for neighbor, weight in graph.get(node, {}).items():
@@ -143,25 +509,333 @@ def dijkstra(graph: Dict[int, Dict[int, float]], start: int, end: int) -> List[i
                 prev[neighbor] = node
                 heapq.heappush(queue, (new_cost, neighbor))
 
-    path: List[int] = []
-    node = end
-    while node in prev or node == start:
+    if stats is not None:
+        stats["expanded"] = expanded
+    return _reconstruct_path(prev, start, end)
+
+
+def a_star(
+    graph: Dict[int, Dict[int, float]],
+    start: int,
+    end: int,
+    heuristic: Callable[[int], float],
+    stats: Optional[Dict[str, int]] = None,
+) -> List[int]:
+    """Dijkstra ordered by cost + heuristic; heuristic must never overestimate."""
+    queue: List[Tuple[float, float, int]] = [(heuristic(start), 0.0, start)]
+    dist: Dict[int, float] = {start: 0.0}
+    prev: Dict[int, int] = {}
+    expanded = 0
+
+    while queue:
+        _, cost, node = heapq.heappop(queue)
+        if cost > dist.get(node, float("inf")):
+            continue
+        expanded += 1
+        if node == end:
+            break
+        for neighbor, weight in graph.get(node, {}).items():
+            new_cost = cost + weight
+            if new_cost < dist.get(neighbor, float("inf")):
+                dist[neighbor] = new_cost
+                prev[neighbor] = node
+                heapq.heappush(queue, (new_cost + heuristic(neighbor), new_cost, neighbor))
+
+    if stats is not None:
+        stats["expanded"] = expanded
+    return _reconstruct_path(prev, start, end)
+
+
+def reverse_graph(graph: Dict[int, Dict[int, float]] | LazyGraph) -> Dict[int, Dict[int, float]] | LazyGraph:
+    if isinstance(graph, LazyGraph):
+        return graph.reversed()
+    reverse: Dict[int, Dict[int, float]] = defaultdict(dict)
+    for node, edges in graph.items():
+        for neighbor, weight in edges.items():
+            reverse[neighbor][node] = weight
+    return reverse
+
+
+def bidirectional_dijkstra(
+    graph: Dict[int, Dict[int, float]],
+    start: int,
+    end: int,
+    stats: Optional[Dict[str, int]] = None,
+) -> List[int]:
+    """Run Dijkstra from both ends and stop once the frontiers cannot improve the best meeting."""
+    if start == end:
+        return [start]
+    adjacency = (graph, reverse_graph(graph))
+    queues: Tuple[List[Tuple[float, int]], List[Tuple[float, int]]] = ([(0.0, start)], [(0.0, end)])
+    dists: Tuple[Dict[int, float], Dict[int, float]] = ({start: 0.0}, {end: 0.0})
+    # prev points back toward start; succ points forward toward end.
+    links: Tuple[Dict[int, int], Dict[int, int]] = ({}, {})
+    best = float("inf")
+    meet: Optional[int] = None
+    expanded = 0
+
+    while queues[0] and queues[1]:
+        if queues[0][0][0] + queues[1][0][0] >= best:
+            break
+        side = 0 if queues[0][0][0] <= queues[1][0][0] else 1
+        cost, node = heapq.heappop(queues[side])
+        if cost > dists[side].get(node, float("inf")):
+            continue
+        expanded += 1
+        other = dists[1 - side]
+        for neighbor, weight in adjacency[side].get(node, {}).items():
+            new_cost = cost + weight
+            if new_cost < dists[side].get(neighbor, float("inf")):
+                dists[side][neighbor] = new_cost
+                links[side][neighbor] = node
+                heapq.heappush(queues[side], (new_cost, neighbor))
+            if neighbor in other and dists[side][neighbor] + other[neighbor] < best:
+                best = dists[side][neighbor] + other[neighbor]
+                meet = neighbor
+
+    if stats is not None:
+        stats["expanded"] = expanded
+    if meet is None:
+        return []
+    path = _reconstruct_path(links[0], start, meet)
+    node = meet
+    while node != end:
+        node = links[1][node]
         path.append(node)
-        if node == start:
+    return path
+
+
+def fuel_cost_heuristic(
+    nodes: List[StationNode], end_node: StationNode, layout: Optional[TripLayout] = None
+) -> Callable[[int], float]:
+    """
+    Lower bound on remaining cost, in leg_cost units: straight-line miles to the
+    end (via any remaining waypoints) at the cheapest price among the nodes.
+    Legs can't beat the straight line, but leg_cost rounds each leg's distance,
+    losing up to half a distance unit per leg. A simple path has fewer legs
+    than there are nodes, so half a unit per node is taken off as slack.
+    """
+    cheapest = min(node.price_mills for node in nodes)
+    slack = len(nodes) // 2
+    by_id = {node.id: node for node in nodes}
+    target = (end_node.lon, end_node.lat)
+    cache: Dict[int, float] = {}
+
+    def heuristic(node_id: int) -> float:
+        if node_id not in cache:
+            node = by_id[node_id]
+            if layout is not None:
+                miles = layout.leg_miles(node, end_node) or 0.0
+            else:
+                miles = haversine_miles((node.lon, node.lat), target)
+            cache[node_id] = max(0, math.floor(miles * DISTANCE_UNITS_PER_MILE) - slack) * cheapest
+        return cache[node_id]
+
+    return heuristic
+
+
+def shortest_path(
+    graph: Dict[int, Dict[int, float]],
+    start: int,
+    end: int,
+    heuristic: Optional[Callable[[int], float]] = None,
+    stats: Optional[Dict[str, int]] = None,
+) -> List[int]:
+    algorithm = settings.ROUTING_SEARCH_ALGORITHM
+    if algorithm == "astar" and heuristic is not None:
+        return a_star(graph, start, end, heuristic, stats=stats)
+    if algorithm == "bidirectional":
+        return bidirectional_dijkstra(graph, start, end, stats=stats)
+    return dijkstra(graph, start, end, stats=stats)
+
+
+def path_cost(graph: Dict[int, Dict[int, int]] | LazyGraph, path: Sequence[int]) -> int:
+    return sum(graph[path[i]][path[i + 1]] for i in range(len(path) - 1))
+
+
+def costs_to(graph: Dict[int, Dict[int, int]] | LazyGraph, end: int) -> Dict[int, int]:
+    """Cheapest cost from every node that can reach end, by dijkstra over the reversed graph."""
+    reverse = reverse_graph(graph)
+    queue: List[Tuple[int, int]] = [(0, end)]
+    dist: Dict[int, int] = {end: 0}
+    while queue:
+        cost, node = heapq.heappop(queue)
+        if cost > dist[node]:
+            continue
+        for neighbor, weight in reverse.get(node, {}).items():
+            new_cost = cost + weight
+            if new_cost < dist.get(neighbor, new_cost + 1):
+                dist[neighbor] = new_cost
+                heapq.heappush(queue, (new_cost, neighbor))
+    return dist
+
+
+def _spur_search(
+    graph: Dict[int, Dict[int, int]] | LazyGraph,
+    start: int,
+    end: int,
+    remaining: Dict[int, int],
+    banned_nodes: Set[int],
+    banned_edges: Set[Tuple[int, int]],
+) -> Optional[List[int]]:
+    """
+    A* that may not enter banned_nodes or use banned_edges; None when end is
+    unreachable. remaining holds exact costs to end on the unrestricted graph,
+    a consistent lower bound once edges are banned, so the search mostly
+    walks straight along the cheapest detour.
+    """
+    queue: List[Tuple[int, int, int]] = [(remaining[start], 0, start)]
+    dist: Dict[int, int] = {start: 0}
+    prev: Dict[int, int] = {}
+    while queue:
+        _, cost, node = heapq.heappop(queue)
+        if node == end:
+            return _reconstruct_path(prev, start, end)
+        if cost > dist[node]:
+            continue
+        for neighbor, weight in graph.get(node, {}).items():
+            if neighbor in banned_nodes or (node, neighbor) in banned_edges or neighbor not in remaining:
+                continue
+            new_cost = cost + weight
+            if new_cost < dist.get(neighbor, new_cost + 1):
+                dist[neighbor] = new_cost
+                prev[neighbor] = node
+                heapq.heappush(queue, (new_cost + remaining[neighbor], new_cost, neighbor))
+    return None
+
+
+def k_cheapest_paths(
+    graph: Dict[int, Dict[int, int]] | LazyGraph,
+    start: int,
+    end: int,
+    k: int,
+    stats: Optional[Dict[str, int]] = None,
+) -> List[List[int]]:
+    """
+    Yen's algorithm: up to k distinct loopless start -> end paths, cheapest
+    first, all on the one graph. Each new path deviates from an earlier one
+    at a spur node; the root before it is kept and the edges that earlier
+    paths took out of the spur are banned for that spur search. One reverse
+    dijkstra up front gives every spur search an exact A* heuristic; k=1
+    skips it, being one plain search.
+    """
+    if k <= 1:
+        path = dijkstra(graph, start, end)
+        if stats is not None:
+            stats["searches"] = 1
+        return [path] if path else []
+    remaining = costs_to(graph, end)
+    if start not in remaining:
+        return []
+    first = _spur_search(graph, start, end, remaining, set(), set())
+    searches = 1
+    found = [first]
+    candidates: List[Tuple[int, List[int]]] = []
+    seen = {tuple(first)}
+    while len(found) < k:
+        last = found[-1]
+        for i in range(len(last) - 1):
+            root = last[: i + 1]
+            banned_edges = {(path[i], path[i + 1]) for path in found if path[: i + 1] == root}
+            spur = _spur_search(graph, last[i], end, remaining, set(root[:-1]), banned_edges)
+            searches += 1
+            if spur is None:
+                continue
+            path = root[:-1] + spur
+            if tuple(path) not in seen:
+                seen.add(tuple(path))
+                heapq.heappush(candidates, (path_cost(graph, path), path))
+        if not candidates:
             break
-        node = prev[node]
+        found.append(heapq.heappop(candidates)[1])
+    if stats is not None:
+        stats["searches"] = searches
+    return found
+
+
+def cheapest_path_with_max_stops(
+    graph: Dict[int, Dict[int, int]] | LazyGraph, start: int, end: int, max_stops: int
+) -> List[int]:
+    """
+    Cheapest start -> end path through at most max_stops intermediate nodes:
+    Bellman-Ford in max_stops + 1 rounds, round h holding paths of h legs. A
+    node only carries into the next round when it got cheaper than with
+    fewer legs, since the shorter path dominates otherwise. [] when none.
+    """
+    best: Dict[int, int] = {start: 0}
+    # rounds[h][node] = (cost, previous node) for the best path of exactly h legs.
+    rounds: List[Dict[int, Tuple[int, int]]] = [{start: (0, start)}]
+    for _ in range(max_stops + 1):
+        reached: Dict[int, Tuple[int, int]] = {}
+        for node, (cost, _) in rounds[-1].items():
+            if node == end:
+                continue
+            for neighbor, weight in graph.get(node, {}).items():
+                new_cost = cost + weight
+                if new_cost < best.get(neighbor, new_cost + 1) and new_cost < reached.get(neighbor, (new_cost + 1,))[0]:
+                    reached[neighbor] = (new_cost, node)
+        for node, (cost, _) in reached.items():
+            best[node] = cost
+        rounds.append(reached)
+        if not reached:
+            break
+    # Later rounds only hold end if it got cheaper, so the last round holding it wins.
+    legs = [h for h, reached in enumerate(rounds) if end in reached]
+    if not legs:
+        return []
+    path = [end]
+    for h in range(legs[-1], 0, -1):
+        path.append(rounds[h][path[-1]][1])
     path.reverse()
     return path
 
 
-def compute_route(start_point: Point, end_point: Point) -> dict:
+def compute_route(
+    start_point: Point,
+    end_point: Point,
+    waypoints: Optional[List[Point]] = None,
+    alternatives: int = 0,
+    max_stops: Optional[int] = None,
+) -> dict:
+    via = [(p.x, p.y) for p in waypoints or []]
     client = RoutingClient()
-    directions = client.directions((start_point.x, start_point.y), (end_point.x, end_point.y))
+    with stage("provider"):
+        directions = client.directions((start_point.x, start_point.y), (end_point.x, end_point.y), via)
     coords = directions["features"][0]["geometry"]["coordinates"]
     polyline = LineString(coords)
 
-    # Build node list including virtual start/end nodes.
-    stations = filter_stations_along_route(polyline)
+    # One corridor query covers every leg of the trip.
+    with stage("corridor"):
+        stations = filter_stations_along_route(polyline)
+    ROUTE_CORRIDOR_STATIONS.observe(len(stations))
+
+    plan = plan_fuel_stops(
+        start_point, end_point, stations, via, coords, alternatives=alternatives, max_stops=max_stops
+    )
+    return {
+        "route": directions,
+        "polyline": polyline,
+        # Kept on the Route row for re-costing; not part of the response.
+        "corridor_stations": pack_corridor(stations),
+        **plan,
+    }
+
+
+def plan_fuel_stops(
+    start_point: Point,
+    end_point: Point,
+    stations: List[StationNode],
+    waypoints: Sequence[Tuple[float, float]] = (),
+    route_coords: Optional[Sequence[Sequence[float]]] = None,
+    alternatives: int = 0,
+    max_stops: Optional[int] = None,
+) -> dict:
+    """
+    Choose the cheapest fuel stops among corridor stations for a trip from
+    start to end, passing through waypoints in order. On the same graph,
+    optionally add the next `alternatives` cheapest distinct plans and the
+    cheapest plan with at most `max_stops` stops.
+    """
     # Use nearest station price as a baseline for virtual nodes so short routes still
     # produce realistic non-zero fuel cost even when no stop is needed.
     if stations:
@@ -173,18 +847,60 @@ def compute_route(start_point: Point, end_point: Point) -> dict:
     else:
         baseline_price = Decimal("3.500")
 
+    # Build node list including virtual start/end nodes.
     start_node = StationNode(
         id=-1, lon=start_point.x, lat=start_point.y, price=baseline_price, name="start"
     )
     end_node = StationNode(
         id=-2, lon=end_point.x, lat=end_point.y, price=baseline_price, name="end"
     )
-    nodes = [start_node, end_node] + stations
+    candidates = prune_dominated_stations(
+        stations, settings.ROUTING_PRUNE_BIN_MILES, settings.ROUTING_PRUNE_TOP_K
+    )
+    if len(candidates) < len(stations):
+        logger.debug("Pruned %s of %s corridor stations", len(stations) - len(candidates), len(stations))
+    nodes = [start_node, end_node] + candidates
+    ROUTE_GRAPH_NODES.observe(len(nodes))
+
+    layout: Optional[TripLayout] = None
+    if waypoints:
+        coords = route_coords or [(start_point.x, start_point.y), *waypoints, (end_point.x, end_point.y)]
+        layout = TripLayout.for_route(coords, list(waypoints), nodes, start_node.id, end_node.id)
 
-    direct_distance = haversine_miles((start_point.x, start_point.y), (end_point.x, end_point.y))
+    def leg_miles(a: StationNode, b: StationNode) -> float:
+        if layout is not None:
+            return layout.leg_miles(a, b) or 0.0
+        return haversine_miles((a.lon, a.lat), (b.lon, b.lat))
+
+    direct_distance = leg_miles(start_node, end_node)
+    nodes_by_id = {n.id: n for n in nodes}
+
+    def plan_for(path_ids: List[int]) -> dict:
+        ordered = [nodes_by_id[node_id] for node_id in path_ids if node_id not in (-1, -2)]
+        # Integer leg weights become Decimal only here.
+        total_distance = sum(
+            leg_miles(nodes_by_id[path_ids[i]], nodes_by_id[path_ids[i + 1]]) for i in range(len(path_ids) - 1)
+        )
+        return {
+            "fuel_stops": [
+                {
+                    "name": node.name,
+                    "lon": node.lon,
+                    "lat": node.lat,
+                    "price": str(node.price),
+                }
+                for node in ordered
+            ],
+            "total_cost": cost_to_dollars(path_cost(graph, path_ids)),
+            "gallons": round(Decimal(total_distance) / MILES_PER_GALLON, 2),
+        }
 
-    graph = build_graph(nodes)
-    path_ids = dijkstra(graph, start_node.id, end_node.id)
+    with stage("graph_build"):
+        graph = build_route_graph(nodes, layout)
+    with stage("optimizer"):
+        path_ids = shortest_path(
+            graph, start_node.id, end_node.id, heuristic=fuel_cost_heuristic(nodes, end_node, layout)
+        )
     if not path_ids:
         if direct_distance <= MAX_RANGE_MILES:
             path_ids = [start_node.id, end_node.id]
@@ -193,34 +909,21 @@ def compute_route(start_point: Point, end_point: Point) -> dict:
                 "No feasible route found within VEHICLE_MAX_RANGE_MILES; increase range or adjust points"
             )
     # For trips that fit in one tank, avoid synthetic intermediate stops.
-    if direct_distance <= MAX_RANGE_MILES:
+    fits_one_tank = direct_distance <= MAX_RANGE_MILES
+    if fits_one_tank:
         path_ids = [start_node.id, end_node.id]
-    nodes_by_id = {n.id: n for n in nodes}
-    ordered = [nodes_by_id[node_id] for node_id in path_ids if node_id not in (-1, -2)]
-
-    # Compute totals
-    total_cost = sum(graph[path_ids[i]][path_ids[i + 1]] for i in range(len(path_ids) - 1))
-    total_distance = sum(
-        haversine_miles(
-            (nodes_by_id[path_ids[i]].lon, nodes_by_id[path_ids[i]].lat),
-            (nodes_by_id[path_ids[i + 1]].lon, nodes_by_id[path_ids[i + 1]].lat),
-        )
-        for i in range(len(path_ids) - 1)
-    )
-    gallons = Decimal(total_distance) / MILES_PER_GALLON
+    plan = plan_for(path_ids)
 
-    return {
-        "route": directions,
-        "polyline": polyline,
-        "fuel_stops": [
-            {
-                "name": node.name,
-                "lon": node.lon,
-                "lat": node.lat,
-                "price": str(node.price),
-            }
-            for node in ordered
-        ],
-        "total_cost": round(Decimal(total_cost), 2),
-        "gallons": round(gallons, 2),
-    }
+    if alternatives > 0:
+        with stage("alternatives"):
+            paths = [] if fits_one_tank else k_cheapest_paths(graph, start_node.id, end_node.id, alternatives + 1)
+        plan["alternatives"] = [plan_for(path) for path in paths if path != path_ids][:alternatives]
+    if max_stops is not None:
+        with stage("alternatives"):
+            limited = path_ids if fits_one_tank else cheapest_path_with_max_stops(
+                graph, start_node.id, end_node.id, max_stops
+            )
+        plan["max_stops_plan"] = plan_for(limited) if limited else None
+    # A lazy graph only has the edges the searches generated, so count after them.
+    ROUTE_GRAPH_EDGES.observe(graph_edge_count(graph))
+    return plan
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import gzip
+import json
+import math
+import struct
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.gis.geos import LineString
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.utils import timezone
+
+# Degrees of latitude per meter; good enough to turn a tolerance into degrees.
+DEGREES_PER_METER = 1 / 111_320
+
+STORAGE_MODES = ("full", "compact", "minimal")
+
+# One corridor station: id, miles along the route, price in mills when costed.
+CORRIDOR_RECORD = struct.Struct("<qfi")
+
+
+def simplify_geometry(line: Optional[LineString], tolerance_meters: float) -> Optional[LineString]:
+    """
+    Douglas-Peucker simplification that keeps both endpoints and never
+    self-intersects. Provider polylines carry a vertex every few meters; at
+    50 m a cross-country route keeps a few percent of them.
+    """
+    if line is None or tolerance_meters <= 0 or len(line) <= 2:
+        return line
+    simplified = line.simplify(tolerance_meters * DEGREES_PER_METER, preserve_topology=True)
+    simplified.srid = line.srid
+    return simplified
+
+
+def pack_route_json(data: Dict[str, Any]) -> Optional[bytes]:
+    if not data:
+        return None
+    return gzip.compress(json.dumps(data, separators=(",", ":"), cls=DjangoJSONEncoder).encode())
+
+
+def unpack_route_json(blob: Optional[bytes]) -> Dict[str, Any]:
+    if not blob:
+        return {}
+    return json.loads(gzip.decompress(bytes(blob)))
+
+
+def pack_corridor(stations: Iterable[Any]) -> bytes:
+    """Corridor StationNodes as fixed 16-byte records, so a route can be re-costed without the corridor query."""
+    pack = CORRIDOR_RECORD.pack
+    return b"".join(
+        pack(s.id, math.nan if s.route_miles is None else s.route_miles, s.price_mills) for s in stations
+    )
+
+
+def unpack_corridor(blob: Optional[bytes]) -> List[Tuple[int, Optional[float], int]]:
+    if not blob:
+        return []
+    return [
+        (station_id, None if math.isnan(miles) else miles, mills)
+        for station_id, miles, mills in CORRIDOR_RECORD.iter_unpack(bytes(blob))
+    ]
+
+
+def route_storage_fields(
+    polyline: Optional[LineString],
+    route_json: Dict[str, Any],
+    mode: Optional[str] = None,
+    tolerance_meters: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Route columns for the geometry and provider payload under ROUTE_STORAGE_MODE:
+    "full" keeps both as received; "compact" simplifies the geometry and gzips
+    the payload into route_json_gz; "minimal" simplifies and drops the payload,
+    which for Mapbox holds nothing beyond the full-resolution geometry.
+    """
+    mode = mode or settings.ROUTE_STORAGE_MODE
+    if mode not in STORAGE_MODES:
+        raise ValueError(f"Unknown ROUTE_STORAGE_MODE {mode!r}")
+    if mode == "full":
+        return {"geometry": polyline, "route_json": route_json, "route_json_gz": None, "compacted_at": None}
+    if tolerance_meters is None:
+        tolerance_meters = settings.ROUTE_GEOMETRY_TOLERANCE_METERS
+    return {
+        "geometry": simplify_geometry(polyline, tolerance_meters),
+        "route_json": {},
+        "route_json_gz": pack_route_json(route_json) if mode == "compact" else None,
+        "compacted_at": timezone.now(),
+    }
+
+
+def ensure_route_partitions(months_ahead: int) -> int:
+    """Create monthly routing_route partitions through months_ahead; returns how many were new."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT routing_route_ensure_partitions(now()::date, (now() + make_interval(months => %s))::date)",
+            [months_ahead],
+        )
+        return cursor.fetchone()[0]
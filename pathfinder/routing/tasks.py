@@ -0,0 +1,151 @@
+from itertools import islice
+from typing import Dict, Optional
+
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from ingest.models import FuelStation
+from pathfinder.metrics import observe_task
+
+from .lanes import cached_lane_payload, hot_lane_candidates, price_version, warm_lane
+from .models import Lane, Route, StationPair
+from .recost import RECOST_FIELDS, StationInfo, recost_batch, recost_candidates
+from .services import MAX_RANGE_MILES, StationNode, station_pairs_within_range
+from .storage import ensure_route_partitions
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(acks_late=True)
+@observe_task
+def rebuild_station_graph() -> int:
+    """
+    Recompute the station reachability table from all geocoded stations.
+    Returns number of stored pairs (each unordered pair stored once).
+    """
+    t0 = time.perf_counter()
+    nodes = [
+        StationNode(id=s.id, lon=s.geom.x, lat=s.geom.y, price=s.price, name=s.name)
+        for s in FuelStation.objects.filter(geom__isnull=False).only("id", "geom", "price", "name")
+    ]
+    rows = (
+        StationPair.between(a_id, b_id, dist, MAX_RANGE_MILES)
+        for a_id, b_id, dist in station_pairs_within_range(nodes, MAX_RANGE_MILES)
+    )
+    pairs = 0
+    with transaction.atomic():
+        StationPair.objects.all().delete()
+        while batch := list(islice(rows, 5000)):
+            StationPair.objects.bulk_create(batch)
+            pairs += len(batch)
+    logger.info(
+        "rebuild_station_graph: %s stations, %s pairs in %.1f s",
+        len(nodes),
+        pairs,
+        time.perf_counter() - t0,
+    )
+    return pairs
+
+
+@shared_task
+@observe_task
+def refresh_hot_lanes() -> int:
+    """
+    Re-rank lanes from recent Route history: the top ROUTE_HOT_LANES_LIMIT are
+    enabled, discovered lanes that dropped out are disabled (pinned lanes stay),
+    then warming is queued. Returns number of hot lanes found.
+    """
+    candidates = hot_lane_candidates(
+        settings.ROUTE_HOT_LANES_WINDOW_DAYS,
+        settings.ROUTE_HOT_LANES_MIN_HITS,
+        settings.ROUTE_HOT_LANES_LIMIT,
+    )
+    hot_keys = []
+    for key, route, hits in candidates:
+        Lane.objects.update_or_create(
+            key=key,
+            defaults={
+                "start_point": route.start_point,
+                "end_point": route.end_point,
+                "waypoints": route.waypoints,
+                "hits": hits,
+                "enabled": True,
+            },
+        )
+        hot_keys.append(key)
+    Lane.objects.filter(pinned=False).exclude(key__in=hot_keys).update(enabled=False)
+    logger.info("refresh_hot_lanes: %s hot lanes", len(hot_keys))
+    warm_hot_lanes.delay()
+    return len(hot_keys)
+
+
+@shared_task
+@observe_task
+def warm_hot_lanes() -> int:
+    """Compute and cache every enabled lane not yet warm for the current price version."""
+    version, _ = price_version()
+    warmed = 0
+    for lane in Lane.objects.filter(enabled=True).order_by("-pinned", "-hits"):
+        if lane.warmed_version == version and cached_lane_payload(lane.key) is not None:
+            continue
+        if warm_lane(lane, version):
+            warmed += 1
+    logger.info("warm_hot_lanes: warmed %s lanes for price version %s", warmed, version)
+    return warmed
+
+
+@shared_task
+@observe_task
+def create_route_partitions() -> int:
+    """Keep ROUTE_PARTITION_MONTHS_AHEAD monthly Route partitions ready. Returns number created."""
+    created = ensure_route_partitions(settings.ROUTE_PARTITION_MONTHS_AHEAD)
+    logger.info("create_route_partitions: %s new partitions", created)
+    return created
+
+
+@shared_task
+@observe_task
+def recost_routes(window_days: Optional[int] = None, chunk_size: Optional[int] = None) -> int:
+    """
+    Queue the routes stored in the last window_days (default
+    ROUTE_RECOST_WINDOW_DAYS) as recost_route_chunk tasks of chunk_size
+    (default ROUTE_RECOST_CHUNK_SIZE) ids, so workers re-cost them in
+    parallel. Returns number of routes queued.
+    """
+    window_days = window_days or settings.ROUTE_RECOST_WINDOW_DAYS
+    chunk_size = chunk_size or settings.ROUTE_RECOST_CHUNK_SIZE
+    ids = list(recost_candidates(window_days).values_list("id", flat=True))
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start : start + chunk_size]
+        recost_route_chunk.delay(chunk[0], chunk[-1], window_days)
+    logger.info("recost_routes: queued %s routes in chunks of %s", len(ids), chunk_size)
+    return len(ids)
+
+
+@shared_task(acks_late=True)
+@observe_task
+def recost_route_chunk(first_id: int, last_id: int, window_days: int) -> int:
+    """
+    Re-cost routes first_id..last_id at current prices over their stored
+    corridors, in keyset batches of ROUTE_RECOST_BATCH_SIZE written with one
+    bulk_update each. Only routes whose corridor prices changed are written.
+    Returns number of routes updated.
+    """
+    routes = recost_candidates(window_days).filter(id__lte=last_id)
+    stations: Dict[int, StationInfo] = {}
+    after_id = first_id - 1
+    scanned = updated = 0
+    while True:
+        batch = list(routes.filter(id__gt=after_id)[: settings.ROUTE_RECOST_BATCH_SIZE])
+        if not batch:
+            break
+        after_id = batch[-1].id
+        changed = recost_batch(batch, stations)
+        if changed:
+            Route.objects.bulk_update(changed, RECOST_FIELDS)
+        scanned += len(batch)
+        updated += len(changed)
+    logger.info("recost_route_chunk: updated %s of %s routes (%s-%s)", updated, scanned, first_id, last_id)
+    return updated
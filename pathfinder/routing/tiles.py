@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import math
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from django.conf import settings
+from django.contrib.gis.geos import LineString, Point
+from django.core.cache import cache
+from ingest.models import FuelStation, Ingestion
+from ingest.snapshot import StationSnapshot, current_snapshot
+from pathfinder.metrics import ROUTE_TILE_LOOKUPS
+from pathfinder.redis_pool import get_redis
+
+from .lanes import price_version
+from .services import StationNode, polyline_miles
+from .storage import simplify_geometry
+import logging
+
+logger = logging.getLogger(__name__)
+
+Tile = Tuple[int, int]
+# (id, lon, lat, price, name) per geocoded station in a tile.
+TileRow = Tuple[int, float, float, str, str]
+
+MILES_PER_DEGREE_LAT = 69.05
+MILES_PER_DEGREE_LON = 69.17  # at the equator; scales with cos(latitude)
+# Query ranges are padded so float rounding at tile edges never drops a
+# station; bucketing by tile_of then puts each station in one tile.
+QUERY_PAD_DEGREES = 0.001
+
+
+def tile_of(lon: float, lat: float, size: float) -> Tile:
+    return math.floor(lon / size), math.floor(lat / size)
+
+
+def tile_cache_key(tile: Tile, version: int, size: float) -> str:
+    return f"route:tile:{size}:{version}:{tile[0]}:{tile[1]}"
+
+
+def _stats_key(size: float) -> str:
+    return f"route:tile:stats:{size}"
+
+
+def corridor_segment_index(
+    coords: Sequence[Sequence[float]], corridor_miles: float, size: float
+) -> Dict[Tile, List[int]]:
+    """
+    Tiles that may hold a station within corridor_miles of the line, each with
+    the segments (by start vertex) that can reach into it. Every segment's
+    bounding box is padded by the corridor width at the line's highest
+    latitude, where a degree of longitude is shortest.
+    """
+    pad_lat = corridor_miles / MILES_PER_DEGREE_LAT
+    top = min(89.0, max(abs(c[1]) for c in coords) + pad_lat)
+    pad_lon = corridor_miles / (MILES_PER_DEGREE_LON * math.cos(math.radians(top)))
+    index: Dict[Tile, List[int]] = defaultdict(list)
+    for i in range(len(coords) - 1):
+        (ax, ay), (bx, by) = coords[i][:2], coords[i + 1][:2]
+        x0, y0 = tile_of(min(ax, bx) - pad_lon, min(ay, by) - pad_lat, size)
+        x1, y1 = tile_of(max(ax, bx) + pad_lon, max(ay, by) + pad_lat, size)
+        for tx in range(x0, x1 + 1):
+            for ty in range(y0, y1 + 1):
+                index[(tx, ty)].append(i)
+    return index
+
+
+def miles_to_segment(lon: float, lat: float, a: Sequence[float], b: Sequence[float]) -> float:
+    # Equirectangular plane centred on the station: well under 1% off haversine
+    # at corridor distances.
+    kx = MILES_PER_DEGREE_LON * math.cos(math.radians(lat))
+    ax, ay = (a[0] - lon) * kx, (a[1] - lat) * MILES_PER_DEGREE_LAT
+    dx, dy = (b[0] - lon) * kx - ax, (b[1] - lat) * MILES_PER_DEGREE_LAT - ay
+    length_sq = dx * dx + dy * dy
+    t = 0.0 if length_sq == 0 else max(0.0, min(1.0, -(ax * dx + ay * dy) / length_sq))
+    return math.hypot(ax + t * dx, ay + t * dy)
+
+
+def _snapshot_tiles(snapshot: StationSnapshot, tiles: Sequence[Tile], size: float) -> Dict[Tile, List[TileRow]]:
+    rows: Dict[Tile, List[TileRow]] = {tile: [] for tile in tiles}
+    # One latitude band per tile row; rows are sorted by latitude in the file.
+    for ty in {ty for _, ty in tiles}:
+        for i in snapshot.lat_range(ty * size, (ty + 1) * size):
+            tile = tile_of(snapshot.lon[i], snapshot.lat[i], size)
+            if tile in rows:
+                station_id, lon, lat, price, name = snapshot.row(i)
+                rows[tile].append((station_id, lon, lat, str(price), name))
+    return rows
+
+
+def tile_ranges(tiles: Iterable[Tile], size: float) -> List[Tuple[float, float, float, float]]:
+    """
+    (min_lat, max_lat, min_lon, max_lon) boxes covering the tiles, padded by
+    QUERY_PAD_DEGREES: one per run of adjacent tiles in a tile row.
+    """
+    columns: Dict[int, List[int]] = defaultdict(list)
+    for tx, ty in set(tiles):
+        columns[ty].append(tx)
+    ranges = []
+    for ty in sorted(columns):
+        xs = sorted(columns[ty])
+        start = xs[0]
+        for prev, tx in zip(xs, xs[1:] + [None]):
+            if tx != prev + 1:
+                ranges.append(
+                    (
+                        ty * size - QUERY_PAD_DEGREES,
+                        (ty + 1) * size + QUERY_PAD_DEGREES,
+                        start * size - QUERY_PAD_DEGREES,
+                        (prev + 1) * size + QUERY_PAD_DEGREES,
+                    )
+                )
+                start = tx
+    return ranges
+
+
+def fetch_tiles(tiles: Sequence[Tile], size: float) -> Dict[Tile, List[TileRow]]:
+    """
+    Stations in the given tiles: from the memory-mapped station snapshot when it
+    was written for the latest finished ingestion, otherwise from the database in
+    one query for all of them. That query is a UNION ALL of one lat/lon range
+    per tile_ranges box, each an index-only scan of fuelstation_lat_lon_idx; an
+    OR of the boxes would become a bitmap scan, which always reads the heap.
+    """
+    snapshot = current_snapshot()
+    if snapshot is not None:
+        latest = Ingestion.objects.latest_success()
+        if latest is not None and snapshot.version == latest.sequence:
+            return _snapshot_tiles(snapshot, tiles, size)
+    rows: Dict[Tile, List[TileRow]] = {tile: [] for tile in tiles}
+    queries = [
+        FuelStation.objects.filter(
+            lat__gte=min_lat, lat__lte=max_lat, lon__gte=min_lon, lon__lte=max_lon
+        ).values_list("id", "lon", "lat", "price", "name")
+        for min_lat, max_lat, min_lon, max_lon in tile_ranges(tiles, size)
+    ]
+    if not queries:
+        return rows
+    seen = set()
+    # Padded boxes of neighbouring rows overlap, so edge stations can come back twice.
+    for station_id, lon, lat, price, name in queries[0].union(*queries[1:], all=True):
+        tile = tile_of(lon, lat, size)
+        if tile in rows and station_id not in seen:
+            seen.add(station_id)
+            rows[tile].append((station_id, lon, lat, str(price), name))
+    return rows
+
+
+def record_tile_lookups(hits: Iterable[Tile], misses: Iterable[Tile], size: float) -> None:
+    hits, misses = list(hits), list(misses)
+    ROUTE_TILE_LOOKUPS.labels("hit").inc(len(hits))
+    ROUTE_TILE_LOOKUPS.labels("miss").inc(len(misses))
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for outcome, tiles in (("hit", hits), ("miss", misses)):
+            for tx, ty in tiles:
+                pipe.hincrby(_stats_key(size), f"{tx}:{ty}:{outcome}", 1)
+        pipe.execute()
+    except Exception as exc:  # stats must not fail the request
+        logger.warning("Tile stats update failed: %s", exc)
+
+
+def load_tiles(tiles: Sequence[Tile], version: int, size: float) -> Dict[Tile, List[TileRow]]:
+    """Station rows per tile: cached ones for this price version, the rest queried and cached."""
+    keys = {tile_cache_key(tile, version, size): tile for tile in tiles}
+    try:
+        cached = cache.get_many(list(keys))
+    except Exception as exc:  # cache outage must not fail the request
+        logger.warning("Tile cache read failed: %s", exc)
+        cached = {}
+    found = {keys[key]: rows for key, rows in cached.items()}
+    missing = [tile for tile in tiles if tile not in found]
+    record_tile_lookups(found, missing, size)
+    if missing:
+        fetched = fetch_tiles(missing, size)
+        found.update(fetched)
+        try:
+            cache.set_many(
+                {tile_cache_key(tile, version, size): rows for tile, rows in fetched.items()},
+                timeout=settings.ROUTE_TILE_CACHE_SECONDS,
+            )
+        except Exception as exc:
+            logger.warning("Tile cache write failed: %s", exc)
+    return found
+
+
+def stations_from_tiles(polyline: LineString, corridor_miles: float) -> List[StationNode]:
+    """
+    filter_stations_along_route built from cached tiles: the tiles within
+    corridor_miles of the simplified polyline are loaded, then every station is
+    kept only if it lies within corridor_miles of a nearby simplified segment.
+    Route positions use the full polyline, like ST_LineLocatePoint.
+    """
+    size = settings.ROUTE_TILE_DEGREES
+    simplified = simplify_geometry(polyline, settings.ROUTE_TILE_SIMPLIFY_METERS)
+    coords = simplified.coords
+    index = corridor_segment_index(coords, corridor_miles, size)
+    version, _ = price_version()
+    tiles = load_tiles(list(index), version, size)
+    route_length = polyline_miles(polyline.coords)
+
+    nodes: List[StationNode] = []
+    for tile, rows in tiles.items():
+        segments = index[tile]
+        for station_id, lon, lat, price, name in rows:
+            if any(miles_to_segment(lon, lat, coords[i], coords[i + 1]) <= corridor_miles for i in segments):
+                nodes.append(
+                    StationNode(
+                        id=station_id,
+                        lon=lon,
+                        lat=lat,
+                        price=Decimal(price),
+                        name=name,
+                        route_miles=polyline.project_normalized(Point(lon, lat)) * route_length,
+                    )
+                )
+    return nodes
+
+
+def invalidate_station_tiles(points: Iterable[Tuple[float, float]]) -> int:
+    """
+    Drop the current-version tiles holding these station coordinates, for
+    changes that don't bump the price version (geocode backfills). Price
+    ingestions start a new version, so their tiles are never reused.
+    """
+    if not settings.ROUTE_TILE_CACHE:
+        return 0
+    size = settings.ROUTE_TILE_DEGREES
+    version, _ = price_version()
+    keys = {tile_cache_key(tile_of(lon, lat, size), version, size) for lon, lat in points}
+    try:
+        cache.delete_many(list(keys))
+    except Exception as exc:
+        logger.warning("Tile cache invalidation failed: %s", exc)
+    return len(keys)
+
+
+def tile_stats(limit: int = 50) -> List[dict]:
+    """Per-tile hit/miss counts since stats were last cleared, busiest tiles first."""
+    size = settings.ROUTE_TILE_DEGREES
+    counts: Dict[Tile, Dict[str, int]] = defaultdict(lambda: {"hit": 0, "miss": 0})
+    for field, value in get_redis().hgetall(_stats_key(size)).items():
+        tx, ty, outcome = field.decode().split(":")
+        counts[(int(tx), int(ty))][outcome] = int(value)
+    ranked = sorted(counts.items(), key=lambda item: -(item[1]["hit"] + item[1]["miss"]))[:limit]
+    return [
+        {
+            "tile": f"{tx}:{ty}",
+            "bounds": [tx * size, ty * size, (tx + 1) * size, (ty + 1) * size],
+            "hits": c["hit"],
+            "misses": c["miss"],
+            "hit_rate": round(c["hit"] / (c["hit"] + c["miss"]), 4),
+        }
+        for (tx, ty), c in ranked
+    ]
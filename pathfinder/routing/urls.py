@@ -1,7 +1,10 @@
 from django.urls import path
 
-from .views import RouteView
+from .views import LaneDetailView, LaneListView, RouteView, TileStatsView
 
 urlpatterns = [
     path("", RouteView.as_view(), name="route"),
+    path("lanes/", LaneListView.as_view(), name="route-lanes"),
+    path("lanes/<int:pk>/", LaneDetailView.as_view(), name="route-lane-detail"),
+    path("tiles/", TileStatsView.as_view(), name="route-tiles"),
 ]
@@ -1,22 +1,40 @@
+import functools
 from decimal import Decimal
 from typing import Any
 
-from django.contrib.gis.geos import Point
+from django.conf import settings
+from django.contrib.gis.geos import LineString, Point
+from django.db import transaction
 from django.http import HttpRequest
-from drf_spectacular.utils import OpenApiResponse, extend_schema
+from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, extend_schema
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .serializers import RouteRequestSerializer, RouteResponseSerializer
+from pathfinder.metrics import ROUTE_REQUESTS, collect_stages, stage
+from pathfinder.provider_http import retry_budget
+
+from .coalesce import route_flight_key, single_flight
+from .lanes import cached_lane_payload, forget_lane, lane_key
+from .serializers import LaneSerializer, RouteRequestSerializer, RouteResponseSerializer, TileStatsSerializer
 from .services import compute_route
-from .models import Route
+from .storage import route_storage_fields
+from .models import Lane, Route
+from .tasks import warm_hot_lanes
+from .tiles import tile_stats
 import logging
 import time
 
 logger = logging.getLogger(__name__)
 
 
+def parse_point(raw: str) -> Point:
+    if "," in raw:
+        lon, lat = raw.split(",", 1)
+        return Point(float(lon), float(lat))
+    raise ValueError("Lat/Lon required when not using geocoding")
+
+
 class RouteView(APIView):
     @extend_schema(
         request=RouteRequestSerializer,
@@ -26,43 +44,145 @@ class RouteView(APIView):
         },
     )
     def post(self, request: HttpRequest, *args: Any, **kwargs: Any) -> Response:
+        with collect_stages() as timings, retry_budget(settings.HTTP_RETRY_BUDGET):
+            with stage("total"):
+                response = self._post(request)
+        response["Server-Timing"] = timings.server_timing()
+        return response
+
+    def _post(self, request: HttpRequest) -> Response:
         t0 = time.perf_counter()
         serializer = RouteRequestSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         start_raw = serializer.validated_data["start"]
         end_raw = serializer.validated_data["end"]
-
-        def parse_point(raw: str) -> Point:
-            if "," in raw:
-                lon, lat = raw.split(",", 1)
-                return Point(float(lon), float(lat))
-            raise ValueError("Lat/Lon required when not using geocoding")
+        waypoints_raw = serializer.validated_data.get("waypoints", [])
+        # Alternative plans are computed on request and never cached as lanes.
+        options = {}
+        if serializer.validated_data["alternatives"]:
+            options["alternatives"] = serializer.validated_data["alternatives"]
+        if serializer.validated_data.get("max_stops") is not None:
+            options["max_stops"] = serializer.validated_data["max_stops"]
 
         try:
             start_point = parse_point(start_raw)
             end_point = parse_point(end_raw)
+            waypoints = [parse_point(raw) for raw in waypoints_raw]
         except ValueError:
+            ROUTE_REQUESTS.labels("invalid").inc()
             return Response(
                 {"detail": "Provide coordinates as 'lon,lat' strings"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        try:
-            payload = compute_route(start_point, end_point)
-        except ValueError as exc:
-            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        payload = None
+        if not options:
+            with stage("lane_cache"):
+                payload = cached_lane_payload(lane_key(start_point, end_point, waypoints))
+        cache_status = "hit" if payload is not None else "bypass" if options else "miss"
+        if payload is None:
+            compute = functools.partial(compute_route, start_point, end_point, waypoints=waypoints, **options)
+            flight_key = route_flight_key(start_point, end_point, waypoints)
+            if options:
+                flight_key += ":" + ":".join(f"{key}={value}" for key, value in sorted(options.items()))
+            try:
+                payload = single_flight(flight_key, compute)
+            except ValueError as exc:
+                ROUTE_REQUESTS.labels("infeasible").inc()
+                return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            # Cached lane payloads drop the GEOS polyline; rebuild it for history.
+            payload["polyline"] = LineString(payload["route"]["features"][0]["geometry"]["coordinates"])
         payload["static_map_url"] = ""
 
-        Route.objects.create(
-            start_point=start_point,
-            end_point=end_point,
-            geometry=payload.get("polyline"),
-            fuel_stops=payload.get("fuel_stops", []),
-            total_cost=payload.get("total_cost"),
-            route_json=payload.get("route", {}),
-        )
+        with stage("db_write"):
+            Route.objects.create(
+                start_point=start_point,
+                end_point=end_point,
+                waypoints=[[p.x, p.y] for p in waypoints],
+                fuel_stops=payload.get("fuel_stops", []),
+                total_cost=payload.get("total_cost"),
+                corridor_stations=payload.pop("corridor_stations", None),
+                **route_storage_fields(payload.get("polyline"), payload.get("route", {})),
+            )
+        ROUTE_REQUESTS.labels("success").inc()
 
         payload.pop("polyline", None)
         elapsed = (time.perf_counter() - t0) * 1000
-        logger.info("Route request %s -> %s completed in %.1f ms", start_raw, end_raw, elapsed)
-        return Response(payload)
+        logger.info(
+            "Route request %s -> %s completed in %.1f ms (lane cache %s)",
+            start_raw,
+            end_raw,
+            elapsed,
+            cache_status,
+        )
+        response = Response(payload)
+        response["X-Route-Cache"] = cache_status
+        return response
+
+
+class LaneListView(APIView):
+    """Registry of lanes whose routes are precomputed after each price refresh."""
+
+    @extend_schema(responses={200: LaneSerializer(many=True)})
+    def get(self, request: HttpRequest, *args: Any, **kwargs: Any) -> Response:
+        lanes = Lane.objects.order_by("-pinned", "-hits", "id")
+        return Response(LaneSerializer(lanes, many=True).data)
+
+    @extend_schema(
+        request=RouteRequestSerializer,
+        responses={
+            201: LaneSerializer,
+            400: OpenApiResponse(description="Validation error"),
+        },
+    )
+    def post(self, request: HttpRequest, *args: Any, **kwargs: Any) -> Response:
+        serializer = RouteRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            start_point = parse_point(serializer.validated_data["start"])
+            end_point = parse_point(serializer.validated_data["end"])
+            waypoints = [parse_point(raw) for raw in serializer.validated_data.get("waypoints", [])]
+        except ValueError:
+            return Response(
+                {"detail": "Provide coordinates as 'lon,lat' strings"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        lane, _ = Lane.objects.update_or_create(
+            key=lane_key(start_point, end_point, waypoints),
+            defaults={
+                "start_point": start_point,
+                "end_point": end_point,
+                "waypoints": [[p.x, p.y] for p in waypoints],
+                "pinned": True,
+                "enabled": True,
+            },
+        )
+        transaction.on_commit(warm_hot_lanes.delay)
+        return Response(LaneSerializer(lane).data, status=status.HTTP_201_CREATED)
+
+
+class LaneDetailView(APIView):
+    @extend_schema(responses={204: None, 404: OpenApiResponse(description="Unknown lane")})
+    def delete(self, request: HttpRequest, pk: int, *args: Any, **kwargs: Any) -> Response:
+        lane = Lane.objects.filter(pk=pk).first()
+        if lane is None:
+            return Response({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+        forget_lane(lane.key)
+        lane.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class TileStatsView(APIView):
+    """Corridor tile cache hit rates, busiest tiles first."""
+
+    @extend_schema(
+        parameters=[OpenApiParameter("limit", int, description="Tiles to return (default 50)")],
+        responses={200: TileStatsSerializer(many=True)},
+    )
+    def get(self, request: HttpRequest, *args: Any, **kwargs: Any) -> Response:
+        try:
+            limit = max(1, int(request.query_params.get("limit", 50)))
+        except ValueError:
+            return Response({"detail": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(TileStatsSerializer(tile_stats(limit), many=True).data)
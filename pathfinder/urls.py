@@ -2,10 +2,17 @@ from django.contrib import admin
 from django.urls import include, path
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
+from .metrics import metrics_view
+from .profiling import profile_detail_view, profile_list_view
+
 urlpatterns = [
+    path("admin/profiles/", profile_list_view, name="profiles"),
+    path("admin/profiles/<slug:profile_id>/", profile_detail_view, name="profile-detail"),
     path("admin/", admin.site.urls),
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path("api/docs/", SpectacularSwaggerView.as_view(url_name="schema"), name="docs"),
     path("api/ingest/", include("ingest.urls")),
+    path("api/stations/", include("ingest.station_urls")),
     path("api/route/", include("routing.urls")),
+    path("metrics", metrics_view, name="metrics"),
 ]
@@ -0,0 +1,30 @@
+import pytest
+
+from pathfinder.celery_app import app
+
+
+@pytest.mark.parametrize(
+    "task, queue",
+    [
+        ("routing.tasks.warm_hot_lanes", "routes"),
+        ("routing.tasks.refresh_hot_lanes", "routes"),
+        ("ingest.tasks.ingest_csv", "ingest"),
+        ("routing.tasks.rebuild_station_graph", "ingest"),
+        ("ingest.tasks.load_geocode_cache", "ingest"),
+        ("routing.tasks.recost_route_chunk", "ingest"),
+        ("ingest.tasks.geocode_pending", "geocode"),
+        ("ingest.tasks.geocode_chunk", "geocode"),
+        ("routing.tasks.create_route_partitions", "default"),
+    ],
+)
+def test_tasks_are_routed_to_dedicated_queues(task, queue):
+    assert app.amqp.router.route({}, task, args=(), kwargs={})["queue"].name == queue
+
+
+def test_route_jobs_outrank_bulk_backfills():
+    priority = {
+        task: app.amqp.router.route({}, task, args=(), kwargs={})["priority"]
+        for task in ("routing.tasks.warm_hot_lanes", "ingest.tasks.ingest_csv", "ingest.tasks.geocode_chunk")
+    }
+    # Redis transport: lower value is served first.
+    assert priority["routing.tasks.warm_hot_lanes"] < priority["ingest.tasks.ingest_csv"] < priority["ingest.tasks.geocode_chunk"]
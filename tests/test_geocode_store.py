@@ -0,0 +1,159 @@
+import json
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+
+from ingest import tasks
+from ingest.models import GeocodeResult
+from pathfinder import geocode
+
+
+class FakeRedis:
+    """get/set/mget/scan_iter over a dict, enough for the geocode cache."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode()
+
+    def mget(self, keys):
+        return [self.data.get(key.decode()) for key in keys]
+
+    def scan_iter(self, match, count=None):
+        return [key.encode() for key in self.data if key.startswith(match.rstrip("*"))]
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        return []
+
+
+class DownRedis:
+    def get(self, key):
+        raise ConnectionError("redis down")
+
+    set = get
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(geocode, "get_redis", lambda: fake)
+    return fake
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """The GeocodeResult table as a dict, for tests without a database."""
+    rows = {}
+    monkeypatch.setattr(geocode, "stored_geocode", lambda address: rows.get(geocode.normalize_address(address)))
+    monkeypatch.setattr(
+        geocode,
+        "store_geocode",
+        lambda address, coords, provider="": rows.__setitem__(geocode.normalize_address(address), coords),
+    )
+    return rows
+
+
+@pytest.fixture
+def providers(settings, monkeypatch):
+    settings.MAPBOX_API_KEY = "key"
+    settings.ORS_API_KEY = ""
+    calls = []
+
+    def fake_mapbox(address):
+        calls.append(address)
+        return (-97.0, 32.0)
+
+    monkeypatch.setattr(geocode, "_geocode_mapbox", fake_mapbox)
+    return calls
+
+
+def test_provider_hit_is_written_through_to_store_and_redis(redis, store, providers):
+    assert geocode.geocode_address(" 1 Main St, Dallas, TX ") == (-97.0, 32.0)
+
+    assert store == {"1 main st, dallas, tx": (-97.0, 32.0)}
+    assert json.loads(redis.data["geocode:1 main st, dallas, tx"]) == [-97.0, 32.0]
+    assert providers == [" 1 Main St, Dallas, TX "]
+
+
+def test_evicted_address_is_answered_by_the_store_and_recached(redis, store, providers):
+    geocode.geocode_address("1 Main St, Dallas, TX")
+    redis.data.clear()  # eviction or a fresh Redis
+
+    assert geocode.geocode_address("1 MAIN ST, Dallas, TX") == (-97.0, 32.0)
+
+    assert len(providers) == 1
+    assert "geocode:1 main st, dallas, tx" in redis.data
+
+
+def test_store_answers_while_redis_is_down(monkeypatch, store, providers):
+    store["1 main st, dallas, tx"] = (-96.8, 32.78)
+    monkeypatch.setattr(geocode, "get_redis", DownRedis)
+
+    assert geocode.geocode_address("1 Main St, Dallas, TX") == (-96.8, 32.78)
+    assert providers == []
+
+
+def test_dump_lines_are_normalized_and_bad_lines_rejected():
+    lines = ['{"address": " 1 Main St ", "lon": -97, "lat": "32.5", "provider": "ors"}\n', "\n"]
+
+    assert list(geocode.read_geocode_lines(lines)) == [
+        {"address": "1 main st", "lon": -97.0, "lat": 32.5, "provider": "ors"}
+    ]
+    with pytest.raises(ValueError, match="line 2"):
+        list(geocode.read_geocode_lines(lines[:1] + ['{"address": "x"}']))
+
+
+def test_redis_geocodes_reads_the_existing_cache(redis):
+    redis.set("geocode:1 main st", json.dumps([-97.0, 32.0]))
+    redis.set("geocode:broken", "not json")
+    redis.set("route:lane:x", "{}")
+
+    assert list(geocode.redis_geocodes(batch_size=1)) == [
+        {"address": "1 main st", "lon": -97.0, "lat": 32.0, "provider": ""}
+    ]
+
+
+def test_starting_workers_schedule_one_redis_load(settings, monkeypatch):
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    settings.GEOCODE_LOAD_ON_START = True
+    cache.clear()
+    queued = []
+    monkeypatch.setattr(tasks.load_geocode_cache, "delay", lambda: queued.append(1))
+
+    for _ in range(4):
+        tasks.load_geocode_cache_on_start(sender=None)
+
+    assert queued == [1]
+
+
+@pytest.mark.django_db
+def test_export_import_round_trip_and_redis_load(tmp_path, redis):
+    GeocodeResult.objects.create(address="1 main st, dallas, tx", lon=-96.8, lat=32.78, provider="mapbox")
+    GeocodeResult.objects.create(address="2 elm st, austin, tx", lon=-97.74, lat=30.27, provider="ors")
+    dump = tmp_path / "geocodes.ndjson.gz"
+
+    call_command("export_geocodes", str(dump))
+    GeocodeResult.objects.all().delete()
+    GeocodeResult.objects.create(address="2 elm st, austin, tx", lon=0.0, lat=0.0)
+    call_command("import_geocodes", str(dump), "--load-redis")
+
+    assert sorted(GeocodeResult.objects.values_list("address", "lon", "lat", "provider")) == [
+        ("1 main st, dallas, tx", -96.8, 32.78, "mapbox"),
+        ("2 elm st, austin, tx", -97.74, 30.27, "ors"),
+    ]
+    assert json.loads(redis.data["geocode:2 elm st, austin, tx"]) == [-97.74, 30.27]
+
+
+@pytest.mark.django_db
+def test_geocode_address_writes_the_table(redis, providers):
+    geocode.geocode_address("1 Main St, Dallas, TX")
+
+    assert GeocodeResult.objects.get(address="1 main st, dallas, tx").provider == "mapbox"
@@ -1,10 +1,14 @@
+import json
+from decimal import Decimal
 from unittest.mock import Mock
 
 import pytest
+from django.contrib.gis.geos import Point
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APIClient
 
-from ingest.models import Ingestion
+from ingest.models import FuelStation, Ingestion
+from ingest.views import parse_bbox
 
 
 @pytest.mark.django_db
@@ -62,3 +66,71 @@ def test_bdd_given_missing_file_when_upload_called_then_returns_400():
     # Then: request is rejected with clear validation error.
     assert response.status_code == 400
     assert response.json()["detail"] == "file is required"
+
+
+def make_station(opis_id, state, price, lon, lat):
+    return FuelStation.objects.create(
+        opis_id=opis_id,
+        name=f"Stop {opis_id}",
+        address="1 Main",
+        city="Town",
+        state=state,
+        price=Decimal(price),
+        geom=Point(lon, lat),
+    )
+
+
+def stream_body(response):
+    return b"".join(response.streaming_content).decode()
+
+
+@pytest.mark.django_db
+def test_fuel_prices_export_streams_live_snapshot_as_csv():
+    Ingestion.objects.create(source="upload").mark_success()
+    make_station("1", "TX", "3.111", -97.7, 30.3)
+    make_station("2", "OK", "2.999", -97.5, 35.5)
+
+    response = APIClient().get("/api/ingest/fuel-prices/")
+
+    assert response.status_code == 200
+    assert response["ETag"]
+    lines = stream_body(response).strip().splitlines()
+    assert lines[0].startswith("OPIS Truckstop ID,Truckstop Name")
+    assert len(lines) == 3
+    assert "3.111" in lines[1]
+
+
+@pytest.mark.django_db
+def test_fuel_prices_export_returns_304_until_next_ingestion():
+    Ingestion.objects.create(source="upload").mark_success()
+    make_station("1", "TX", "3.111", -97.7, 30.3)
+    client = APIClient()
+
+    first = client.get("/api/ingest/fuel-prices/")
+    repeat = client.get("/api/ingest/fuel-prices/", HTTP_IF_NONE_MATCH=first["ETag"])
+    Ingestion.objects.create(source="upload").mark_success()
+    after_refresh = client.get("/api/ingest/fuel-prices/", HTTP_IF_NONE_MATCH=first["ETag"])
+
+    assert repeat.status_code == 304
+    assert after_refresh.status_code == 200
+
+
+@pytest.mark.django_db
+def test_fuel_prices_export_filters_state_and_bbox_as_ndjson():
+    make_station("1", "TX", "3.111", -97.7, 30.3)
+    make_station("2", "OK", "2.999", -97.5, 35.5)
+    make_station("3", "TX", "3.222", -106.4, 31.8)
+
+    response = APIClient().get(
+        "/api/ingest/fuel-prices/", {"output": "ndjson", "state": "tx", "bbox": "-100,29,-95,32"}
+    )
+
+    rows = [json.loads(line) for line in stream_body(response).splitlines()]
+    assert [row["opis_id"] for row in rows] == ["1"]
+    assert rows[0]["price"] == "3.111"
+
+
+def test_parse_bbox_rejects_inverted_box():
+    with pytest.raises(ValueError):
+        parse_bbox("-95,29,-100,32")
+    assert parse_bbox("-100,29,-95,32").extent == (-100.0, 29.0, -95.0, 32.0)
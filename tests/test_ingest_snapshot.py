@@ -0,0 +1,142 @@
+import os
+import threading
+from decimal import Decimal
+
+import pytest
+
+from ingest import snapshot
+from ingest.snapshot import StationSnapshot, current_snapshot, write_snapshot
+
+ROWS = [
+    (3, -97.74, 30.27, Decimal("3.459"), "Austin"),
+    (1, -96.80, 32.78, Decimal("3.100"), "Dallas"),
+    (2, -95.37, 29.76, Decimal("2.999"), "Houston Café"),
+]
+
+
+@pytest.fixture(autouse=True)
+def snapshot_settings(settings, tmp_path, monkeypatch):
+    settings.STATION_SNAPSHOT_DIR = str(tmp_path)
+    settings.STATION_SNAPSHOT_CHECK_SECONDS = 0
+    monkeypatch.setattr(snapshot, "_snapshot", None)
+    monkeypatch.setattr(snapshot, "_checked_at", None)
+    return tmp_path
+
+
+def test_snapshot_round_trips_columns_sorted_by_latitude(tmp_path):
+    loaded = StationSnapshot(write_snapshot(str(tmp_path), 5, ROWS))
+
+    assert loaded.version == 5
+    assert loaded.count == 3
+    assert [loaded.row(i) for i in range(loaded.count)] == sorted(ROWS, key=lambda row: row[2])
+    assert list(loaded.lat) == sorted(loaded.lat)
+    assert [loaded.ids[i] for i in loaded.in_bbox(-98.0, 29.0, -97.0, 31.0)] == [3]
+
+
+def test_empty_snapshot_is_readable(tmp_path):
+    loaded = StationSnapshot(write_snapshot(str(tmp_path), 1, []))
+
+    assert loaded.count == 0
+    assert list(loaded.lat_range(-90, 90)) == []
+
+
+def test_current_pointer_swaps_forward_only_and_prunes_old_files(tmp_path):
+    for version in (1, 2, 3):
+        write_snapshot(str(tmp_path), version, ROWS[:version], keep=2)
+
+    assert current_snapshot().version == 3
+    # A slow task finishing late must not move CURRENT back.
+    write_snapshot(str(tmp_path), 2, ROWS[:1])
+    assert (tmp_path / "CURRENT").read_text() == "stations-000000000003.bin"
+    assert sorted(n for n in os.listdir(tmp_path) if n.startswith("stations-")) == [
+        "stations-000000000002.bin",
+        "stations-000000000003.bin",
+    ]
+
+
+def test_older_writer_finishing_late_does_not_move_current_back(tmp_path):
+    def rows_while_newer_version_lands():
+        # Runs after the older writer's unlocked pointer check, while it builds its file.
+        write_snapshot(str(tmp_path), 3, ROWS)
+        yield from ROWS[:1]
+
+    write_snapshot(str(tmp_path), 2, rows_while_newer_version_lands())
+
+    assert (tmp_path / "CURRENT").read_text() == "stations-000000000003.bin"
+    assert current_snapshot().version == 3
+    assert sorted(os.listdir(tmp_path)) == [".lock", "CURRENT", "stations-000000000003.bin"]
+
+
+def test_concurrent_writers_of_one_version_never_share_temp_files(tmp_path):
+    barrier = threading.Barrier(4)
+    errors = []
+
+    def writer():
+        barrier.wait()
+        try:
+            for _ in range(25):
+                write_snapshot(str(tmp_path), 7, ROWS)
+        except Exception as exc:  # pragma: no cover - reported below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=writer) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert StationSnapshot(str(tmp_path / "stations-000000000007.bin")).count == 3
+    assert sorted(os.listdir(tmp_path)) == [".lock", "CURRENT", "stations-000000000007.bin"]
+
+
+def test_workers_keep_old_mapping_until_a_new_version_appears(tmp_path):
+    write_snapshot(str(tmp_path), 1, ROWS[:1])
+    first = current_snapshot()
+    assert current_snapshot() is first
+
+    write_snapshot(str(tmp_path), 2, ROWS, keep=1)
+    second = current_snapshot()
+
+    assert second.version == 2 and second.count == 3
+    # The old file is gone, but a request still holding the mapping can read it.
+    assert first.row(0)[4] == "Austin"
+
+
+def test_missing_snapshot_disables_the_fast_path(settings):
+    assert current_snapshot() is None
+    settings.STATION_SNAPSHOT_DIR = ""
+    assert current_snapshot() is None
+
+
+@pytest.mark.django_db
+def test_overlapping_ingestions_version_snapshots_by_completion():
+    from django.contrib.gis.geos import Point
+
+    from ingest.models import FuelStation, Ingestion
+    from ingest.tasks import write_station_snapshot
+    from routing.tiles import fetch_tiles, tile_of
+
+    station = FuelStation.objects.create(
+        opis_id="1", name="Dallas", address="", city="", state="TX", price=Decimal("3.100"), geom=Point(-96.80, 32.78)
+    )
+    tile = tile_of(-96.80, 32.78, 0.25)
+    # A long upload starts first; a geocode run starts and finishes while it is still going.
+    upload = Ingestion.objects.create(source="upload")
+    backfill = Ingestion.objects.create(source="geocode")
+    backfill.mark_success()
+    write_station_snapshot()
+    assert current_snapshot().version == backfill.sequence
+
+    station.price = Decimal("2.900")
+    station.save()
+    upload.mark_success()
+
+    assert upload.id < backfill.id and upload.sequence > backfill.sequence
+    assert Ingestion.objects.latest_success() == upload
+    # The snapshot predates the upload's prices, so tiles come from the database.
+    assert fetch_tiles([tile], 0.25)[tile][0][3] == "2.900"
+
+    write_station_snapshot()
+    assert current_snapshot().version == upload.sequence
+    assert fetch_tiles([tile], 0.25)[tile][0][3] == "2.900"
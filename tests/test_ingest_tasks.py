@@ -1,7 +1,7 @@
 import pytest
 
-from ingest.models import FuelStation, Ingestion
-from ingest.tasks import ingest_csv, parse_price
+from ingest.models import FuelPriceHistory, FuelStation, Ingestion
+from ingest.tasks import geocode_backfill, geocode_chunk, ingest_csv, parse_price
 
 
 def test_parse_price_quantizes_to_three_decimals():
@@ -28,6 +28,24 @@ def test_ingest_csv_happy_path(tmp_path):
     assert str(station.price) == "3.111"
 
 
+@pytest.mark.django_db
+def test_ingest_csv_appends_price_history_only_for_changes(tmp_path, settings):
+    settings.INGEST_GEOCODE = False
+    header = "OPIS Truckstop ID,Truckstop Name,Address,City,State,Retail Price\n"
+    csv_path = tmp_path / "stations.csv"
+    for prices in (("3.111", "3.500"), ("3.111", "3.459")):
+        csv_path.write_text(
+            header + f"1,Demo One,1 Main St,New York,NY,{prices[0]}\n2,Demo Two,2 Main St,Dallas,TX,{prices[1]}\n",
+            encoding="utf-8",
+        )
+        ingest_csv(Ingestion.objects.create(source="upload").id, str(csv_path))
+
+    history = FuelPriceHistory.objects.order_by("observed_at", "id")
+    assert [(row.opis_id, str(row.price)) for row in history] == [("1", "3.111"), ("2", "3.500"), ("2", "3.459")]
+    station = FuelStation.objects.get(opis_id="2", state="TX")
+    assert {row.station_id for row in history.filter(opis_id="2")} == {station.id}
+
+
 @pytest.mark.django_db
 def test_ingest_csv_failure_marks_ingestion_failed(tmp_path):
     csv_path = tmp_path / "bad_stations.csv"
@@ -44,3 +62,29 @@ def test_ingest_csv_failure_marks_ingestion_failed(tmp_path):
     ingestion.refresh_from_db()
     assert ingestion.status == Ingestion.Status.FAILED
     assert "not-a-number" in ingestion.error_message
+
+
+@pytest.mark.django_db
+def test_geocode_backfill_queues_chunks(monkeypatch):
+    for i in range(5):
+        FuelStation.objects.create(opis_id=str(i), name="S", address="1 Main", city="X", state="TX", price="3.000")
+    queued = []
+    monkeypatch.setattr("ingest.tasks.geocode_chunk.delay", queued.append)
+
+    assert geocode_backfill(batch_size=4, chunk_size=3) == 4
+    assert [len(chunk) for chunk in queued] == [3, 1]
+
+
+@pytest.mark.django_db
+def test_geocode_chunk_requeues_remainder_after_time_budget(monkeypatch, settings):
+    settings.GEOCODE_CHUNK_MAX_SECONDS = 0
+    ids = [
+        FuelStation.objects.create(opis_id=str(i), name="S", address="1 Main", city="X", state="TX", price="3.000").id
+        for i in range(3)
+    ]
+    requeued = []
+    monkeypatch.setattr("ingest.tasks.geocode_chunk.delay", requeued.append)
+    monkeypatch.setattr("ingest.tasks.geocode_address", lambda address: (-97.0, 32.0))
+
+    assert geocode_chunk(ids) == 0
+    assert requeued == [ids]
@@ -0,0 +1,81 @@
+import socket
+import urllib.request
+
+import pytest
+from rest_framework.test import APIClient
+
+from pathfinder.metrics import (
+    ROUTE_STAGE_SECONDS,
+    TASK_RUNS,
+    collect_stages,
+    observe_task,
+    reset_multiproc_dir,
+    stage,
+    start_worker_exporter,
+)
+
+
+def test_stage_records_server_timing_when_collecting():
+    with collect_stages() as timings:
+        with stage("provider"):
+            pass
+        with stage("corridor"):
+            pass
+
+    header = timings.server_timing()
+    assert header.startswith("provider;dur=")
+    assert ", corridor;dur=" in header
+
+
+def test_stage_outside_request_still_observes_histogram():
+    before = ROUTE_STAGE_SECONDS.labels("optimizer")._sum.get()
+
+    with stage("optimizer"):
+        sum(range(1000))
+
+    assert ROUTE_STAGE_SECONDS.labels("optimizer")._sum.get() > before
+
+
+def test_observe_task_counts_failures_and_reraises():
+    @observe_task
+    def flaky_task():
+        raise RuntimeError("boom")
+
+    before = TASK_RUNS.labels("flaky_task", "failure")._value.get()
+    with pytest.raises(RuntimeError):
+        flaky_task()
+
+    assert TASK_RUNS.labels("flaky_task", "failure")._value.get() == before + 1
+
+
+def test_metrics_endpoint_exposes_route_histograms():
+    response = APIClient().get("/metrics")
+
+    assert response.status_code == 200
+    assert b"route_stage_seconds" in response.content
+
+
+def test_worker_exporter_serves_task_metrics():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    @observe_task
+    def exported_task():
+        return 3
+
+    exported_task()
+    start_worker_exporter(port)
+
+    body = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read()
+    assert b'celery_task_items_total{task="exported_task"} 3.0' in body
+
+
+def test_reset_multiproc_dir_removes_only_metric_files(tmp_path, monkeypatch):
+    (tmp_path / "counter_12.db").write_bytes(b"x")
+    (tmp_path / "keep.txt").write_text("x")
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+
+    reset_multiproc_dir()
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["keep.txt"]
@@ -0,0 +1,223 @@
+import json
+import marshal
+import pstats
+import threading
+import zlib
+from types import SimpleNamespace
+
+import pytest
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from pathfinder import profiling
+from pathfinder.metrics import observe_task
+from pathfinder.profiling import ProfilingMiddleware, QueryLog, profiled, should_profile_request
+
+STAFF = SimpleNamespace(is_active=True, is_staff=True)
+ANONYMOUS = SimpleNamespace(is_active=False, is_staff=False)
+
+
+class FakeRedis:
+    """Strings and lists over dicts, enough for the profile store."""
+
+    def __init__(self):
+        self.values = {}
+        self.lists = {}
+
+    def pipeline(self, transaction=True):
+        fake, results = self, []
+
+        class Pipe:
+            def __getattr__(self, name):
+                return lambda *args, **kwargs: results.append(getattr(fake, name)(*args, **kwargs))
+
+            def execute(self):
+                return list(results)
+
+        return Pipe()
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+    def expire(self, key, seconds):
+        pass
+
+    def lpush(self, key, value):
+        self.lists.setdefault(key, []).insert(0, value.encode())
+
+    def lrange(self, key, start, end):
+        items = self.lists.get(key, [])
+        return items[start:] if end == -1 else items[start : end + 1]
+
+    def ltrim(self, key, start, end):
+        self.lists[key] = self.lists.get(key, [])[start : end + 1]
+
+
+@pytest.fixture(autouse=True)
+def profile_settings(settings, monkeypatch):
+    settings.PROFILING_TOKEN = "s3cret"
+    settings.PROFILING_SAMPLE_RATE = 0.0
+    settings.PROFILING_TASK_SAMPLE_RATE = 0.0
+    settings.PROFILING_TASKS = []
+    settings.PROFILING_PATHS = ["/api/route/", "/api/ingest/"]
+    settings.PROFILING_KEEP = 2
+    redis = FakeRedis()
+    monkeypatch.setattr(profiling, "get_redis", lambda: redis)
+    return redis
+
+
+def make_request(path="/api/route/", user=ANONYMOUS, **headers):
+    request = RequestFactory().post(path, **headers)
+    request.user = user
+    return request
+
+
+def busy_work():
+    return sum(i * i for i in range(20000))
+
+
+def test_requests_are_profiled_only_when_opted_in(settings):
+    assert not should_profile_request(make_request())
+    assert not should_profile_request(make_request(HTTP_X_PROFILE="wrong"))
+    assert should_profile_request(make_request(HTTP_X_PROFILE="s3cret"))
+    assert should_profile_request(make_request(user=STAFF, HTTP_X_PROFILE="1"))
+    assert not should_profile_request(make_request("/api/stations/nearby/", HTTP_X_PROFILE="s3cret"))
+
+    settings.PROFILING_SAMPLE_RATE = 1.0
+    assert should_profile_request(make_request())
+
+
+def test_middleware_stores_profile_and_returns_its_id(profile_settings):
+    def view(request):
+        busy_work()
+        return HttpResponse(status=201)
+
+    response = ProfilingMiddleware(view)(make_request(HTTP_X_PROFILE="s3cret"))
+
+    profile_id = response["X-Profile-Id"]
+    record = json.loads(zlib.decompress(profile_settings.get(f"profile:{profile_id}")))
+    assert record["kind"] == "request" and record["name"] == "POST /api/route/"
+    assert record["status"] == 201 and record["queries"] == 0
+    assert any("busy_work" in row["function"] for row in record["functions"])
+    stats = marshal.loads(zlib.decompress(profile_settings.get(f"profile:{profile_id}:pstats")))
+    assert any(func[2] == "busy_work" for func in stats)
+
+
+def test_unprofiled_requests_pass_straight_through(profile_settings):
+    response = ProfilingMiddleware(lambda request: HttpResponse())(make_request())
+
+    assert "X-Profile-Id" not in response
+    assert profile_settings.values == {}
+
+
+def test_query_log_groups_repeated_statements():
+    log = QueryLog(limit=3)
+    execute = lambda sql, params, many, context: None  # noqa: E731
+    for sql in ["SELECT 1", "SELECT 2", "SELECT 2", "SELECT 3"]:
+        log(execute, sql, (), False, {})
+
+    assert log.count == 4 and len(log.queries) == 3
+    assert {row["sql"]: row["count"] for row in log.statements()} == {"SELECT 1": 1, "SELECT 2": 2}
+
+
+def test_only_the_newest_profiles_are_kept(profile_settings):
+    ids = []
+    for name in ("a", "b", "c"):
+        with profiled("task", name) as info:
+            busy_work()
+        ids.append(info["id"])
+
+    assert [row["id"] for row in profiling.stored_profiles()] == ids[:0:-1]
+    assert profile_settings.get(f"profile:{ids[0]}") is None
+    assert profile_settings.get(f"profile:{ids[0]}:pstats") is None
+
+
+def test_nested_profiling_runs_unprofiled():
+    with profiled("request", "outer") as outer:
+        with profiled("task", "inner") as inner:
+            busy_work()
+
+    assert outer["id"] and "id" not in inner
+
+
+def test_concurrent_profiles_run_one_at_a_time():
+    started, done = threading.Event(), threading.Event()
+    outer = {}
+
+    def first():
+        with profiled("request", "first") as info:
+            started.set()
+            done.wait(5)
+        outer.update(info)
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    started.wait(5)
+    try:
+        with profiled("request", "second") as second:
+            busy_work()
+    finally:
+        done.set()
+        thread.join(5)
+
+    assert outer["id"] and "id" not in second
+    assert [row["name"] for row in profiling.stored_profiles()] == ["first"]
+
+
+def test_profiler_that_cannot_start_leaves_the_request_unprofiled(monkeypatch):
+    class BusyProfile:
+        def enable(self):
+            raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(profiling.cProfile, "Profile", BusyProfile)
+
+    response = ProfilingMiddleware(lambda request: HttpResponse())(make_request(HTTP_X_PROFILE="s3cret"))
+
+    assert response.status_code == 200 and "X-Profile-Id" not in response
+    with profiled("task", "after") as info:
+        pass
+    assert "id" not in info
+
+
+def test_listed_tasks_are_profiled(settings, profile_settings):
+    settings.PROFILING_TASKS = ["slow_task"]
+
+    @observe_task
+    def slow_task():
+        return busy_work()
+
+    @observe_task
+    def quick_task():
+        return 1
+
+    slow_task()
+    quick_task()
+
+    assert [row["name"] for row in profiling.stored_profiles()] == ["slow_task"]
+
+
+def test_profile_views_are_staff_only_and_serve_pstats(profile_settings, tmp_path):
+    with profiled("task", "slow_task") as info:
+        busy_work()
+    factory = RequestFactory()
+
+    anonymous = factory.get("/admin/profiles/")
+    anonymous.user = ANONYMOUS
+    assert profiling.profile_list_view(anonymous).status_code == 302
+
+    listing = factory.get("/admin/profiles/")
+    listing.user = STAFF
+    assert json.loads(profiling.profile_list_view(listing).content)["profiles"][0]["id"] == info["id"]
+
+    download = factory.get(f"/admin/profiles/{info['id']}/", {"download": "pstats"})
+    download.user = STAFF
+    path = tmp_path / "profile.prof"
+    path.write_bytes(profiling.profile_detail_view(download, info["id"]).content)
+    assert pstats.Stats(str(path)).total_calls > 0
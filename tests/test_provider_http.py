@@ -0,0 +1,155 @@
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from pathfinder import provider_http
+from pathfinder.provider_http import RetryPolicy, request_with_retry, retry_after_seconds, retry_budget
+from routing.services import RoutingClient
+
+FAST = RetryPolicy(max_attempts=3, attempt_timeout=1.0, deadline=5.0, backoff_base=0.01, backoff_max=0.02)
+
+
+class StubProvider:
+    """Local HTTP server answering from a script of (status, headers, body, delay) steps."""
+
+    def __init__(self):
+        self.script = []
+        self.hits = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.hits += 1
+                status, headers, body, delay = stub.script.pop(0) if stub.script else (200, {}, {}, 0)
+                time.sleep(delay)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def respond(self, status, headers=None, body=None, delay=0.0):
+        self.script.append((status, headers or {}, body or {}, delay))
+
+
+@pytest.fixture
+def stub():
+    provider = StubProvider()
+    yield provider
+    provider.server.shutdown()
+    provider.server.server_close()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    recorded = []
+    clock = SimpleNamespace(monotonic=time.monotonic, sleep=recorded.append)
+    monkeypatch.setattr(provider_http, "time", clock)
+    return recorded
+
+
+def test_transient_5xx_is_retried_with_backoff(stub, sleeps):
+    stub.respond(503)
+    stub.respond(502)
+    stub.respond(200, body={"ok": True})
+
+    resp = request_with_retry(requests.Session(), "GET", stub.url, FAST)
+
+    assert resp.json() == {"ok": True}
+    assert stub.hits == 3
+    assert len(sleeps) == 2 and all(0 <= d <= 0.02 for d in sleeps)
+
+
+def test_retry_after_is_respected_on_429(stub, sleeps):
+    stub.respond(429, headers={"Retry-After": "2"})
+    stub.respond(200)
+
+    resp = request_with_retry(requests.Session(), "GET", stub.url, FAST)
+
+    assert resp.status_code == 200
+    assert sleeps == [2.0]
+
+
+def test_retry_after_beyond_deadline_returns_throttled_response(stub, sleeps):
+    stub.respond(429, headers={"Retry-After": "60"})
+
+    resp = request_with_retry(requests.Session(), "GET", stub.url, FAST)
+
+    assert resp.status_code == 429
+    assert stub.hits == 1
+    assert sleeps == []
+
+
+def test_client_errors_are_not_retried(stub, sleeps):
+    stub.respond(404)
+
+    resp = request_with_retry(requests.Session(), "GET", stub.url, FAST)
+
+    assert resp.status_code == 404
+    assert stub.hits == 1
+
+
+def test_slow_attempt_times_out_and_is_retried(stub):
+    policy = RetryPolicy(max_attempts=2, attempt_timeout=0.2, deadline=5.0, backoff_base=0.01, backoff_max=0.01)
+    stub.respond(200, body={"slow": True}, delay=0.5)
+    stub.respond(200, body={"slow": False})
+
+    resp = request_with_retry(requests.Session(), "GET", stub.url, policy)
+
+    assert resp.json() == {"slow": False}
+
+
+def test_connection_errors_raise_after_attempts(sleeps):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    with pytest.raises(requests.ConnectionError):
+        request_with_retry(requests.Session(), "GET", f"http://127.0.0.1:{port}", FAST)
+    assert len(sleeps) == FAST.max_attempts - 1
+
+
+def test_retry_budget_is_shared_across_calls(stub, sleeps):
+    for _ in range(4):
+        stub.respond(503)
+
+    with retry_budget(1):
+        first = request_with_retry(requests.Session(), "GET", stub.url, FAST)
+        second = request_with_retry(requests.Session(), "GET", stub.url, FAST)
+
+    assert first.status_code == second.status_code == 503
+    assert stub.hits == 3  # 2 attempts for the first call, no retry left for the second
+
+
+def test_retry_after_http_date():
+    resp = requests.Response()
+    resp.headers["Retry-After"] = "Wed, 21 Oct 2015 07:28:00 GMT"
+    assert retry_after_seconds(resp) == 0.0
+
+
+def test_routing_client_rides_out_mapbox_throttling(stub, sleeps, settings):
+    settings.MAPBOX_API_KEY = "test"
+    settings.MAPBOX_DIRECTIONS_BASE_URL = stub.url
+    settings.MAPBOX_DIRECTIONS_MAX_ATTEMPTS = 3
+    stub.respond(429, headers={"Retry-After": "1"})
+    stub.respond(200, body={"routes": [{"geometry": {"coordinates": [[-96.8, 32.8], [-95.4, 29.8]]}}]})
+
+    route = RoutingClient().directions((-96.8, 32.8), (-95.4, 29.8))
+
+    assert route["features"][0]["geometry"]["coordinates"] == [[-96.8, 32.8], [-95.4, 29.8]]
+    assert sleeps == [1.0]
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+import requests
+
+from pathfinder import geocode
+from pathfinder.provider_stub import ProviderStub, StubConfig, hashed_geocode, haversine_miles, serve
+from routing.services import RoutingClient
+
+DALLAS, HOUSTON, AUSTIN = (-96.797, 32.7767), (-95.3698, 29.7604), (-97.7431, 30.2672)
+
+
+@pytest.fixture
+def stub(settings):
+    provider = ProviderStub(seed=1)
+    server = serve(provider)
+    url = f"http://127.0.0.1:{server.server_port}"
+    settings.MAPBOX_DIRECTIONS_BASE_URL = f"{url}/directions/v5/mapbox/driving"
+    settings.MAPBOX_GEOCODING_BASE_URL = f"{url}/geocoding/v5/mapbox.places"
+    settings.ORS_DIRECTIONS_URL = f"{url}/v2/directions/driving-car"
+    settings.ORS_GEOCODING_URL = f"{url}/geocode/search"
+    settings.MAPBOX_API_KEY = settings.ORS_API_KEY = "stub"
+    settings.ROUTING_PROVIDER = "mapbox"
+    provider.url = url
+    yield provider
+    server.shutdown()
+    server.server_close()
+
+
+def test_mapbox_directions_are_densified_through_every_point(stub):
+    route = RoutingClient().directions(DALLAS, HOUSTON, waypoints=[AUSTIN])
+
+    coords = route["features"][0]["geometry"]["coordinates"]
+    assert coords[0] == list(DALLAS) and coords[-1] == list(HOUSTON)
+    assert list(AUSTIN) in coords
+    assert max(haversine_miles(a, b) for a, b in zip(coords, coords[1:])) <= 1.0
+    assert stub.counts == {"mapbox_directions:200": 1}
+
+
+def test_ors_directions_replay_a_recorded_polyline(stub, settings):
+    settings.ROUTING_PROVIDER = "ors"
+    recorded = [list(DALLAS), [-96.5, 31.5], [-95.8, 30.4], list(HOUSTON)]
+    stub.load_recordings([json.dumps({"points": [DALLAS, HOUSTON], "coordinates": recorded})])
+
+    route = RoutingClient().directions((-96.79701, 32.77671), HOUSTON)
+
+    assert route["features"][0]["geometry"]["coordinates"] == recorded
+    assert route["features"][0]["properties"]["summary"]["distance"] > 0
+
+
+def test_geocoders_answer_from_a_dump_or_a_stable_hash(stub):
+    stub.load_geocodes([json.dumps({"address": "i-44, exit 283, big cabin, ok", "lon": -95.22, "lat": 36.54})])
+
+    assert geocode._geocode_mapbox("I-44, EXIT 283, Big Cabin, OK") == (-95.22, 36.54)
+    assert geocode._geocode_ors("i-44, exit 283, big cabin, ok") == (-95.22, 36.54)
+    lon, lat = geocode._geocode_ors("1 Unknown Rd, Nowhere, TX")
+    assert (lon, lat) == hashed_geocode("1 unknown rd, nowhere, tx")
+    assert -124.0 <= lon <= -67.0 and 25.0 <= lat <= 49.0
+
+
+def test_fault_rates_return_throttles_and_errors():
+    stub = ProviderStub(StubConfig(throttle_rate=0.3, error_rate=0.2, retry_after=4), seed=3)
+
+    replies = [stub.handle("GET", "/geocode/search?text=somewhere") for _ in range(1000)]
+
+    statuses = [status for status, _, _ in replies]
+    assert 250 < statuses.count(429) < 350
+    assert 150 < statuses.count(503) < 250
+    assert all(headers == {"Retry-After": "4"} for status, headers, _ in replies if status == 429)
+    assert sum(stub.counts.values()) == 1000
+
+
+def test_config_can_change_mid_run(stub):
+    resp = requests.post(f"{stub.url}/_stub/config", json={"throttle_rate": 1, "retry_after": 2})
+    assert resp.json()["config"]["throttle_rate"] == 1.0
+
+    assert requests.get(f"{stub.url}/geocode/search", params={"text": "x"}).status_code == 429
+    assert requests.post(f"{stub.url}/_stub/config", json={"latency": 5}).status_code == 400
+    assert requests.get(f"{stub.url}/_stub/stats").json()["counts"] == {"ors_geocoding:429": 1}
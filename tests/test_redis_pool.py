@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.cache import caches
+
+from pathfinder.redis_pool import get_redis, shared_pool
+
+
+def test_cache_and_geocoder_share_one_redis_pool():
+    cache_pool = caches["default"]._cache._get_connection_pool(write=True)
+
+    assert cache_pool is shared_pool()
+    assert get_redis().connection_pool is shared_pool()
+
+
+def test_shared_pool_is_bounded():
+    pool = shared_pool()
+
+    assert pool.max_connections == settings.REDIS_MAX_CONNECTIONS
+    assert pool.connection_kwargs["health_check_interval"] == settings.REDIS_HEALTH_CHECK_SECONDS
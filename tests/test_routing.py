@@ -1,8 +1,28 @@
+import random
 from decimal import Decimal
 
+import pytest
+
 from django.contrib.gis.geos import Point
 
-from routing.services import StationNode, build_graph, dijkstra, haversine_miles
+from routing import services
+from routing.models import StationPair
+from routing.services import (
+    MILES_PER_GALLON,
+    StationNode,
+    build_graph,
+    build_graph_from_reachability,
+    dijkstra,
+    TripLayout,
+    cost_to_dollars,
+    haversine_miles,
+    leg_cost,
+    load_reachability,
+    locate_on_polyline,
+    plan_fuel_stops,
+    prune_dominated_stations,
+    station_pairs_within_range,
+)
 
 
 def test_haversine_zero_distance():
@@ -29,3 +49,215 @@ def test_dijkstra_simple_path():
     graph = {1: {2: 5, 3: 2}, 2: {}, 3: {2: 1}}
     path = dijkstra(graph, start=1, end=2)
     assert path == [1, 3, 2]
+
+
+def test_station_pairs_within_range_matches_brute_force():
+    nodes = [
+        StationNode(id=i, lon=-100 + (i % 7) * 1.3, lat=30 + (i // 7) * 1.1, price=Decimal("3.00"), name=str(i))
+        for i in range(35)
+    ]
+    expected = {
+        (a.id, b.id)
+        for a in nodes
+        for b in nodes
+        if a.id < b.id and haversine_miles((a.lon, a.lat), (b.lon, b.lat)) <= 200
+    }
+
+    found = {tuple(sorted((a, b))) for a, b, _ in station_pairs_within_range(nodes, 200)}
+
+    assert found == expected
+
+
+def test_build_graph_from_reachability_matches_eager_graph():
+    start = StationNode(id=-1, lon=-74.0, lat=40.7, price=Decimal("3.50"), name="start")
+    a = StationNode(id=1, lon=-76.0, lat=40.0, price=Decimal("3.10"), name="A")
+    b = StationNode(id=2, lon=-80.0, lat=39.5, price=Decimal("3.40"), name="B")
+    new = StationNode(id=3, lon=-78.0, lat=39.8, price=Decimal("3.20"), name="not yet stored")
+    nodes = [start, a, b, new]
+    reach = {1: {}, 2: {}}
+    for a_id, b_id, dist in station_pairs_within_range([a, b], 500):
+        reach[a_id][b_id] = dist
+        reach[b_id][a_id] = dist
+
+    assert build_graph_from_reachability(nodes, reach) == build_graph(nodes)
+
+
+def test_station_pair_stores_lower_id_first():
+    pair = StationPair.between(9, 7, 12.5, 500.0)
+
+    assert (pair.station_id, pair.neighbor_id, pair.miles) == (7, 9, 12.5)
+
+
+@pytest.mark.django_db
+def test_load_reachability_reads_only_pairs_inside_the_corridor():
+    max_range = services.MAX_RANGE_MILES
+    StationPair.objects.bulk_create(
+        [
+            StationPair.between(1, 2, 10.0, max_range),
+            StationPair.between(3, 2, 20.0, max_range),
+            StationPair.between(1, 4, 30.0, max_range),
+            StationPair.between(1, 3, 15.0, max_range + 100),
+        ]
+    )
+
+    assert load_reachability([1, 2, 3]) == {1: {2: 10.0}, 2: {1: 10.0, 3: 20.0}, 3: {2: 20.0}}
+
+
+def test_prune_dominated_stations_keeps_cheapest_per_bin():
+    stations = [
+        StationNode(id=1, lon=0, lat=0, price=Decimal("3.40"), name="exit 1 pricey", route_miles=1.0),
+        StationNode(id=2, lon=0, lat=0, price=Decimal("3.10"), name="exit 1 cheap", route_miles=2.0),
+        StationNode(id=3, lon=0, lat=0, price=Decimal("3.20"), name="exit 1 mid", route_miles=4.9),
+        StationNode(id=4, lon=0, lat=0, price=Decimal("3.90"), name="exit 2 only", route_miles=7.0),
+        StationNode(id=5, lon=0, lat=0, price=Decimal("4.50"), name="position unknown"),
+    ]
+
+    kept = prune_dominated_stations(stations, bin_miles=5, top_k=1)
+
+    assert sorted(node.id for node in kept) == [2, 4, 5]
+    assert prune_dominated_stations(stations, bin_miles=0, top_k=1) == stations
+
+
+def test_pruning_is_off_by_default(settings):
+    stations = [
+        StationNode(id=i, lon=0, lat=0, price=Decimal("3.00") + i, name=f"exit {i}", route_miles=1.0)
+        for i in range(4)
+    ]
+
+    assert settings.ROUTING_PRUNE_TOP_K == 0
+    assert prune_dominated_stations(stations, settings.ROUTING_PRUNE_BIN_MILES, settings.ROUTING_PRUNE_TOP_K) == stations
+
+
+def test_locate_on_polyline_returns_length_fraction():
+    coords = [(0.0, 0.0), (1.0, 0.0), (1.0, 1.0)]
+
+    assert locate_on_polyline(coords, (0.5, 0.2)) == 0.25
+    assert locate_on_polyline(coords, (2.0, 1.5)) == 1.0
+
+
+def test_layered_graph_only_moves_forward_through_waypoints():
+    start = StationNode(id=-1, lon=0.0, lat=0.0, price=Decimal("3.00"), name="start")
+    end = StationNode(id=-2, lon=2.0, lat=0.0, price=Decimal("3.00"), name="end")
+    before = StationNode(id=1, lon=0.5, lat=0.0, price=Decimal("3.00"), name="before")
+    after = StationNode(id=2, lon=1.5, lat=0.0, price=Decimal("3.00"), name="after")
+    nodes = [start, end, before, after]
+    layout = TripLayout.for_route([(0.0, 0.0), (2.0, 0.0)], [(1.0, 0.0)], nodes, -1, -2)
+
+    graph = build_graph(nodes, layout)
+
+    assert layout.layers == {-1: 0, -2: 1, 1: 0, 2: 1}
+    assert 2 in graph[1]
+    assert 1 not in graph[2]  # can't drive back past the waypoint
+    via_waypoint = haversine_miles((0.5, 0.0), (1.0, 0.0)) + haversine_miles((1.0, 0.0), (1.5, 0.0))
+    assert layout.leg_miles(before, after) == pytest.approx(via_waypoint)
+
+
+def decimal_leg_cost(distance_miles, price):
+    # The float/Decimal arithmetic the optimizer used before integer weights.
+    return float(Decimal(distance_miles) / MILES_PER_GALLON * price)
+
+
+def test_station_price_is_held_in_mills():
+    assert StationNode(id=1, lon=0, lat=0, price=Decimal("3.459"), name="A").price_mills == 3459
+    assert StationNode(id=2, lon=0, lat=0, price=Decimal("3.5"), name="B").price_mills == 3500
+    assert isinstance(leg_cost(123.4567, 3459), int)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_integer_trip_totals_match_decimal_rounding_to_the_cent(seed):
+    rng = random.Random(seed)
+    checked = 0
+    for _ in range(2000):
+        legs = [
+            (rng.uniform(0.5, 500), Decimal(str(round(rng.uniform(2.5, 5.5), 3))))
+            for _ in range(rng.randint(1, 8))
+        ]
+        old = sum(decimal_leg_cost(miles, price) for miles, price in legs)
+        # Distance rounding moves a total by a few millionths of a dollar, so only
+        # a total that close to a half cent may round the other way.
+        if abs((old * 100) % 1 - 0.5) < 0.001:
+            continue
+        new = cost_to_dollars(sum(leg_cost(miles, int(price * 1000)) for miles, price in legs))
+        assert new == round(Decimal(old), 2)
+        checked += 1
+    assert checked > 1990
+
+
+def test_plan_fuel_stops_total_matches_decimal_leg_sum(settings):
+    settings.ROUTING_GRAPH_MODE = "eager"
+    rng = random.Random(11)
+    stations = [
+        StationNode(
+            id=i,
+            lon=rng.uniform(-90.0, -74.0),
+            lat=rng.uniform(38.0, 41.5),
+            price=Decimal(str(round(rng.uniform(2.8, 4.2), 3))),
+            name=f"S{i}",
+        )
+        for i in range(1, 61)
+    ]
+    by_name = {s.name: s for s in stations}
+
+    plan = plan_fuel_stops(Point(-74.0, 40.7), Point(-90.0, 38.6), stations)
+
+    start = StationNode(id=-1, lon=-74.0, lat=40.7, price=Decimal("0"), name="start")
+    end = StationNode(id=-2, lon=-90.0, lat=38.6, price=Decimal("0"), name="end")
+    start.price = min(stations, key=lambda n: haversine_miles((-74.0, 40.7), (n.lon, n.lat))).price
+    path = [start] + [by_name[stop["name"]] for stop in plan["fuel_stops"]] + [end]
+    old = sum(
+        decimal_leg_cost(haversine_miles((a.lon, a.lat), (b.lon, b.lat)), a.price) for a, b in zip(path, path[1:])
+    )
+    assert plan["fuel_stops"]
+    assert isinstance(plan["total_cost"], Decimal)
+    assert plan["total_cost"] == round(Decimal(old), 2)
+
+
+def test_plan_fuel_stops_lazy_graph_matches_eager(settings):
+    rng = random.Random(3)
+    stations = [
+        StationNode(
+            id=i,
+            lon=rng.uniform(-90.0, -74.0),
+            lat=rng.uniform(38.0, 41.5),
+            price=Decimal(str(round(rng.uniform(2.8, 4.2), 3))),
+            name=f"S{i}",
+        )
+        for i in range(1, 61)
+    ]
+    plans = {}
+    for mode in ("eager", "lazy"):
+        settings.ROUTING_GRAPH_MODE = mode
+        plans[mode] = plan_fuel_stops(Point(-74.0, 40.7), Point(-90.0, 38.6), stations, [(-82.0, 39.5)])
+
+    assert plans["lazy"]["total_cost"] == plans["eager"]["total_cost"]
+    assert plans["lazy"]["gallons"] == plans["eager"]["gallons"]
+
+
+def test_plan_fuel_stops_alternatives_and_stop_limit_share_one_graph(settings, monkeypatch):
+    settings.ROUTING_GRAPH_MODE = "eager"
+    rng = random.Random(11)
+    stations = [
+        StationNode(
+            id=i,
+            lon=rng.uniform(-90.0, -74.0),
+            lat=rng.uniform(38.0, 41.5),
+            price=Decimal(str(round(rng.uniform(2.8, 4.2), 3))),
+            name=f"S{i}",
+        )
+        for i in range(1, 61)
+    ]
+    builds = []
+    build = services.build_route_graph
+    monkeypatch.setattr(services, "build_route_graph", lambda *args: builds.append(1) or build(*args))
+
+    plan = plan_fuel_stops(Point(-74.0, 40.7), Point(-90.0, 38.6), stations, alternatives=3, max_stops=1)
+
+    costs = [plan["total_cost"]] + [alt["total_cost"] for alt in plan["alternatives"]]
+    stops = [tuple(s["name"] for s in p["fuel_stops"]) for p in [plan, *plan["alternatives"]]]
+    assert len(plan["alternatives"]) == 3
+    assert costs == sorted(costs)
+    assert len(set(stops)) == 4
+    assert len(plan["max_stops_plan"]["fuel_stops"]) <= 1
+    assert plan["max_stops_plan"]["total_cost"] >= plan["total_cost"]
+    assert builds == [1]
+    assert plan_fuel_stops(Point(-74.0, 40.7), Point(-90.0, 38.6), stations, max_stops=0)["max_stops_plan"] is None
@@ -9,7 +9,7 @@ from routing.models import Route
 
 @pytest.mark.django_db
 def test_route_api_happy_path_persists_route(monkeypatch):
-    def fake_compute_route(start_point, end_point):
+    def fake_compute_route(start_point, end_point, waypoints=None):
         return {
             "route": {"features": [{"geometry": {"coordinates": [[0, 0], [1, 1]]}}]},
             "polyline": LineString((0, 0), (1, 1)),
@@ -57,7 +57,7 @@ def test_route_api_validates_required_fields():
 @pytest.mark.django_db
 def test_bdd_given_valid_coordinates_when_route_requested_then_returns_optimized_payload(monkeypatch):
     # Given: route computation is available and deterministic.
-    def fake_compute_route(start_point, end_point):
+    def fake_compute_route(start_point, end_point, waypoints=None):
         return {
             "route": {"features": [{"geometry": {"coordinates": [[0, 0], [1, 1]]}}]},
             "polyline": LineString((0, 0), (1, 1)),
@@ -89,7 +89,7 @@ def test_bdd_given_valid_coordinates_when_route_requested_then_returns_optimized
 def test_bdd_given_unreachable_route_when_requested_then_returns_400(monkeypatch):
     monkeypatch.setattr(
         "routing.views.compute_route",
-        lambda start_point, end_point: (_ for _ in ()).throw(
+        lambda start_point, end_point, waypoints=None: (_ for _ in ()).throw(
             ValueError("No feasible route found within VEHICLE_MAX_RANGE_MILES")
         ),
     )
@@ -103,3 +103,88 @@ def test_bdd_given_unreachable_route_when_requested_then_returns_400(monkeypatch
 
     assert response.status_code == 400
     assert "No feasible route found" in response.json()["detail"]
+
+
+@pytest.mark.django_db
+def test_route_api_reports_stage_timings_header(monkeypatch):
+    def fake_compute_route(start_point, end_point, waypoints=None):
+        return {
+            "route": {"features": [{"geometry": {"coordinates": [[0, 0], [1, 1]]}}]},
+            "polyline": LineString((0, 0), (1, 1)),
+            "fuel_stops": [],
+            "total_cost": Decimal("15.75"),
+            "gallons": Decimal("4.50"),
+        }
+
+    monkeypatch.setattr("routing.views.compute_route", fake_compute_route)
+    response = APIClient().post(
+        "/api/route/",
+        {"start": "-74.0060,40.7128", "end": "-77.0369,38.9072"},
+        format="json",
+    )
+
+    assert response.status_code == 200
+    assert "db_write;dur=" in response["Server-Timing"]
+    assert "total;dur=" in response["Server-Timing"]
+
+
+@pytest.mark.django_db
+def test_route_api_passes_ordered_waypoints_and_persists_them(monkeypatch):
+    received = {}
+
+    def fake_compute_route(start_point, end_point, waypoints=None):
+        received["waypoints"] = [(p.x, p.y) for p in waypoints]
+        return {
+            "route": {"features": [{"geometry": {"coordinates": [[0, 0], [1, 1]]}}]},
+            "polyline": LineString((0, 0), (1, 1)),
+            "fuel_stops": [],
+            "total_cost": Decimal("20.00"),
+            "gallons": Decimal("6.00"),
+        }
+
+    monkeypatch.setattr("routing.views.compute_route", fake_compute_route)
+    response = APIClient().post(
+        "/api/route/",
+        {
+            "start": "-74.0060,40.7128",
+            "end": "-77.0369,38.9072",
+            "waypoints": ["-75.1652,39.9526", "-76.6122,39.2904"],
+        },
+        format="json",
+    )
+
+    assert response.status_code == 200
+    assert received["waypoints"] == [(-75.1652, 39.9526), (-76.6122, 39.2904)]
+    assert Route.objects.get().waypoints == [[-75.1652, 39.9526], [-76.6122, 39.2904]]
+
+
+@pytest.mark.django_db
+def test_route_api_returns_requested_alternative_plans(monkeypatch):
+    received = {}
+
+    def fake_compute_route(start_point, end_point, waypoints=None, alternatives=0, max_stops=None):
+        received.update(alternatives=alternatives, max_stops=max_stops)
+        plan = {"fuel_stops": [], "total_cost": Decimal("20.00"), "gallons": Decimal("6.00")}
+        return {
+            "route": {"features": [{"geometry": {"coordinates": [[0, 0], [1, 1]]}}]},
+            "polyline": LineString((0, 0), (1, 1)),
+            **plan,
+            "alternatives": [{**plan, "total_cost": Decimal("21.50")}],
+            "max_stops_plan": None,
+        }
+
+    monkeypatch.setattr("routing.views.compute_route", fake_compute_route)
+    response = APIClient().post(
+        "/api/route/",
+        {"start": "-74.0060,40.7128", "end": "-77.0369,38.9072", "alternatives": 1, "max_stops": 0},
+        format="json",
+    )
+
+    assert response.status_code == 200
+    assert received == {"alternatives": 1, "max_stops": 0}
+    assert response["X-Route-Cache"] == "bypass"
+    assert response.json()["alternatives"][0]["total_cost"] == 21.5
+    assert response.json()["max_stops_plan"] is None
+    assert APIClient().post(
+        "/api/route/", {"start": "0,0", "end": "1,1", "alternatives": 9}, format="json"
+    ).status_code == 400
@@ -1,13 +1,15 @@
+from decimal import Decimal
+
 from django.contrib.gis.geos import Point
 
 import pytest
 
-from routing.services import compute_route
+from routing.services import StationNode, compute_route
 
 
 def test_business_logic_short_trip_no_stops_but_non_zero_cost(monkeypatch):
     # Keep route under vehicle max range so no refuel stop is required.
-    def fake_directions(self, start, end):
+    def fake_directions(self, start, end, waypoints=()):
         return {
             "features": [
                 {
@@ -30,7 +32,7 @@ def test_business_logic_short_trip_no_stops_but_non_zero_cost(monkeypatch):
 
 
 def test_business_logic_unreachable_when_max_range_too_low(monkeypatch):
-    def fake_directions(self, start, end):
+    def fake_directions(self, start, end, waypoints=()):
         return {
             "features": [
                 {
@@ -48,3 +50,36 @@ def test_business_logic_unreachable_when_max_range_too_low(monkeypatch):
 
     with pytest.raises(ValueError, match="No feasible route found"):
         compute_route(Point(-74.0, 40.7), Point(-118.2, 34.0))
+
+
+def test_business_logic_multi_waypoint_trip_carries_fuel_across_waypoint(monkeypatch):
+    # start -> waypoint -> end along latitude 40, ~80 miles between each point below.
+    calls = []
+
+    def fake_directions(self, start, end, waypoints=()):
+        calls.append(list(waypoints))
+        return {
+            "features": [
+                {"geometry": {"coordinates": [list(start), *[list(w) for w in waypoints], list(end)]}}
+            ]
+        }
+
+    before_waypoint = StationNode(id=1, lon=-98.5, lat=40.0, price=Decimal("3.000"), name="before")
+    after_waypoint = StationNode(id=2, lon=-95.5, lat=40.0, price=Decimal("2.500"), name="after")
+    corridor_calls = []
+
+    def fake_corridor(polyline):
+        corridor_calls.append(polyline)
+        return [before_waypoint, after_waypoint]
+
+    monkeypatch.setattr("routing.services.RoutingClient.directions", fake_directions)
+    monkeypatch.setattr("routing.services.filter_stations_along_route", fake_corridor)
+    monkeypatch.setattr("routing.services.MAX_RANGE_MILES", 200)
+
+    payload = compute_route(Point(-100.0, 40.0), Point(-94.0, 40.0), waypoints=[Point(-97.0, 40.0)])
+
+    assert calls == [[(-97.0, 40.0)]]
+    assert len(corridor_calls) == 1
+    # before -> after is only ~160 miles when driven through the waypoint.
+    assert [stop["name"] for stop in payload["fuel_stops"]] == ["before", "after"]
+    assert payload["gallons"] == pytest.approx(Decimal("31.8"), abs=Decimal("0.2"))
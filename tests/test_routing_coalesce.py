@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+from django.core.cache import cache
+
+from routing.coalesce import single_flight
+
+
+@pytest.fixture(autouse=True)
+def local_cache(settings):
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    settings.ROUTE_COALESCE_POLL_SECONDS = 0.01
+    cache.clear()
+
+
+def run_concurrently(n, target):
+    barrier = threading.Barrier(n)
+    results, errors = [], []
+
+    def worker():
+        barrier.wait()
+        try:
+            results.append(target())
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+    return results, errors
+
+
+def test_concurrent_identical_requests_call_provider_once():
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"total_cost": 42, "fuel_stops": []}
+
+    results, errors = run_concurrently(8, lambda: single_flight("dallas-houston", compute))
+
+    assert errors == []
+    assert len(calls) == 1
+    assert len(results) == 8
+    assert all(r == {"total_cost": 42, "fuel_stops": []} for r in results)
+    assert len({id(r) for r in results}) == 8  # each caller gets its own copy
+
+
+def test_followers_share_leader_error():
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        raise ValueError("No feasible route found within VEHICLE_MAX_RANGE_MILES")
+
+    results, errors = run_concurrently(4, lambda: single_flight("unreachable", compute))
+
+    assert len(calls) == 1
+    assert results == []
+    assert len(errors) == 4 and all(isinstance(e, ValueError) for e in errors)
+
+
+def test_other_process_result_is_picked_up_from_cache():
+    key = "dallas-houston"
+    cache.add(f"route:flight:lock:{key}", "other-process", timeout=30)
+
+    def other_process_finishes():
+        time.sleep(0.1)
+        cache.set(f"route:flight:result:{key}", {"total_cost": 7}, timeout=10)
+        cache.delete(f"route:flight:lock:{key}")
+
+    threading.Thread(target=other_process_finishes).start()
+
+    def compute():
+        raise AssertionError("provider must not be called")
+
+    assert single_flight(key, compute) == {"total_cost": 7}
+
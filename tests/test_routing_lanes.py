@@ -0,0 +1,110 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import Mock
+
+import pytest
+from django.contrib.gis.geos import Point
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from ingest.models import Ingestion
+from routing.lanes import lane_key, store_lane_payload
+from routing.models import Lane, Route
+from routing.tasks import refresh_hot_lanes
+
+START = Point(-96.7970, 32.7767)
+END = Point(-95.3698, 29.7604)
+CACHED_PAYLOAD = {
+    "route": {"features": [{"geometry": {"coordinates": [[-96.797, 32.7767], [-95.3698, 29.7604]]}}]},
+    "fuel_stops": [],
+    "total_cost": Decimal("33.10"),
+    "gallons": Decimal("24.00"),
+}
+
+
+@pytest.fixture(autouse=True)
+def local_cache(settings):
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    from django.core.cache import cache
+
+    cache.clear()
+
+
+def register_lane():
+    return Lane.objects.create(key=lane_key(START, END), start_point=START, end_point=END, pinned=True)
+
+
+def test_lane_key_ignores_sub_meter_noise():
+    assert lane_key(Point(-96.79701, 32.77672), END) == lane_key(START, END)
+    assert lane_key(START, END) != lane_key(END, START)
+
+
+@pytest.mark.django_db
+def test_warmed_lane_is_served_from_cache(monkeypatch):
+    register_lane()
+    store_lane_payload(lane_key(START, END), CACHED_PAYLOAD, version=0)
+    compute = Mock(side_effect=AssertionError("provider must not be called"))
+    monkeypatch.setattr("routing.views.compute_route", compute)
+
+    response = APIClient().post(
+        "/api/route/", {"start": "-96.7970,32.7767", "end": "-95.3698,29.7604"}, format="json"
+    )
+
+    assert response.status_code == 200
+    assert response["X-Route-Cache"] == "hit"
+    assert response.json()["total_cost"] == 33.1
+    assert Route.objects.count() == 1  # history still records the request
+
+
+@pytest.mark.django_db
+def test_stale_lane_entry_served_only_within_grace_after_price_refresh(settings, monkeypatch):
+    settings.ROUTE_LANE_STALE_SECONDS = 600
+    register_lane()
+    store_lane_payload(lane_key(START, END), CACHED_PAYLOAD, version=0)
+    monkeypatch.setattr(
+        "routing.views.compute_route",
+        lambda start_point, end_point, waypoints=None: {**CACHED_PAYLOAD, "polyline": None, "total_cost": Decimal("1.00")},
+    )
+    refresh = Ingestion.objects.create(source="upload")
+    refresh.mark_success()
+    client = APIClient()
+    body = {"start": "-96.7970,32.7767", "end": "-95.3698,29.7604"}
+
+    just_refreshed = client.post("/api/route/", body, format="json")
+    Ingestion.objects.filter(pk=refresh.pk).update(finished_at=timezone.now() - timedelta(hours=1))
+    long_after = client.post("/api/route/", body, format="json")
+
+    assert just_refreshed["X-Route-Cache"] == "hit"
+    assert long_after["X-Route-Cache"] == "miss"
+    assert long_after.json()["total_cost"] == 1.0
+
+
+@pytest.mark.django_db
+def test_refresh_hot_lanes_promotes_frequent_history(settings, monkeypatch):
+    settings.ROUTE_HOT_LANES_MIN_HITS = 3
+    delay = Mock()
+    monkeypatch.setattr("routing.tasks.warm_hot_lanes.delay", delay)
+    for _ in range(3):
+        Route.objects.create(start_point=START, end_point=END)
+    Route.objects.create(start_point=END, end_point=START)
+
+    assert refresh_hot_lanes() == 1
+
+    lane = Lane.objects.get()
+    assert lane.key == lane_key(START, END)
+    assert lane.hits == 3
+    delay.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_lane_registry_registers_and_lists_pinned_lane():
+    client = APIClient()
+
+    created = client.post(
+        "/api/route/lanes/", {"start": "-96.7970,32.7767", "end": "-95.3698,29.7604"}, format="json"
+    )
+    listed = client.get("/api/route/lanes/")
+
+    assert created.status_code == 201
+    assert created.json()["pinned"] is True
+    assert [lane["key"] for lane in listed.json()] == [lane_key(START, END)]
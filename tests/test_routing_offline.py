@@ -0,0 +1,87 @@
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+
+from routing.offline import RoadGraph, road_graph
+from routing.services import RoutingClient
+
+# A small grid of roads around (0, 0): a fast motorway along the south edge,
+# slow residential streets through the middle, and a one-way link.
+ROADS = [
+    {"geometry": {"type": "LineString", "coordinates": [[0.0, 0.0], [0.01, 0.0], [0.02, 0.0]]},
+     "properties": {"highway": "motorway"}},
+    {"geometry": {"type": "LineString", "coordinates": [[0.0, 0.0], [0.0, 0.005], [0.01, 0.005], [0.02, 0.005], [0.02, 0.0]]},
+     "properties": {"highway": "residential"}},
+    {"geometry": {"type": "LineString", "coordinates": [[0.02, 0.0], [0.03, 0.0]]},
+     "properties": {"highway": "primary", "oneway": "yes"}},
+    {"geometry": {"type": "LineString", "coordinates": [[5.0, 5.0], [5.01, 5.0]]},
+     "properties": {"highway": "residential"}},
+]
+
+
+def features():
+    return [{"type": "Feature", **road} for road in ROADS]
+
+
+@pytest.fixture
+def graph():
+    return RoadGraph.from_features(features())
+
+
+def test_fastest_path_prefers_motorway(graph):
+    route = graph.directions([(0.0, 0.0001), (0.02, 0.0001)], max_snap_meters=500)
+
+    coords = route["features"][0]["geometry"]["coordinates"]
+    assert coords == [[0.0, 0.0], [0.01, 0.0], [0.02, 0.0]]
+    summary = route["features"][0]["properties"]["summary"]
+    assert summary["distance"] == pytest.approx(2226, rel=0.01)
+
+
+def test_oneway_is_respected(graph):
+    assert graph.directions([(0.02, 0.0), (0.03, 0.0)], 500)["features"][0]["geometry"]["coordinates"][-1] == [0.03, 0.0]
+    with pytest.raises(ValueError, match="No road connection"):
+        graph.directions([(0.03, 0.0), (0.02, 0.0)], 500)
+
+
+def test_waypoints_are_visited_in_order(graph):
+    route = graph.directions([(0.0, 0.0), (0.01, 0.005), (0.02, 0.0)], 500)
+
+    coords = route["features"][0]["geometry"]["coordinates"]
+    assert [0.01, 0.005] in coords
+    assert coords[0] == [0.0, 0.0] and coords[-1] == [0.02, 0.0]
+
+
+def test_points_far_from_roads_and_disconnected_islands_fail(graph):
+    with pytest.raises(ValueError, match="No road within"):
+        graph.directions([(1.0, 1.0), (0.0, 0.0)], 500)
+    with pytest.raises(ValueError, match="No road connection"):
+        graph.directions([(0.0, 0.0), (5.0, 5.0)], 500)
+
+
+def test_graph_file_round_trip(graph):
+    buf = io.BytesIO()
+    graph.save(buf)
+    buf.seek(0)
+
+    loaded = RoadGraph.load(buf)
+
+    assert (loaded.node_count, loaded.edge_count) == (graph.node_count, graph.edge_count)
+    assert loaded.directions([(0.0, 0.0), (0.02, 0.0)], 500) == graph.directions([(0.0, 0.0), (0.02, 0.0)], 500)
+
+
+def test_routing_client_uses_offline_graph_without_keys(tmp_path, settings):
+    source = tmp_path / "roads.geojsonseq"
+    source.write_text("\n".join(json.dumps(f) for f in features()))
+    graph_path = tmp_path / "roads.graph"
+    call_command("build_road_graph", str(source), str(graph_path), stdout=io.StringIO())
+    settings.MAPBOX_API_KEY = ""
+    settings.ORS_API_KEY = ""
+    settings.ROUTING_PROVIDER = "auto"
+    settings.ROAD_GRAPH_PATH = str(graph_path)
+
+    route = RoutingClient().directions((0.0, 0.0), (0.02, 0.0))
+
+    assert route["features"][0]["geometry"]["coordinates"][-1] == [0.02, 0.0]
+    assert road_graph(str(graph_path)).node_count == 9
@@ -0,0 +1,185 @@
+from decimal import Decimal
+
+import pytest
+from django.contrib.gis.geos import LineString, Point
+
+from routing import recost
+from routing.models import Route
+from routing.recost import recost_route
+from routing.services import StationNode, TripLayout, compute_route
+from routing.storage import pack_corridor, unpack_corridor
+from routing.tasks import recost_route_chunk, recost_routes
+
+# Austin -> Los Angeles, ~1200 miles: needs at least two stops at 500 miles of range.
+COORDS = [(-97.74 + (-118.24 + 97.74) * i / 50, 30.27 + (34.05 - 30.27) * i / 50) for i in range(51)]
+
+
+def corridor(prices):
+    return [
+        StationNode(
+            id=i + 1,
+            lon=COORDS[5 * i + 2][0],
+            lat=COORDS[5 * i + 2][1],
+            price=Decimal(price),
+            name=f"S{i + 1}",
+            route_miles=120.0 * i + 48,
+        )
+        for i, price in enumerate(prices)
+    ]
+
+
+PRICES = ["3.100", "3.900", "3.200", "3.800", "3.050", "3.900", "3.300", "3.700", "3.400", "3.600"]
+
+
+def computed(monkeypatch, stations):
+    monkeypatch.setattr(
+        "routing.services.RoutingClient.directions",
+        lambda self, start, end, waypoints=(): {"features": [{"geometry": {"coordinates": COORDS}}]},
+    )
+    monkeypatch.setattr("routing.services.filter_stations_along_route", lambda polyline: stations)
+    return compute_route(Point(*COORDS[0]), Point(*COORDS[-1]))
+
+
+def stored_route(payload):
+    return Route(
+        id=1,
+        start_point=Point(*COORDS[0]),
+        end_point=Point(*COORDS[-1]),
+        geometry=LineString(COORDS),
+        fuel_stops=payload["fuel_stops"],
+        total_cost=payload["total_cost"],
+        corridor_stations=payload["corridor_stations"],
+    )
+
+
+def station_map(stations):
+    return {s.id: (s.lon, s.lat, s.price, s.name) for s in stations}
+
+
+def test_corridor_round_trips_in_fixed_records():
+    stations = corridor(PRICES[:2])
+    stations[1].route_miles = None
+
+    blob = pack_corridor(stations)
+
+    assert len(blob) == 16 * 2
+    assert unpack_corridor(blob) == [(1, 48.0, 3100), (2, None, 3900)]
+    assert unpack_corridor(None) == []
+
+
+def test_unchanged_prices_leave_the_route_alone(monkeypatch):
+    stations = corridor(PRICES)
+    route = stored_route(computed(monkeypatch, stations))
+
+    assert recost_route(route, station_map(stations)) is False
+    assert route.recosted_at is None
+
+
+def test_recost_matches_a_fresh_computation_at_new_prices(monkeypatch):
+    route = stored_route(computed(monkeypatch, corridor(PRICES)))
+    cheaper = list(PRICES)
+    cheaper[3] = "2.500"
+    repriced = corridor(cheaper)
+    expected = computed(monkeypatch, repriced)
+
+    assert recost_route(route, station_map(repriced)) is True
+
+    assert route.total_cost == expected["total_cost"] < stored_route(computed(monkeypatch, corridor(PRICES))).total_cost
+    assert route.fuel_stops == expected["fuel_stops"]
+    assert "S4" in [stop["name"] for stop in route.fuel_stops]
+    assert route.corridor_stations == expected["corridor_stations"]
+    assert route.recosted_at is not None
+
+
+def test_stations_gone_from_the_table_drop_out_of_the_corridor(monkeypatch):
+    stations = corridor(PRICES)
+    route = stored_route(computed(monkeypatch, stations))
+    current = station_map(stations)
+    del current[2]
+
+    assert recost_route(route, current) is True
+    assert [station_id for station_id, _, _ in unpack_corridor(route.corridor_stations)] == [
+        1, 3, 4, 5, 6, 7, 8, 9, 10
+    ]
+
+
+def test_waypoint_layers_use_the_stored_line_for_simplified_geometry(monkeypatch):
+    # The provider line was 30% longer than the simplified one stored, so the
+    # stored route_miles run ahead of positions on COORDS.
+    full_miles = 1.3 * 1200.0
+    before, after = (
+        StationNode(
+            id=i + 1,
+            lon=COORDS[vertex][0],
+            lat=COORDS[vertex][1],
+            price=Decimal(price),
+            name=name,
+            route_miles=full_miles * vertex / 50,
+        )
+        for i, (vertex, price, name) in enumerate([(23, "3.100", "before"), (27, "3.200", "after")])
+    )
+    route = Route(
+        id=1,
+        start_point=Point(*COORDS[0]),
+        end_point=Point(*COORDS[-1]),
+        waypoints=[list(COORDS[25])],
+        geometry=LineString(COORDS),
+        corridor_stations=pack_corridor([before, after]),
+    )
+    planned = {}
+
+    def fake_plan(start, end, nodes, waypoints, coords):
+        planned["layout"] = TripLayout.for_route(coords, waypoints, nodes, -1, -2)
+        return {"fuel_stops": [], "total_cost": Decimal("1.00")}
+
+    monkeypatch.setattr(recost, "plan_fuel_stops", fake_plan)
+    stations = station_map([before, after])
+    stations[1] = (before.lon, before.lat, Decimal("2.900"), "before")
+
+    assert recost_route(route, stations)
+    assert planned["layout"].layers[1] == 0 and planned["layout"].layers[2] == 1
+    # The stored corridor keeps the provider-line mileage.
+    assert [miles for _, miles, _ in unpack_corridor(route.corridor_stations)] == pytest.approx(
+        [before.route_miles, after.route_miles], abs=0.01
+    )
+
+
+def test_batch_loads_only_unknown_stations(monkeypatch):
+    stations = corridor(PRICES)
+    route = stored_route(computed(monkeypatch, stations))
+    known = station_map(stations[1:])
+    loaded = []
+
+    def fake_load(ids, into):
+        wanted = {station_id for station_id in ids if station_id not in into}
+        loaded.append(wanted)
+        into.update({s.id: (s.lon, s.lat, Decimal("2.000"), s.name) for s in stations if s.id in wanted})
+
+    monkeypatch.setattr(recost, "load_stations", fake_load)
+
+    assert recost.recost_batch([route], known) == [route]
+    assert loaded == [{1}]
+
+
+@pytest.mark.django_db
+def test_recost_routes_bulk_updates_changed_routes(monkeypatch, settings):
+    settings.ROUTE_RECOST_BATCH_SIZE = 2
+    payload = computed(monkeypatch, corridor(PRICES))
+    for _ in range(3):
+        route = stored_route(payload)
+        route.id = None
+        route.save()
+    Route.objects.create(start_point=Point(0, 0), end_point=Point(1, 1))  # stored before corridors were kept
+    cheaper = list(PRICES)
+    cheaper[3] = "2.500"
+    repriced = corridor(cheaper)
+    monkeypatch.setattr(recost, "load_stations", lambda ids, known: known.update(station_map(repriced)))
+    chunks = []
+    monkeypatch.setattr("routing.tasks.recost_route_chunk.delay", lambda *args: chunks.append(args))
+
+    assert recost_routes(chunk_size=2) == 3
+    assert [recost_route_chunk(*args) for args in chunks] == [2, 1]
+    assert [recost_route_chunk(*args) for args in chunks] == [0, 0]
+    assert list(Route.objects.exclude(recosted_at=None).values_list("total_cost", flat=True)) == [
+        computed(monkeypatch, repriced)["total_cost"]
+    ] * 3
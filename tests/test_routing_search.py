@@ -0,0 +1,209 @@
+import math
+import random
+from decimal import Decimal
+
+import pytest
+
+from routing.services import (
+    LazyGraph,
+    StationNode,
+    a_star,
+    bidirectional_dijkstra,
+    build_graph,
+    cheapest_path_with_max_stops,
+    costs_to,
+    dijkstra,
+    fuel_cost_heuristic,
+    graph_edge_count,
+    k_cheapest_paths,
+)
+
+
+def path_cost(graph, path):
+    return sum(graph[path[i]][path[i + 1]] for i in range(len(path) - 1))
+
+
+def random_station_nodes(seed, count=60):
+    rng = random.Random(seed)
+    start = StationNode(id=-1, lon=-74.0, lat=40.7, price=Decimal("3.500"), name="start")
+    end = StationNode(id=-2, lon=-90.0, lat=38.6, price=Decimal("3.500"), name="end")
+    stations = [
+        StationNode(
+            id=i,
+            lon=rng.uniform(-90.0, -74.0),
+            lat=rng.uniform(38.0, 41.5),
+            price=Decimal(str(round(rng.uniform(2.8, 4.2), 3))),
+            name=f"S{i}",
+        )
+        for i in range(1, count + 1)
+    ]
+    return start, end, [start, end] + stations
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_search_variants_match_dijkstra_cost_on_station_graphs(seed):
+    start, end, nodes = random_station_nodes(seed)
+    graph = build_graph(nodes)
+
+    baseline = dijkstra(graph, start.id, end.id)
+    astar = a_star(graph, start.id, end.id, fuel_cost_heuristic(nodes, end))
+    bidirectional = bidirectional_dijkstra(graph, start.id, end.id)
+
+    assert baseline[0] == start.id and baseline[-1] == end.id
+    assert path_cost(graph, astar) == pytest.approx(path_cost(graph, baseline))
+    assert path_cost(graph, bidirectional) == pytest.approx(path_cost(graph, baseline))
+
+
+def test_fuel_cost_heuristic_stays_admissible_when_every_leg_rounds_down():
+    # Ten 30.0000004-mile legs north along one meridian: each leg weight rounds
+    # 0.4 distance units down, so the ten-leg path is 4 units shorter than the
+    # straight line measured once.
+    step = math.degrees(30.0000004 / 3958.8)
+    nodes = [
+        StationNode(id=i, lon=-90.0, lat=30.0 + i * step, price=Decimal("3.000"), name=f"S{i}")
+        for i in range(11)
+    ]
+    end = nodes[-1]
+    graph = build_graph(nodes)
+    heuristic = fuel_cost_heuristic(nodes, end)
+
+    remaining = costs_to(graph, end.id)
+
+    assert all(heuristic(node_id) <= cost for node_id, cost in remaining.items())
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_bidirectional_matches_dijkstra_on_random_sparse_graphs(seed):
+    rng = random.Random(seed)
+    graph = {n: {} for n in range(40)}
+    for a in range(40):
+        for b in rng.sample(range(40), 4):
+            if a != b:
+                graph[a][b] = rng.uniform(1, 20)
+
+    baseline = dijkstra(graph, 0, 39)
+    bidirectional = bidirectional_dijkstra(graph, 0, 39)
+
+    if not baseline:
+        assert bidirectional == []
+    else:
+        assert path_cost(graph, bidirectional) == pytest.approx(path_cost(graph, baseline))
+
+
+def test_search_variants_return_empty_path_when_unreachable():
+    graph = {1: {2: 1.0}, 2: {}, 3: {}}
+
+    assert dijkstra(graph, 1, 3) == []
+    assert a_star(graph, 1, 3, lambda node: 0.0) == []
+    assert bidirectional_dijkstra(graph, 1, 3) == []
+
+
+def test_astar_expands_no_more_nodes_than_dijkstra():
+    start, end, nodes = random_station_nodes(seed=3, count=120)
+    graph = build_graph(nodes)
+    dijkstra_stats, astar_stats = {}, {}
+
+    dijkstra(graph, start.id, end.id, stats=dijkstra_stats)
+    a_star(graph, start.id, end.id, fuel_cost_heuristic(nodes, end), stats=astar_stats)
+
+    assert astar_stats["expanded"] <= dijkstra_stats["expanded"]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_lazy_graph_finds_the_eager_path_cost_with_every_algorithm(seed):
+    start, end, nodes = random_station_nodes(seed)
+    eager = build_graph(nodes)
+    baseline = path_cost(eager, dijkstra(eager, start.id, end.id))
+
+    for search in (
+        lambda g: dijkstra(g, start.id, end.id),
+        lambda g: a_star(g, start.id, end.id, fuel_cost_heuristic(nodes, end)),
+        lambda g: bidirectional_dijkstra(g, start.id, end.id),
+    ):
+        lazy = LazyGraph(nodes)
+        assert path_cost(eager, search(lazy)) == baseline
+        assert graph_edge_count(lazy) <= graph_edge_count(eager)
+
+
+def test_lazy_graph_edges_match_eager_and_are_generated_once():
+    _, _, nodes = random_station_nodes(seed=4)
+    eager = build_graph(nodes)
+    lazy = LazyGraph(nodes)
+
+    assert lazy[7] == eager[7]
+    assert lazy.reversed()[7] == {a: edges[7] for a, edges in eager.items() if 7 in edges}
+    generated = lazy.edges_generated
+    assert lazy.get(7) is lazy[7]
+    assert lazy.edges_generated == generated
+    assert lazy.get(999) is None
+
+
+def test_lazy_graph_skips_stations_beyond_the_destination():
+    # Short trip at one end of a long corridor: the far stations are never expanded.
+    start, end, nodes = random_station_nodes(seed=5, count=200)
+    end.lon, end.lat = -76.0, 40.0
+    lazy = LazyGraph(nodes)
+
+    path = dijkstra(lazy, start.id, end.id)
+
+    assert path[0] == start.id and path[-1] == end.id
+    assert lazy.edges_generated < graph_edge_count(build_graph(nodes)) / 2
+
+
+def simple_paths(graph, node, end, seen=()):
+    if node == end:
+        yield [end]
+        return
+    for neighbor in graph[node]:
+        if neighbor not in seen and neighbor != node:
+            for rest in simple_paths(graph, neighbor, end, seen + (node,)):
+                yield [node] + rest
+
+
+def random_dag(seed, count=14):
+    # Integer weights like leg_cost, mostly forward edges like a corridor.
+    rng = random.Random(seed)
+    graph = {n: {} for n in range(count)}
+    for a in range(count):
+        for b in range(a + 1, min(count, a + 5)):
+            if rng.random() < 0.7:
+                graph[a][b] = rng.randint(1, 50)
+    return graph
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_k_cheapest_paths_match_brute_force(seed):
+    graph = random_dag(seed)
+    expected = sorted(path_cost(graph, p) for p in simple_paths(graph, 0, 13))
+
+    paths = k_cheapest_paths(graph, 0, 13, 5)
+
+    assert [path_cost(graph, p) for p in paths] == expected[:5]
+    assert len({tuple(p) for p in paths}) == len(paths)
+    assert all(p[0] == 0 and p[-1] == 13 for p in paths)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_max_stops_path_is_cheapest_within_the_limit(seed):
+    graph = random_dag(seed)
+    every = list(simple_paths(graph, 0, 13))
+
+    for max_stops in range(2, 8):
+        within = [path_cost(graph, p) for p in every if len(p) - 2 <= max_stops]
+        path = cheapest_path_with_max_stops(graph, 0, 13, max_stops)
+        if not within:
+            assert path == []
+            continue
+        assert len(path) - 2 <= max_stops
+        assert path_cost(graph, path) == min(within)
+
+
+def test_k_cheapest_paths_on_lazy_graph_match_eager():
+    start, end, nodes = random_station_nodes(4)
+
+    eager = k_cheapest_paths(build_graph(nodes), start.id, end.id, 4)
+    lazy_graph = LazyGraph(nodes)
+    lazy = k_cheapest_paths(lazy_graph, start.id, end.id, 4)
+
+    assert [path_cost(lazy_graph, p) for p in lazy] == [path_cost(build_graph(nodes), p) for p in eager]
+    assert k_cheapest_paths({0: {}, 1: {}}, 0, 1, 3) == []
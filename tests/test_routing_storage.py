@@ -0,0 +1,75 @@
+import math
+from decimal import Decimal
+
+import pytest
+from django.contrib.gis.geos import LineString, Point
+from django.core.management import call_command
+
+from routing.models import Route
+from routing.storage import pack_route_json, route_storage_fields, simplify_geometry, unpack_route_json
+
+
+def dense_line(points=2000):
+    # ~70 miles of gently curving road with a vertex every ~50 m.
+    coords = [(-96.8 + i * 0.0005, 32.8 + 0.05 * math.sin(i / 300)) for i in range(points)]
+    return LineString(coords, srid=4326)
+
+
+def test_simplify_keeps_endpoints_and_drops_most_vertices():
+    line = dense_line()
+
+    simplified = simplify_geometry(line, 50)
+
+    assert len(simplified) < len(line) / 10
+    assert simplified[0] == line[0] and simplified[-1] == line[-1]
+    assert simplified.srid == 4326
+    assert line.distance(simplified) < 0.001
+
+
+def test_route_json_round_trips_through_gzip():
+    payload = {"features": [{"geometry": {"coordinates": [[-96.8, 32.8], [-95.4, 29.8]]}}], "cost": Decimal("1.5")}
+
+    blob = pack_route_json(payload)
+
+    assert unpack_route_json(blob) == {**payload, "cost": "1.5"}
+    assert pack_route_json({}) is None and unpack_route_json(None) == {}
+
+
+@pytest.mark.parametrize(
+    "mode, json_inline, json_gzipped",
+    [("full", True, False), ("compact", False, True), ("minimal", False, False)],
+)
+def test_storage_modes(mode, json_inline, json_gzipped):
+    line = dense_line()
+    route_json = {"features": [{"geometry": {"coordinates": [list(c) for c in line.coords]}}]}
+
+    fields = route_storage_fields(line, route_json, mode=mode, tolerance_meters=50)
+
+    assert bool(fields["route_json"]) is json_inline
+    assert (fields["route_json_gz"] is not None) is json_gzipped
+    assert (len(fields["geometry"]) == len(line)) is (mode == "full")
+    assert (fields["compacted_at"] is None) is (mode == "full")
+
+
+def test_unknown_storage_mode_is_rejected():
+    with pytest.raises(ValueError):
+        route_storage_fields(None, {}, mode="zip")
+
+
+@pytest.mark.django_db
+def test_compact_routes_backfills_uncompacted_rows():
+    line = dense_line()
+    route_json = {"features": [{"geometry": {"coordinates": [list(c) for c in line.coords]}}]}
+    route = Route.objects.create(
+        start_point=Point(-96.8, 32.8),
+        end_point=Point(-95.8, 32.8),
+        **route_storage_fields(line, route_json, mode="full"),
+    )
+
+    call_command("compact_routes", "--mode", "compact", "--batch-size", "10")
+
+    route.refresh_from_db()
+    assert route.compacted_at is not None
+    assert route.route_json == {}
+    assert route.route_payload() == route_json
+    assert len(route.geometry) < len(line) / 10
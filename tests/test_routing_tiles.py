@@ -0,0 +1,177 @@
+import random
+from collections import defaultdict
+from decimal import Decimal
+
+import pytest
+from django.contrib.gis.geos import LineString
+from django.core.cache import cache
+
+from routing import tiles
+from routing.services import filter_stations_along_route, haversine_miles
+
+
+class FakeRedis:
+    """hincrby/hgetall over a dict, enough for the tile stats."""
+
+    def __init__(self):
+        self.hashes = defaultdict(lambda: defaultdict(int))
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def hincrby(self, key, field, amount):
+        self.hashes[key][field.encode()] += amount
+
+    def execute(self):
+        return []
+
+    def hgetall(self, key):
+        return {field: str(value).encode() for field, value in self.hashes[key].items()}
+
+
+@pytest.fixture(autouse=True)
+def tile_setup(settings, monkeypatch):
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    settings.ROUTE_TILE_CACHE = True
+    settings.ROUTE_TILE_DEGREES = 0.25
+    settings.ROUTE_TILE_SIMPLIFY_METERS = 25.0
+    cache.clear()
+    redis = FakeRedis()
+    monkeypatch.setattr(tiles, "get_redis", lambda: redis)
+    monkeypatch.setattr(tiles, "price_version", lambda: (7, None))
+    return redis
+
+
+@pytest.fixture
+def stations(monkeypatch):
+    """Random stations around the test route, served by a fake fetch_tiles that counts calls."""
+    rng = random.Random(5)
+    rows = [
+        (i, rng.uniform(-98.0, -94.0), rng.uniform(31.0, 34.0), str(round(rng.uniform(2.8, 4.2), 3)), f"S{i}")
+        for i in range(1, 601)
+    ]
+    fetched = []
+
+    def fake_fetch(wanted, size):
+        fetched.append(list(wanted))
+        found = {tile: [] for tile in wanted}
+        for row in rows:
+            tile = tiles.tile_of(row[1], row[2], size)
+            if tile in found:
+                found[tile].append(row)
+        return found
+
+    monkeypatch.setattr(tiles, "fetch_tiles", fake_fetch)
+    return rows, fetched
+
+
+# Dallas -> Houston, densified the way provider polylines are.
+ROUTE = LineString(
+    [(-96.797 + (1.4272 * i / 400), 32.7767 - (3.0163 * i / 400) + 0.02 * (i % 7) / 7) for i in range(401)]
+)
+
+
+def brute_force_ids(rows, corridor_miles):
+    coords = ROUTE.coords
+    kept = set()
+    for station_id, lon, lat, _, _ in rows:
+        if any(tiles.miles_to_segment(lon, lat, a, b) <= corridor_miles for a, b in zip(coords, coords[1:])):
+            kept.add(station_id)
+    return kept
+
+
+def test_miles_to_segment_matches_haversine_near_the_line():
+    a, b = (-96.0, 32.0), (-95.0, 32.0)
+    assert tiles.miles_to_segment(-95.5, 32.2, a, b) == pytest.approx(
+        haversine_miles((-95.5, 32.2), (-95.5, 32.0)), rel=0.005
+    )
+    assert tiles.miles_to_segment(-94.8, 32.0, a, b) == pytest.approx(haversine_miles((-94.8, 32.0), b), rel=0.005)
+
+
+def test_tile_corridor_matches_exact_filter_and_reuses_tiles(stations, tile_setup):
+    rows, fetched = stations
+
+    first = filter_stations_along_route(ROUTE, 25)
+    second = filter_stations_along_route(ROUTE, 25)
+
+    expected = brute_force_ids(rows, 25)
+    assert len(expected) > 50
+    # Simplification may move the line by up to its 25 m tolerance, nothing more.
+    near_edge = brute_force_ids(rows, 25.02) - brute_force_ids(rows, 24.98)
+    assert {n.id for n in first} ^ expected <= near_edge
+    assert {n.id for n in second} == {n.id for n in first}
+    assert len(fetched) == 1
+    assert all(isinstance(n.price, Decimal) and 0 <= n.route_miles for n in first)
+
+    stats = {row["tile"]: row for row in tiles.tile_stats(limit=1000)}
+    assert len(stats) == len(fetched[0])
+    assert all(row["hits"] == 1 and row["misses"] == 1 and row["hit_rate"] == 0.5 for row in stats.values())
+
+
+def test_overlapping_route_only_fetches_new_tiles(stations):
+    _, fetched = stations
+    filter_stations_along_route(ROUTE, 25)
+    # Second half of the same road, extended past Houston.
+    tail = LineString(list(ROUTE.coords[200:]) + [(-95.0, 29.5)])
+
+    filter_stations_along_route(tail, 25)
+
+    assert len(fetched) == 2
+    assert not set(fetched[1]) & set(fetched[0])
+
+
+def test_geocoded_station_invalidates_its_tile(stations):
+    _, fetched = stations
+    filter_stations_along_route(ROUTE, 25)
+    lon, lat = ROUTE.coords[100]
+
+    assert tiles.invalidate_station_tiles([(lon, lat)]) == 1
+    filter_stations_along_route(ROUTE, 25)
+
+    assert fetched[1] == [tiles.tile_of(lon, lat, 0.25)]
+
+
+def test_new_price_version_starts_cold(stations, monkeypatch):
+    _, fetched = stations
+    filter_stations_along_route(ROUTE, 25)
+    monkeypatch.setattr(tiles, "price_version", lambda: (8, None))
+
+    filter_stations_along_route(ROUTE, 25)
+
+    assert sorted(fetched[1]) == sorted(fetched[0])
+
+
+def test_tiles_are_read_from_a_current_station_snapshot(settings, tmp_path, monkeypatch):
+    from types import SimpleNamespace
+
+    from ingest import snapshot
+    from ingest.models import Ingestion
+
+    rows = [(1, -96.80, 32.78, Decimal("3.100"), "Dallas"), (2, -95.37, 29.76, Decimal("2.999"), "Houston")]
+    snapshot.write_snapshot(str(tmp_path), 4, rows)
+    settings.STATION_SNAPSHOT_DIR = str(tmp_path)
+    settings.STATION_SNAPSHOT_CHECK_SECONDS = 0
+    monkeypatch.setattr(snapshot, "_snapshot", None)
+    monkeypatch.setattr(snapshot, "_checked_at", None)
+    monkeypatch.setattr(Ingestion.objects, "latest_success", lambda: SimpleNamespace(sequence=4))
+    dallas, houston = tiles.tile_of(-96.80, 32.78, 0.25), tiles.tile_of(-95.37, 29.76, 0.25)
+
+    found = tiles.fetch_tiles([dallas, houston, (0, 0)], 0.25)
+
+    assert found == {
+        dallas: [(1, -96.80, 32.78, "3.100", "Dallas")],
+        houston: [(2, -95.37, 29.76, "2.999", "Houston")],
+        (0, 0): [],
+    }
+
+
+def test_tile_ranges_merge_adjacent_tiles_per_row():
+    pad = tiles.QUERY_PAD_DEGREES
+    ranges = tiles.tile_ranges([(0, 0), (1, 0), (3, 0), (1, 1), (0, 0)], 0.25)
+
+    assert ranges == [
+        pytest.approx((-pad, 0.25 + pad, -pad, 0.5 + pad)),
+        pytest.approx((-pad, 0.25 + pad, 0.75 - pad, 1.0 + pad)),
+        pytest.approx((0.25 - pad, 0.5 + pad, 0.25 - pad, 0.5 + pad)),
+    ]
+    assert tiles.tile_ranges([], 0.25) == []
@@ -0,0 +1,78 @@
+from decimal import Decimal
+
+import pytest
+from django.contrib.gis.geos import Point
+from rest_framework.test import APIClient
+
+from ingest.models import FuelStation
+from ingest.views import decode_cursor, encode_cursor
+
+
+def make_station(opis_id, price, lon, lat):
+    return FuelStation.objects.create(
+        opis_id=opis_id,
+        name=f"Stop {opis_id}",
+        address="1 Main",
+        city="Dallas",
+        state="TX",
+        price=Decimal(price),
+        geom=Point(lon, lat),
+    )
+
+
+@pytest.mark.django_db
+def test_nearby_orders_by_price_within_radius():
+    make_station("1", "3.300", -96.80, 32.78)
+    make_station("2", "2.900", -96.90, 32.80)
+    make_station("3", "2.500", -90.00, 30.00)  # cheapest, but ~450 miles away
+
+    response = APIClient().get("/api/stations/nearby/", {"lon": -96.8, "lat": 32.78, "radius_miles": 50})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [row["opis_id"] for row in body["results"]] == ["2", "1"]
+    assert body["results"][1]["distance_miles"] == 0.0
+    assert body["next_cursor"] is None
+
+
+@pytest.mark.django_db
+def test_nearby_keyset_pages_cover_every_station_once():
+    for i in range(7):
+        make_station(str(i), "3.000", -96.8 + i * 0.01, 32.78)
+    client = APIClient()
+    seen, cursor = [], None
+
+    while True:
+        params = {"lon": -96.8, "lat": 32.78, "order": "distance", "limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/api/stations/nearby/", params).json()
+        seen.extend(row["opis_id"] for row in body["results"])
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+
+    assert seen == [str(i) for i in range(7)]
+
+
+@pytest.mark.django_db
+def test_nearby_rejects_cursor_from_other_order():
+    cursor = encode_cursor("price", Decimal("3.000"), 1)
+
+    response = APIClient().get(
+        "/api/stations/nearby/", {"lon": -96.8, "lat": 32.78, "order": "distance", "cursor": cursor}
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_nearby_requires_coordinates():
+    response = APIClient().get("/api/stations/nearby/", {"lon": -96.8})
+
+    assert response.status_code == 400
+    assert "lat" in response.json()
+
+
+def test_cursor_round_trip_preserves_price_precision():
+    assert decode_cursor(encode_cursor("price", Decimal("3.111"), 9), "price") == (Decimal("3.111"), 9)